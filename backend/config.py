@@ -4,6 +4,35 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     duckdb_path: str = "panel_chat.duckdb"
     csv_path: str = "survey_2026_data_engineering.csv"
+    cascade_confidence_threshold: float = 0.7
+    debate_context_token_budget: int = 4000
+    debate_peer_k: int = 4
+    debate_contrast_fraction: float = 0.25
+    round_deadline_s: float = 60.0
+    round_max_workers: int = 32
+    analysis_chunk_size: int = 25
+    analysis_max_workers: int = 8
+    llm_max_workers: int = 64
+    interactive_max_calls: int = 50
+    job_workers: int = 4
+    job_queue_size: int = 32
+    job_history: int = 100
+    job_processes: int = 0
+    ws_buffer_events: int = 5000
+    ws_batch_max: int = 500
+    db_server_address: str = ""
+    db_server_authkey: str = ""
+    profile_max_spans: int = 200000
+    profile_sample_interval_ms: float = 10.0
+    pricing_path: str = ""
+    breakdown_similarity: float = 0.85
+    cassette_mode: str = ""  # "record" or "replay"
+    cassette_dir: str = "cassettes"
+    cassette_latency_scale: float = 1.0
+    llm_stub: bool = False
+    llm_stub_latency_s: float = 0.5
+    model_groups: dict[str, list[str]] = {}  # group name -> interchangeable models, for routed runs
+    route_failover_s: float = 20.0
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
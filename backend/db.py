@@ -1,14 +1,69 @@
 import logging
 import threading
+import time
 
 import duckdb
+from multiprocessing.connection import Client
 from pathlib import Path
 from backend.config import settings
+from backend.services import metrics
 
 logger = logging.getLogger(__name__)
 
 _conn: duckdb.DuckDBPyConnection | None = None
 _lock = threading.Lock()
+_clients = threading.local()  # per-thread connection to the DB writer process
+
+
+class RemoteResult:
+    """Rows of a statement run by the DB writer, with the cursor methods callers use."""
+
+    def __init__(self, rows: list[tuple], description: list[tuple] | None):
+        self.description = description
+        self._rows = rows
+        self._pos = 0
+
+    def fetchone(self) -> tuple | None:
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchall(self) -> list[tuple]:
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def fetchmany(self, size: int = 1) -> list[tuple]:
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+
+def parse_address(address: str) -> str | tuple[str, int]:
+    """A Unix socket path, or host:port for TCP."""
+    if not address.startswith("/") and ":" in address:
+        host, port = address.rsplit(":", 1)
+        return host, int(port)
+    return address
+
+
+def _remote_query(query: str, params: list | None) -> RemoteResult:
+    client = getattr(_clients, "conn", None)
+    if client is None:
+        client = _clients.conn = Client(
+            parse_address(settings.db_server_address), authkey=settings.db_server_authkey.encode(),
+        )
+    try:
+        client.send((query, params))
+        reply = client.recv()
+    except (EOFError, OSError):
+        _clients.conn = None
+        raise
+    if reply[0] == "error":
+        _, error_type, message = reply
+        raise getattr(duckdb, error_type, duckdb.Error)(message)
+    return RemoteResult(reply[1], reply[2])
 
 
 def get_conn() -> duckdb.DuckDBPyConnection:
@@ -19,17 +74,72 @@ def get_conn() -> duckdb.DuckDBPyConnection:
         return _conn
 
 
-def execute_query(query: str, params: list | None = None) -> duckdb.DuckDBPyConnection:
-    """Thread-safe query execution using a cursor."""
+def execute_query(query: str, params: list | None = None) -> duckdb.DuckDBPyConnection | RemoteResult:
+    """Thread-safe query execution using a cursor.
+
+    With `DB_SERVER_ADDRESS` set, the statement runs in the DB writer process
+    (see backend/dbserver.py) and its rows come back already fetched.
+    """
+    statement = query.split(None, 1)[0].upper()
+    start = time.perf_counter()
+    if settings.db_server_address:
+        result = _remote_query(query, params)
+        metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement, "remote")
+        return result
     conn = get_conn()
     with _lock:
+        locked = time.perf_counter()
         cursor = conn.cursor()
+    metrics.DB_LOCK_WAIT_SECONDS.observe(locked - start)
     if params:
-        return cursor.execute(query, params)
-    return cursor.execute(query)
+        result = cursor.execute(query, params)
+    else:
+        result = cursor.execute(query)
+    metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - locked, statement, "local")
+    return result
+
+
+# A response counts once per sub-question: multi-sample responses split that vote
+# across options by their sample counts, single-draw responses put it all on the answer
+_BACKFILL_ANSWERS = """
+    INSERT INTO survey_answers
+    WITH todo AS (
+        SELECT * FROM survey_responses sr
+        WHERE NOT EXISTS (SELECT 1 FROM survey_answers a WHERE a.response_id = sr.id)
+    ),
+    picked AS (
+        SELECT *, '$."' || sub_question_id || '"' AS path
+        FROM (
+            SELECT id, survey_id, respondent_id, model, answers, answer_distribution,
+                   unnest(json_keys(answers)) AS sub_question_id
+            FROM todo
+        )
+    ),
+    sampled AS (
+        SELECT *, json_extract(answer_distribution, path) AS votes
+        FROM picked
+        WHERE json_extract(answer_distribution, path) IS NOT NULL
+    )
+    SELECT survey_id, id, respondent_id, model, sub_question_id, json_extract_string(answers, path), 1.0
+    FROM picked
+    WHERE json_extract(answer_distribution, path) IS NULL
+      AND json_extract_string(answers, path) IS NOT NULL
+    UNION ALL
+    SELECT survey_id, id, respondent_id, model, sub_question_id, option,
+           n / sum(n) OVER (PARTITION BY id, sub_question_id)
+    FROM (
+        SELECT survey_id, id, respondent_id, model, sub_question_id, option,
+               CAST(json_extract(votes, '$."' || option || '"') AS DOUBLE) AS n
+        FROM (SELECT *, unnest(json_keys(votes)) AS option FROM sampled)
+    )
+    WHERE n > 0
+"""
 
 
 def init_db() -> None:
+    if settings.db_server_address:
+        logger.info("Using DB writer at %s", settings.db_server_address)
+        return
     conn = get_conn()
     csv_path = Path(settings.csv_path)
     if not csv_path.exists():
@@ -74,6 +184,124 @@ def init_db() -> None:
             except duckdb.CatalogException:
                 pass  # column already exists
 
+        # Per-option vote counts for multi-sample responses (safe to re-run)
+        try:
+            conn.execute("ALTER TABLE survey_responses ADD COLUMN answer_distribution JSON")
+        except duckdb.CatalogException:
+            pass  # column already exists
+
+        # The model that actually answered when routing sent the call to another one of its group
+        try:
+            conn.execute("ALTER TABLE survey_responses ADD COLUMN served_model VARCHAR")
+        except duckdb.CatalogException:
+            pass  # column already exists
+
+        # One row per (response, sub-question, option) for analysis without decoding JSON
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS survey_answers (
+                survey_id VARCHAR NOT NULL,
+                response_id VARCHAR NOT NULL,
+                respondent_id INTEGER NOT NULL,
+                model VARCHAR NOT NULL,
+                sub_question_id VARCHAR NOT NULL,
+                option VARCHAR NOT NULL,
+                weight DOUBLE NOT NULL,
+                PRIMARY KEY (response_id, sub_question_id, option)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_survey_answers_survey ON survey_answers (survey_id, sub_question_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_survey_answers_respondent ON survey_answers (respondent_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_respondents_id ON respondents (id)")
+
+        # Backfill answers of responses saved before the table existed (safe to re-run)
+        conn.execute(_BACKFILL_ANSWERS)
+
+        # LangGraph checkpoints for resumable runs (see backend/graph/checkpoint.py)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS graph_checkpoints (
+                thread_id VARCHAR NOT NULL,
+                checkpoint_ns VARCHAR NOT NULL DEFAULT '',
+                checkpoint_id VARCHAR NOT NULL,
+                parent_checkpoint_id VARCHAR,
+                type VARCHAR,
+                checkpoint BLOB NOT NULL,
+                metadata_type VARCHAR,
+                metadata BLOB,
+                created_at TIMESTAMP DEFAULT current_timestamp,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            )
+        """)
+
+        # Persona-call input tokens per prompt section, summed per survey and model
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS prompt_token_sections (
+                survey_id VARCHAR NOT NULL,
+                model VARCHAR NOT NULL,
+                section VARCHAR NOT NULL,
+                calls INTEGER NOT NULL,
+                tokens BIGINT NOT NULL,
+                PRIMARY KEY (survey_id, model, section)
+            )
+        """)
+
+        # One row per provider call: tokens, latency and cost (see backend/services/ledger.py)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_calls (
+                survey_id VARCHAR NOT NULL,
+                model VARCHAR NOT NULL,
+                provider VARCHAR NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                latency_s DOUBLE NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                cached_input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                cost_usd DOUBLE NOT NULL,
+                error VARCHAR
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_survey ON llm_calls (survey_id)")
+
+        # Analyzer breakdowns by normalized question and model (see backend/services/breakdowns.py)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS breakdown_cache (
+                key VARCHAR PRIMARY KEY,
+                model VARCHAR NOT NULL,
+                normalized_question TEXT NOT NULL,
+                breakdown JSON NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT current_timestamp
+            )
+        """)
+
+        # Span timeline of each run, compressed (see backend/services/profiling.py)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS run_profiles (
+                survey_id VARCHAR NOT NULL,
+                started_at TIMESTAMP NOT NULL,
+                status VARCHAR,
+                duration_s DOUBLE,
+                span_count INTEGER,
+                spans BLOB NOT NULL,
+                cpu_profile BLOB,
+                PRIMARY KEY (survey_id, started_at)
+            )
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS graph_writes (
+                thread_id VARCHAR NOT NULL,
+                checkpoint_ns VARCHAR NOT NULL DEFAULT '',
+                checkpoint_id VARCHAR NOT NULL,
+                task_id VARCHAR NOT NULL,
+                idx INTEGER NOT NULL,
+                channel VARCHAR NOT NULL,
+                type VARCHAR,
+                value BLOB,
+                task_path VARCHAR NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            )
+        """)
+
     count = execute_query("SELECT COUNT(*) FROM respondents").fetchone()
     logger.info("Database initialized with %d respondents", count[0] if count else 0)
 
@@ -0,0 +1,106 @@
+"""DuckDB writer process: the one process that owns the database file.
+
+DuckDB allows a single writing process per file. When jobs run in worker
+processes (`JOB_PROCESSES` > 0) or several API processes share one
+database, every process except the writer sets `DB_SERVER_ADDRESS` and
+`execute_query` forwards each statement here over a local socket
+(`multiprocessing.connection`, authenticated with `DB_SERVER_AUTHKEY`).
+
+Run standalone with `python -m backend.dbserver`, or let the API process
+serve its own connection (see `serve_in_background`).
+"""
+import logging
+import os
+import secrets
+import tempfile
+import threading
+from multiprocessing.connection import Listener
+
+import duckdb
+
+from backend.config import settings
+from backend.db import execute_query, init_db, parse_address
+
+logger = logging.getLogger(__name__)
+
+_listener: Listener | None = None
+_listener_lock = threading.Lock()
+
+
+def _handle(conn) -> None:
+    """Run one client's statements in order until it disconnects.
+
+    Every request gets a reply, so a client is never left waiting: a bad
+    payload or a result that cannot be pickled is answered with an error
+    and the connection keeps serving.
+    """
+    with conn:
+        while True:
+            try:
+                query, params = conn.recv()
+                cursor = execute_query(query, params)
+                if cursor.description:
+                    description = [(d[0], str(d[1])) for d in cursor.description]
+                    reply = ("ok", cursor.fetchall(), description)
+                else:
+                    reply = ("ok", [], None)
+            except (EOFError, OSError):
+                return
+            except duckdb.Error as exc:
+                reply = ("error", type(exc).__name__, str(exc))
+            except Exception as exc:
+                logger.exception("DB client request failed")
+                reply = ("error", type(exc).__name__, str(exc))
+            try:
+                conn.send(reply)
+            except (EOFError, OSError):
+                return
+            except Exception as exc:
+                logger.exception("Could not send DB reply")
+                conn.send(("error", type(exc).__name__, str(exc)))
+
+
+def _accept(listener: Listener) -> None:
+    while True:
+        try:
+            conn = listener.accept()
+        except OSError:
+            return  # listener closed
+        except Exception:
+            logger.exception("Rejected DB client connection")
+            continue
+        threading.Thread(target=_handle, args=(conn,), daemon=True).start()
+
+
+def serve_in_background() -> tuple[str, str]:
+    """Serve this process's connection to worker processes; returns (address, authkey).
+
+    Listens on a private Unix socket. Safe to call more than once.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            address = os.path.join(tempfile.mkdtemp(prefix="panel-chat-"), "db.sock")
+            authkey = settings.db_server_authkey or secrets.token_hex(16)
+            settings.db_server_authkey = authkey
+            _listener = Listener(parse_address(address), authkey=authkey.encode())
+            threading.Thread(target=_accept, args=(_listener,), name="db-server", daemon=True).start()
+            logger.info("DB writer listening on %s", address)
+        return str(_listener.address), settings.db_server_authkey
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    if not settings.db_server_address or not settings.db_server_authkey:
+        raise SystemExit("Set DB_SERVER_ADDRESS and DB_SERVER_AUTHKEY for clients to connect")
+    # This process is the writer: open the file directly
+    address = settings.db_server_address
+    settings.db_server_address = ""
+    init_db()
+    listener = Listener(parse_address(address), authkey=settings.db_server_authkey.encode())
+    logger.info("DB writer for %s listening on %s", settings.duckdb_path, address)
+    _accept(listener)
+
+
+if __name__ == "__main__":
+    main()
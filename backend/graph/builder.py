@@ -1,10 +1,35 @@
+from functools import partial
+
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.types import Send
 
-from backend.graph.state import SurveyState, DebateState
-from backend.graph.nodes import survey_respond, debate_respond, collect_round, analyze_debate
+from backend.graph.state import SurveyState, CascadeState, DebateState
+from backend.graph.context import publish_context
+from backend.graph.topology import agent_key
+from backend.graph.nodes import (
+    survey_respond,
+    cascade_screen,
+    cascade_escalate,
+    collect_screen,
+    cascade_report,
+    debate_respond_barrier,
+    debate_round,
+    collect_round,
+    analyze_debate,
+)
 from backend.models.respondent import Respondent
+from backend.services import metrics
+from backend.services.profiling import traced
 from backend.services.llm import _detect_provider
+from backend.services.pricing import rank_by_price
+
+
+def _routing(state: SurveyState | DebateState) -> dict:
+    """Send fields for routed runs: persona nodes need every key to fail over across providers."""
+    if not state.get("routing"):
+        return {}
+    return {"routing": True, "api_keys": state["api_keys"]}
 
 
 def _fan_out(state: SurveyState) -> list[Send]:
@@ -17,6 +42,7 @@ def _fan_out(state: SurveyState) -> list[Send]:
     question = state["question"]
     survey_id = state["survey_id"]
     persona_memory = state.get("persona_memory", True)
+    samples_per_persona = state.get("samples_per_persona", 1)
 
     sends = []
     for respondent_dict in panel:
@@ -37,44 +63,145 @@ def _fan_out(state: SurveyState) -> list[Send]:
                 "temperature": temp,
                 "survey_id": survey_id,
                 "persona_memory": persona_memory,
+                "samples_per_persona": samples_per_persona,
+                **_routing(state),
             }))
+    metrics.FANOUT_SIZE.observe(len(sends), "survey")
     return sends
 
 
-def build_survey_graph() -> StateGraph:
+def build_survey_graph(checkpointer: BaseCheckpointSaver | None = None) -> StateGraph:
     """Simple single fan-out graph: START -> fan_out -> survey_respond -> END."""
     graph = StateGraph(SurveyState)
 
-    graph.add_node("survey_respond", survey_respond)
+    graph.add_node("survey_respond", traced("survey_respond", survey_respond))
 
     # START -> fan out to all agent+model combos
     graph.add_conditional_edges(START, _fan_out, ["survey_respond"])
     # All responses -> END (no collect/loop needed)
     graph.add_edge("survey_respond", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
 
 
 # ---------------------------------------------------------------------------
-# Debate graph: discussion rounds -> collect (raw transcript) -> loop -> analyze -> END
+# Cascade graph: cheap screen -> collect -> escalate uncertain personas -> report
 # ---------------------------------------------------------------------------
 
-def _build_raw_transcript(debate_messages: list[dict], up_to_round: int) -> str:
-    """Build the full raw transcript of all debate messages up to (and including) a given round."""
-    transcript_parts: list[str] = []
-    for round_num in range(1, up_to_round + 1):
-        round_msgs = [m for m in debate_messages if m.get("round") == round_num]
-        if not round_msgs:
-            continue
-        transcript_parts.append(f"--- Round {round_num} ---")
-        for msg in round_msgs:
-            transcript_parts.append(f"{msg['agent_name']}: {msg['text']}")
-        transcript_parts.append("")
-    return "\n".join(transcript_parts).strip()
+def resolve_cascade_models(
+    models: list[str],
+    api_keys: dict[str, str],
+    cheap_model: str | None = None,
+    expensive_model: str | None = None,
+) -> tuple[str, str]:
+    """Pick the (cheap, expensive) model pair among the survey's models that have an API key.
+
+    Raises ValueError as `pick_cascade_pair` does, or if no model has a key.
+    """
+    usable = [m for m in models if api_keys.get(_detect_provider(m))]
+    if not usable:
+        raise ValueError("No model with an API key for cascade")
+    return pick_cascade_pair(usable, cheap_model, expensive_model)
+
+
+def pick_cascade_pair(
+    usable: list[str],
+    cheap_model: str | None = None,
+    expensive_model: str | None = None,
+) -> tuple[str, str]:
+    """The (cheap, expensive) pair among `usable`, defaulting to the cheapest and priciest.
+
+    Raises ValueError if an override is not one of them, or if both resolve
+    to the same model: escalating to it would pay twice for the same answer.
+    """
+    for override in (cheap_model, expensive_model):
+        if override and override not in usable:
+            raise ValueError(f"Cascade model {override} is not one of the survey's models with an API key")
+    ranked = rank_by_price(usable)
+    cheap, expensive = cheap_model or ranked[0], expensive_model or ranked[-1]
+    if cheap == expensive:
+        raise ValueError("Cascade needs two different models with API keys")
+    return cheap, expensive
+
+
+def _cascade_send(state: CascadeState, respondent_dict: dict, agent_name: str, model: str, stage: str) -> Send | None:
+    api_key = state["api_keys"].get(_detect_provider(model), "")
+    if not api_key:
+        return None
+    node = "cascade_screen" if stage == "screen" else "cascade_escalate"
+    return Send(node, {
+        "respondent": respondent_dict,
+        "agent_name": agent_name,
+        "sub_questions": state["sub_questions"],
+        "question": state["question"],
+        "model": model,
+        "api_key": api_key,
+        "temperature": state.get("temperatures", {}).get(model),
+        "survey_id": state["survey_id"],
+        "persona_memory": state.get("persona_memory", True),
+        "stage": stage,
+        "confidence_threshold": state["confidence_threshold"],
+    })
+
+
+def _cascade_fan_out(state: CascadeState) -> list[Send]:
+    """Fan out: every respondent is screened once on the cheap model."""
+    sends = []
+    for respondent_dict in state["panel"]:
+        agent_name = Respondent(**respondent_dict).display_name()
+        send = _cascade_send(state, respondent_dict, agent_name, state["cheap_model"], "screen")
+        if send:
+            sends.append(send)
+    metrics.FANOUT_SIZE.observe(len(sends), "cascade_screen")
+    return sends
+
+
+def _escalate_fan_out(state: CascadeState) -> list[Send] | str:
+    """Re-ask only the low-confidence personas on the expensive model."""
+    sends = []
+    for escalation in state.get("escalations", []):
+        send = _cascade_send(
+            state, escalation["respondent"], escalation["agent_name"],
+            state["expensive_model"], "escalate",
+        )
+        if send:
+            sends.append(send)
+    metrics.FANOUT_SIZE.observe(len(sends), "cascade_escalate")
+    return sends or "cascade_report"
+
+
+def build_cascade_graph(checkpointer: BaseCheckpointSaver | None = None) -> StateGraph:
+    """Cascade: screen (cheap) -> collect -> escalate (expensive) -> report -> END."""
+    graph = StateGraph(CascadeState)
 
+    graph.add_node("cascade_screen", traced("cascade_screen", cascade_screen))
+    graph.add_node("collect_screen", traced("collect_screen", collect_screen))
+    graph.add_node("cascade_escalate", traced("cascade_escalate", cascade_escalate))
+    graph.add_node("cascade_report", traced("cascade_report", cascade_report))
+
+    graph.add_conditional_edges(START, _cascade_fan_out, ["cascade_screen"])
+    graph.add_edge("cascade_screen", "collect_screen")
+    graph.add_conditional_edges(
+        "collect_screen",
+        _escalate_fan_out,
+        ["cascade_escalate", "cascade_report"],
+    )
+    graph.add_edge("cascade_escalate", "cascade_report")
+    graph.add_edge("cascade_report", END)
+
+    return graph.compile(checkpointer=checkpointer)
+
+
+# ---------------------------------------------------------------------------
+# Debate graph: discussion rounds -> collect (round context) -> loop -> analyze -> END
+# ---------------------------------------------------------------------------
 
 def _debate_fan_out(state: DebateState) -> list[Send]:
-    """Fan out for an open-ended discussion round, passing full raw transcript."""
+    """Fan out for an open-ended discussion round.
+
+    The prior-rounds context was built once in `collect_round`; it is published
+    to the shared context store and each Send carries only its round key.
+    """
     panel = state["panel"]
     models = state["models"]
     api_keys = state["api_keys"]
@@ -84,10 +211,17 @@ def _debate_fan_out(state: DebateState) -> list[Send]:
     persona_memory = state.get("persona_memory", True)
     current_round = state["current_round"]
     num_rounds = state["num_rounds"]
-    debate_messages = state.get("debate_messages", [])
 
-    # Build the raw transcript of all prior rounds
-    prior_transcript = _build_raw_transcript(debate_messages, current_round - 1)
+    publish_context(survey_id, current_round, state.get("round_context", ""))
+
+    # Sparse topologies: each agent reads only its k assigned peers from last round
+    sparse = state.get("topology", "full") != "full" and current_round > 1
+    latest_msgs: list[dict] = []
+    peer_assignments: dict[str, list[int]] = {}
+    if sparse:
+        latest_msgs = [m for m in state.get("debate_messages", []) if m.get("round") == current_round - 1]
+        peer_assignments = state.get("peer_assignments", {})
+        own_by_agent = {agent_key(m["respondent_id"], m["model"]): m["text"] for m in latest_msgs}
 
     sends = []
     for respondent_dict in panel:
@@ -98,7 +232,7 @@ def _debate_fan_out(state: DebateState) -> list[Send]:
             if not api_key:
                 continue
             temp = temperatures.get(model)
-            sends.append(Send("debate_respond", {
+            payload = {
                 "respondent": respondent_dict,
                 "agent_name": respondent.display_name(),
                 "question": question,
@@ -109,38 +243,70 @@ def _debate_fan_out(state: DebateState) -> list[Send]:
                 "persona_memory": persona_memory,
                 "round_number": current_round,
                 "num_rounds": num_rounds,
-                "prior_transcript": prior_transcript,
-            }))
+                "context_round": current_round,
+                **_routing(state),
+            }
+            if sparse:
+                key = agent_key(respondent.id, model)
+                payload["peer_messages"] = [
+                    {"agent_name": latest_msgs[i]["agent_name"], "text": latest_msgs[i]["text"]}
+                    for i in peer_assignments.get(key, [])
+                ]
+                payload["own_statement"] = own_by_agent.get(key)
+            sends.append(Send("debate_respond", payload))
+    metrics.FANOUT_SIZE.observe(len(sends), "debate")
     return sends
 
 
-def build_debate_graph() -> StateGraph:
-    """Multi-round debate: discussion -> collect -> loop -> analyze -> END."""
+def build_debate_graph(round_policy: str = "barrier", checkpointer: BaseCheckpointSaver | None = None) -> StateGraph:
+    """Multi-round debate: discussion -> collect -> loop -> analyze -> END.
+
+    "barrier" fans out one `debate_respond` Send per agent and waits for all
+    of them. "quorum" runs each round inside a single `debate_round` node that
+    closes at a quorum fraction or deadline and carries stragglers forward.
+    """
     graph = StateGraph(DebateState)
 
-    graph.add_node("debate_respond", debate_respond)
-    graph.add_node("collect_round", collect_round)
-    graph.add_node("analyze_debate", analyze_debate)
+    graph.add_node("collect_round", traced("collect_round", collect_round))
+    graph.add_node("analyze_debate", traced("analyze_debate", analyze_debate))
 
-    # START -> fan out for round 1
-    graph.add_conditional_edges(START, _debate_fan_out, ["debate_respond"])
+    if round_policy == "quorum":
+        graph.add_node("debate_round", traced("debate_round", partial(debate_round, fan_out=_debate_fan_out)))
+        graph.add_edge(START, "debate_round")
+        graph.add_edge("debate_round", "collect_round")
 
-    # All debate responses -> collect (increments round counter)
-    graph.add_edge("debate_respond", "collect_round")
+        def _after_collect(state: DebateState) -> str:
+            if state["current_round"] > state["num_rounds"]:
+                return "analyze_debate"
+            return "debate_round"
 
-    # After collect: if more rounds, fan out again; otherwise run analysis
-    def _after_collect(state: DebateState) -> list[Send] | str:
-        if state["current_round"] > state["num_rounds"]:
-            return "analyze_debate"
-        return _debate_fan_out(state)
+        graph.add_conditional_edges(
+            "collect_round",
+            _after_collect,
+            ["debate_round", "analyze_debate"],
+        )
+    else:
+        graph.add_node("debate_respond", traced("debate_respond", debate_respond_barrier))
 
-    graph.add_conditional_edges(
-        "collect_round",
-        _after_collect,
-        ["debate_respond", "analyze_debate"],
-    )
+        # START -> fan out for round 1
+        graph.add_conditional_edges(START, _debate_fan_out, ["debate_respond"])
+
+        # All debate responses -> collect (increments round counter)
+        graph.add_edge("debate_respond", "collect_round")
+
+        # After collect: if more rounds, fan out again; otherwise run analysis
+        def _after_collect(state: DebateState) -> list[Send] | str:
+            if state["current_round"] > state["num_rounds"]:
+                return "analyze_debate"
+            return _debate_fan_out(state)
+
+        graph.add_conditional_edges(
+            "collect_round",
+            _after_collect,
+            ["debate_respond", "analyze_debate"],
+        )
 
     # Analysis -> END
     graph.add_edge("analyze_debate", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
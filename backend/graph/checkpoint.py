@@ -0,0 +1,250 @@
+"""LangGraph checkpointer that stores graph state in the app's DuckDB file.
+
+One thread per survey (`thread_id` = survey_id). A checkpoint holds the full
+state after each super-step; `put_writes` records each finished task of the
+current super-step, so a resumed run skips the (respondent, model) tasks
+that already completed and re-runs only the missing ones.
+
+API keys are never written to disk: `api_keys` / `api_key` values are
+blanked before serialization and filled back in from the keys the
+reconnecting client supplied (see `register_keys`).
+"""
+import logging
+import threading
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.types import Send
+
+from backend.db import execute_query
+from backend.services.llm import _detect_provider
+
+logger = logging.getLogger(__name__)
+
+_keys: dict[str, dict[str, str]] = {}  # thread_id -> api keys supplied on (re)connect
+_keys_lock = threading.Lock()
+
+
+def register_keys(thread_id: str, api_keys: dict[str, str]) -> None:
+    with _keys_lock:
+        _keys[thread_id] = dict(api_keys)
+
+
+def release_keys(thread_id: str) -> None:
+    with _keys_lock:
+        _keys.pop(thread_id, None)
+
+
+def _with_keys(value: Any, api_keys: dict[str, str] | None) -> Any:
+    """Copy of `value` with API keys blanked (None) or restored from `api_keys`."""
+    if isinstance(value, Send):
+        return Send(value.node, _with_keys(value.arg, api_keys))
+    if isinstance(value, list):
+        return [_with_keys(v, api_keys) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_with_keys(v, api_keys) for v in value)
+    if not isinstance(value, dict):
+        return value
+    out = {k: _with_keys(v, api_keys) for k, v in value.items()}
+    if "api_keys" in out:
+        out["api_keys"] = dict(api_keys) if api_keys else {}
+    if "api_key" in out and "model" in out:
+        out["api_key"] = (api_keys or {}).get(_detect_provider(out["model"]), "")
+    return out
+
+
+class DuckDBSaver(BaseCheckpointSaver[int]):
+    """Checkpoints and pending writes in the `graph_checkpoints` / `graph_writes` tables."""
+
+    def _keys_for(self, thread_id: str) -> dict[str, str] | None:
+        with _keys_lock:
+            return _keys.get(thread_id)
+
+    def _dumps_checkpoint(self, checkpoint: Checkpoint) -> tuple[str, bytes]:
+        return self.serde.dumps_typed(
+            {**checkpoint, "channel_values": _with_keys(checkpoint["channel_values"], None)}
+        )
+
+    def _loads_checkpoint(self, thread_id: str, type_: str, blob: bytes) -> Checkpoint:
+        checkpoint = self.serde.loads_typed((type_, blob))
+        checkpoint["channel_values"] = _with_keys(checkpoint["channel_values"], self._keys_for(thread_id))
+        return checkpoint
+
+    def _dumps_write(self, channel: str, value: Any) -> tuple[str, bytes]:
+        if channel == "api_keys":
+            value = {}
+        return self.serde.dumps_typed(_with_keys(value, None))
+
+    def _loads_write(self, thread_id: str, channel: str, type_: str, blob: bytes) -> Any:
+        api_keys = self._keys_for(thread_id)
+        if channel == "api_keys":
+            return dict(api_keys or {})
+        return _with_keys(self.serde.loads_typed((type_, blob)), api_keys)
+
+    def _writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list[tuple[str, str, Any]]:
+        rows = execute_query(
+            """SELECT task_id, channel, type, value FROM graph_writes
+               WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+               ORDER BY task_path, task_id, idx""",
+            [thread_id, checkpoint_ns, checkpoint_id],
+        ).fetchall()
+        return [(r[0], r[1], self._loads_write(thread_id, r[1], r[2], r[3])) for r in rows]
+
+    def _tuple(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self._loads_checkpoint(thread_id, type_, checkpoint),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=self._writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = """SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                          type, checkpoint, metadata_type, metadata
+                   FROM graph_checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"""
+        params: list = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        row = execute_query(query, params).fetchone()
+        return self._tuple(row) if row else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses: list[str] = []
+        params: list = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = execute_query(
+            f"""SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                       type, checkpoint, metadata_type, metadata
+                FROM graph_checkpoints {where} ORDER BY checkpoint_id DESC""",
+            params,
+        ).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            item = self._tuple(row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, blob = self._dumps_checkpoint(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        execute_query(
+            """INSERT OR REPLACE INTO graph_checkpoints
+               (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                type, checkpoint, metadata_type, metadata)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+             type_, blob, metadata_type, metadata_blob],
+        )
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, blob = self._dumps_write(channel, value)
+            # Regular writes are written once per task; special channels (errors, interrupts) overwrite
+            verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+            execute_query(
+                f"""{verb} INTO graph_writes
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, blob, task_path],
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        execute_query("DELETE FROM graph_writes WHERE thread_id = ?", [thread_id])
+        execute_query("DELETE FROM graph_checkpoints WHERE thread_id = ?", [thread_id])
+
+    def compact_thread(self, thread_id: str) -> None:
+        """Keep only the latest checkpoint of a finished run (enough to know it finished)."""
+        latest = execute_query(
+            "SELECT max(checkpoint_id) FROM graph_checkpoints WHERE thread_id = ?", [thread_id],
+        ).fetchone()
+        if not latest or latest[0] is None:
+            return
+        execute_query(
+            "DELETE FROM graph_writes WHERE thread_id = ? AND checkpoint_id <> ?", [thread_id, latest[0]],
+        )
+        execute_query(
+            "DELETE FROM graph_checkpoints WHERE thread_id = ? AND checkpoint_id <> ?", [thread_id, latest[0]],
+        )
+        # The survivor's parent is gone
+        execute_query(
+            "UPDATE graph_checkpoints SET parent_checkpoint_id = NULL WHERE thread_id = ?", [thread_id],
+        )
+
+
+checkpointer = DuckDBSaver()
@@ -0,0 +1,27 @@
+"""Process-local store for per-round debate context.
+
+The context for a round is built once in `collect_round` and published here;
+each `debate_respond` Send carries only the round number and reads the shared
+string by reference instead of every payload holding its own copy.
+"""
+import threading
+
+_contexts: dict[tuple[str, int], str] = {}
+_lock = threading.Lock()
+
+
+def publish_context(survey_id: str, round_number: int, text: str) -> None:
+    with _lock:
+        _contexts[(survey_id, round_number)] = text
+
+
+def get_context(survey_id: str, round_number: int) -> str:
+    with _lock:
+        return _contexts.get((survey_id, round_number), "")
+
+
+def release_contexts(survey_id: str) -> None:
+    """Drop all published rounds for a finished (or abandoned) debate."""
+    with _lock:
+        for key in [k for k in _contexts if k[0] == survey_id]:
+            del _contexts[key]
@@ -1,20 +1,57 @@
 import json
 import logging
+import math
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from functools import partial
 
 from langchain_core.messages import SystemMessage, HumanMessage
-from backend.graph.state import SurveyAgentState, DebateAgentState, DebateState
+from langgraph.config import get_stream_writer
+from backend.config import settings
+from backend.graph import partials, stragglers
+from backend.graph.context import get_context
+from backend.graph.prefetch import get_prompt
+from backend.graph.positions import precluster, preview_analysis
+from backend.graph.topology import agent_key, select_peers
+from backend.graph.state import (
+    SurveyAgentState,
+    CascadeAgentState,
+    CascadeState,
+    DebateAgentState,
+    DebateState,
+)
 from backend.graph.prompts import (
     PERSONA_SYSTEM,
     PERSONA_MEMORY_BLOCK,
     SURVEY_USER,
+    SURVEY_CONFIDENCE_SUFFIX,
     DEBATE_DISCUSS_USER,
     DEBATE_DISCUSS_FOLLOWUP_USER,
-    DEBATE_ANALYSIS_SYSTEM,
-    DEBATE_ANALYSIS_USER,
+    DEBATE_DISCUSS_PEERS_USER,
+    DEBATE_DIGEST_SYSTEM,
+    DEBATE_DIGEST_USER,
+    DEBATE_MAP_SYSTEM,
+    DEBATE_MAP_USER,
+    DEBATE_REDUCE_SYSTEM,
+    DEBATE_REDUCE_USER,
+)
+from backend.models.survey import ClusterLabeling, RoundAnalysis
+from backend.services.llm import (
+    BudgetExceeded,
+    RunCancelled,
+    call_llm,
+    call_routed,
+    get_llm,
+    model_name,
+    supports_logprobs,
+    supports_native_samples,
 )
-from backend.models.survey import DebateAnalysis
-from backend.services.llm import get_llm
-from backend.services.history import get_respondent_history
+from backend.services import cassettes, metrics, profiling
+from backend.services.history import get_history_entries, get_respondent_history, list_history_responses
+from backend.services.pricing import estimate_cost
+from backend.services.tokens import estimate_tokens, record_sections, split_input_tokens, truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -28,45 +65,46 @@ def _format_sub_questions(sub_questions: list[dict]) -> str:
     return "\n".join(lines)
 
 
-def _format_history(history: list[dict]) -> str:
-    """Format past survey answers into a readable memory block."""
-    if not history:
-        return ""
+def _format_history_entry(number: int, entry: dict) -> str:
+    """One past survey and the persona's answers to it, as a memory section."""
+    sq_lookup = {sq["id"]: sq["text"] for sq in entry.get("sub_questions", [])}
 
-    sections = []
-    for i, entry in enumerate(history, 1):
-        question = entry["question"]
-        answers = entry["answers"]
-        sub_questions = entry.get("sub_questions", [])
+    answer_lines = []
+    for sq_id, answer in entry["answers"].items():
+        sq_text = sq_lookup.get(sq_id, sq_id)
+        answer_lines.append(f"  - {sq_text}: **{answer}**")
 
-        sq_lookup = {sq["id"]: sq["text"] for sq in sub_questions}
+    return f"**Survey {number}**: \"{entry['question']}\"\n" + "\n".join(answer_lines)
 
-        answer_lines = []
-        for sq_id, answer in answers.items():
-            sq_text = sq_lookup.get(sq_id, sq_id)
-            answer_lines.append(f"  - {sq_text}: **{answer}**")
 
-        section = f"**Survey {i}**: \"{question}\"\n" + "\n".join(answer_lines)
-        sections.append(section)
+def _format_history(history: list[dict]) -> str:
+    """Format past survey answers into a readable memory block."""
+    if not history:
+        return ""
 
-    history_text = "\n\n".join(sections)
+    history_text = "\n\n".join(_format_history_entry(i, entry) for i, entry in enumerate(history, 1))
 
     return PERSONA_MEMORY_BLOCK.format(history_text=history_text)
 
 
-def _build_system_prompt(respondent: dict, survey_id: str, persona_memory: bool) -> str:
-    """Build the persona system prompt, optionally including memory."""
-    memory_block = ""
-    if persona_memory:
-        respondent_id = respondent["id"]
+def _memory_block(respondent: dict, survey_id: str, persona_memory: bool) -> str:
+    """The persona's answers to earlier surveys, or "" without memory."""
+    if not persona_memory:
+        return ""
+    respondent_id = respondent["id"]
+    with profiling.span(survey_id, "respondent_history", "db"):
         history = get_respondent_history(respondent_id, exclude_survey_id=survey_id)
-        if history:
-            logger.info(
-                "Persona %d has %d past surveys in memory",
-                respondent_id, len(history),
-            )
-            memory_block = _format_history(history)
+    if not history:
+        return ""
+    logger.info(
+        "Persona %d has %d past surveys in memory",
+        respondent_id, len(history),
+    )
+    return _format_history(history)
+
 
+def _build_system_prompt(respondent: dict, memory_block: str) -> str:
+    """Build the persona system prompt around an optional memory block."""
     return PERSONA_SYSTEM.format(
         role=respondent.get("role", "Unknown"),
         org_size=respondent.get("org_size", "Unknown"),
@@ -89,6 +127,31 @@ def _build_system_prompt(respondent: dict, survey_id: str, persona_memory: bool)
     )
 
 
+def _persona_prompt(respondent: dict, survey_id: str, persona_memory: bool) -> tuple[str, str]:
+    """The persona's system prompt and the memory block in it, rendered ahead of the run if possible."""
+    if persona_memory:
+        prefetched = get_prompt(survey_id, respondent["id"])
+        if prefetched:
+            return prefetched
+    memory_block = _memory_block(respondent, survey_id, persona_memory)
+    return _build_system_prompt(respondent, memory_block), memory_block
+
+
+def render_persona_prompts(survey_id: str, panel: list[dict]) -> dict[int, tuple[str, str]]:
+    """System prompts with memory for the whole panel, from two history queries rather than one per persona."""
+    history: dict[int, list[dict]] = {}
+    listed = list_history_responses([r["id"] for r in panel], exclude_survey_id=survey_id)
+    entries = get_history_entries([response_id for _, response_id in listed])
+    for respondent_id, response_id in listed:
+        if response_id in entries:
+            history.setdefault(respondent_id, []).append(entries[response_id])
+    prompts = {}
+    for respondent in panel:
+        memory_block = _format_history(history.get(respondent["id"], []))
+        prompts[respondent["id"]] = (_build_system_prompt(respondent, memory_block), memory_block)
+    return prompts
+
+
 def _extract_token_usage(response) -> dict | None:
     """Extract token usage from LLM response metadata."""
     token_usage = None
@@ -100,6 +163,9 @@ def _extract_token_usage(response) -> dict | None:
             "input_tokens": input_tok or 0,
             "output_tokens": output_tok or 0,
         }
+        details = (usage_meta.get("input_token_details") if isinstance(usage_meta, dict) else None) or {}
+        if details.get("cache_read"):
+            token_usage["cached_input_tokens"] = details["cache_read"]
     elif hasattr(response, "response_metadata"):
         meta = response.response_metadata or {}
         usage = meta.get("usage") or meta.get("token_usage") or {}
@@ -111,6 +177,80 @@ def _extract_token_usage(response) -> dict | None:
     return token_usage
 
 
+def _attribute_input_tokens(
+    survey_id: str,
+    model: str,
+    token_usage: dict | None,
+    section_chars: dict[str, int],
+    requests: int = 1,
+) -> dict | None:
+    """Split the call's input tokens across prompt sections and add them to the survey's totals.
+
+    Returns the token usage with an `input_sections` breakdown, or None if
+    the provider reported no usage (its estimate still counts in the totals).
+    """
+    sections = split_input_tokens(
+        model, section_chars, token_usage["input_tokens"] if token_usage else None, requests,
+    )
+    record_sections(survey_id, model, sections)
+    for section, tokens in sections.items():
+        metrics.PROMPT_SECTION_TOKENS.inc(model, section, amount=tokens)
+    return {**token_usage, "input_sections": sections} if token_usage else None
+
+
+def _sum_token_usage(usages: list[dict | None]) -> dict | None:
+    """Add up token usage across several calls, or None if none reported usage."""
+    reported = [u for u in usages if u]
+    if not reported:
+        return None
+    total = {
+        "input_tokens": sum(u["input_tokens"] for u in reported),
+        "output_tokens": sum(u["output_tokens"] for u in reported),
+    }
+    cached = sum(u.get("cached_input_tokens", 0) for u in reported)
+    if cached:
+        total["cached_input_tokens"] = cached
+    return total
+
+
+def _sample_completions(survey_id: str, llm, messages: list, model: str, samples: int) -> tuple[list[str], dict | None]:
+    """Draw several completions for one prompt.
+
+    Uses a single multi-completion request where the provider supports it
+    (the LLM must have been built with ``n=samples``), otherwise fans the same
+    prompt out as parallel calls.
+    """
+    if supports_native_samples(model):
+        result = call_llm(survey_id, lambda: llm.generate([messages]), model)
+        generations = result.generations[0]
+        # Usage is reported once for the whole request and repeated on every candidate
+        return (
+            [g.message.content for g in generations],
+            _extract_token_usage(generations[0].message),
+        )
+    responses = call_llm(survey_id, lambda: llm.batch([messages] * samples), model)
+    return (
+        [r.content for r in responses],
+        _sum_token_usage([_extract_token_usage(r) for r in responses]),
+    )
+
+
+def _tally_answers(samples: list[dict[str, str]], sub_questions: list[dict]) -> tuple[dict[str, str], dict[str, dict[str, int]]]:
+    """Count per-option votes across samples and pick the modal answer per sub-question.
+
+    Ties go to the option listed first, so the result is deterministic.
+    """
+    distribution: dict[str, dict[str, int]] = {}
+    answers: dict[str, str] = {}
+    for sq in sub_questions:
+        counts = {opt: 0 for opt in sq["answer_options"]}
+        for sample in samples:
+            counts[sample[sq["id"]]] += 1
+        distribution[sq["id"]] = {opt: n for opt, n in counts.items() if n}
+        answers[sq["id"]] = max(sq["answer_options"], key=lambda opt: counts[opt])
+    return answers, distribution
+
+
 def _get_summary_llm(state: DebateState):
     """Find the first model with a valid API key for summarization."""
     from backend.services.llm import _detect_provider
@@ -127,8 +267,8 @@ def _get_summary_llm(state: DebateState):
     return None
 
 
-def _parse_answers(content: str, sub_questions: list[dict]) -> dict[str, str]:
-    """Extract the JSON answer dict from LLM response, with fallback parsing."""
+def _extract_answer_json(content: str) -> dict | None:
+    """Extract the JSON object from an LLM response, or None if nothing parses."""
     text = content.strip()
     # Strip markdown code fences if present
     if text.startswith("```"):
@@ -137,32 +277,74 @@ def _parse_answers(content: str, sub_questions: list[dict]) -> dict[str, str]:
         text = "\n".join(lines).strip()
 
     try:
-        answers = json.loads(text)
+        parsed = json.loads(text)
     except json.JSONDecodeError:
         # Try to find JSON object in the response
         start = text.find("{")
         end = text.rfind("}")
-        if start != -1 and end != -1:
-            try:
-                answers = json.loads(text[start:end + 1])
-            except json.JSONDecodeError:
-                logger.warning("Failed to parse LLM response as JSON: %s", text[:200])
-                answers = {sq["id"]: sq["answer_options"][0] for sq in sub_questions}
-        else:
+        if start == -1 or end == -1:
             logger.warning("No JSON found in LLM response: %s", text[:200])
-            answers = {sq["id"]: sq["answer_options"][0] for sq in sub_questions}
+            metrics.ANSWER_FALLBACKS.inc("no_json")
+            return None
+        try:
+            parsed = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse LLM response as JSON: %s", text[:200])
+            metrics.ANSWER_FALLBACKS.inc("invalid_json")
+            return None
+        metrics.ANSWER_FALLBACKS.inc("embedded_json")
+    return parsed if isinstance(parsed, dict) else None
+
 
-    # Validate answers against valid options
+def _validate_answers(raw: dict | None, sub_questions: list[dict]) -> tuple[dict[str, str], list[str]]:
+    """Validate raw answers against valid options.
+
+    Returns (answers, fallback_ids) where fallback_ids lists the sub-questions
+    that were missing or invalid and fell back to the first option.
+    """
+    raw = raw or {}
     valid_answers: dict[str, str] = {}
-    sq_lookup = {sq["id"]: sq for sq in sub_questions}
-    for sq_id, sq_data in sq_lookup.items():
-        chosen = answers.get(sq_id, sq_data["answer_options"][0])
-        if chosen not in sq_data["answer_options"]:
-            logger.warning("Invalid answer '%s' for %s, using first option", chosen, sq_id)
-            chosen = sq_data["answer_options"][0]
+    fallback_ids: list[str] = []
+    for sq in sub_questions:
+        sq_id = sq["id"]
+        chosen = raw.get(sq_id)
+        if chosen not in sq["answer_options"]:
+            if chosen is not None:
+                logger.warning("Invalid answer '%s' for %s, using first option", chosen, sq_id)
+            metrics.ANSWER_FALLBACKS.inc("missing" if chosen is None else "invalid_option")
+            chosen = sq["answer_options"][0]
+            fallback_ids.append(sq_id)
         valid_answers[sq_id] = chosen
+    return valid_answers, fallback_ids
+
+
+def _parse_answers(content: str, sub_questions: list[dict]) -> dict[str, str]:
+    """Extract the JSON answer dict from LLM response, with fallback parsing."""
+    answers, _ = _validate_answers(_extract_answer_json(content), sub_questions)
+    return answers
+
 
-    return valid_answers
+def _logprob_confidence(response) -> float | None:
+    """Geometric-mean token probability of the answer, if the provider returned logprobs."""
+    meta = getattr(response, "response_metadata", None) or {}
+    logprobs = meta.get("logprobs")
+    content = logprobs.get("content") if isinstance(logprobs, dict) else None
+    if not content:
+        return None
+    # Skip pure JSON punctuation tokens — they are near-certain and inflate the mean
+    values = [t["logprob"] for t in content if t.get("token", "").strip(' {}[]":,\n')]
+    if not values:
+        return None
+    return math.exp(sum(values) / len(values))
+
+
+def _self_reported_confidence(raw: dict | None) -> float:
+    """Read the self-reported "confidence" field, clamped to [0, 1]; missing counts as 0."""
+    try:
+        value = float((raw or {}).get("confidence", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+    return min(max(value, 0.0), 1.0)
 
 
 # ---------------------------------------------------------------------------
@@ -181,21 +363,152 @@ def survey_respond(state: SurveyAgentState) -> dict:
     survey_id = state["survey_id"]
     persona_memory = state.get("persona_memory", True)
 
-    system_prompt = _build_system_prompt(respondent, survey_id, persona_memory)
+    with profiling.span(survey_id, "build_prompt", "prompt"):
+        system_prompt, memory_block = _persona_prompt(respondent, survey_id, persona_memory)
+        sub_questions_text = _format_sub_questions(sub_questions)
+        user_prompt = SURVEY_USER.format(
+            question=question,
+            sub_questions_text=sub_questions_text,
+        )
+    section_chars = {
+        "persona": len(system_prompt) - len(memory_block),
+        "memory": len(memory_block),
+        "sub_questions": len(sub_questions_text),
+        "instructions": len(user_prompt) - len(sub_questions_text),
+    }
 
-    user_prompt = SURVEY_USER.format(
-        question=question,
-        sub_questions_text=_format_sub_questions(sub_questions),
+    messages = [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_prompt),
+    ]
+    samples = max(1, state.get("samples_per_persona", 1))
+
+    served_model = model
+    try:
+        if samples == 1 and state.get("routing"):
+            response, served_model = call_routed(
+                survey_id, model, state["api_keys"], lambda llm: llm.invoke(messages), temperature,
+            )
+        elif samples == 1:
+            llm = get_llm(model, api_key, temperature=temperature)
+            response = call_llm(survey_id, lambda: llm.invoke(messages), model)
+        else:
+            llm = get_llm(model, api_key, temperature=temperature, n=samples)
+            contents, token_usage = _sample_completions(survey_id, llm, messages, model, samples)
+    except BudgetExceeded:
+        logger.info("Survey %s: budget reached, %s (%s) not asked", survey_id, agent_name, model)
+        return {"responses": []}
+
+    if samples == 1:
+        with profiling.span(survey_id, "parse_answers", "parse"):
+            answers = _parse_answers(response.content, sub_questions)
+        token_usage = _attribute_input_tokens(survey_id, served_model, _extract_token_usage(response), section_chars)
+        answer_distribution = None
+    else:
+        with profiling.span(survey_id, "parse_answers", "parse", samples=samples):
+            answers, answer_distribution = _tally_answers(
+                [_parse_answers(c, sub_questions) for c in contents], sub_questions,
+            )
+        token_usage = _attribute_input_tokens(
+            survey_id, model, token_usage, section_chars,
+            requests=1 if supports_native_samples(model) else samples,
+        )
+
+    response_dict = {
+        "respondent_id": respondent["id"],
+        "agent_name": agent_name,
+        "model": model,
+        "served_model": served_model,
+        "answers": answers,
+        "token_usage": token_usage,
+    }
+    if answer_distribution is not None:
+        response_dict["answer_distribution"] = answer_distribution
+    return {"responses": [response_dict]}
+
+
+# ---------------------------------------------------------------------------
+# Cascade mode: cheap model first, escalate low-confidence personas
+# ---------------------------------------------------------------------------
+
+_logprobs_rejected: set[str] = set()  # models whose provider refused a logprobs request
+
+
+def cascade_screen(state: CascadeAgentState) -> dict:
+    """Ask the cheap model and either accept its answers or queue an escalation."""
+    respondent = state["respondent"]
+    agent_name = state["agent_name"]
+    sub_questions = state["sub_questions"]
+    model = state["model"]
+    threshold = state["confidence_threshold"]
+
+    system_prompt, memory_block = _persona_prompt(respondent, state["survey_id"], state.get("persona_memory", True))
+    sub_questions_text = _format_sub_questions(sub_questions)
+    user_prompt = (SURVEY_USER + SURVEY_CONFIDENCE_SUFFIX).format(
+        question=state["question"],
+        sub_questions_text=sub_questions_text,
     )
 
-    llm = get_llm(model, api_key, temperature=temperature)
-    response = llm.invoke([
+    messages = [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt),
-    ])
+    ]
+
+    def screen(logprobs: bool):
+        llm = get_llm(model, state["api_key"], temperature=state.get("temperature"), logprobs=logprobs)
+        return call_llm(state["survey_id"], lambda: llm.invoke(messages), model)
 
-    answers = _parse_answers(response.content, sub_questions)
-    token_usage = _extract_token_usage(response)
+    try:
+        logprobs = supports_logprobs(model) and model not in _logprobs_rejected
+        try:
+            response = screen(logprobs)
+        except (BudgetExceeded, RunCancelled):
+            raise
+        except Exception as exc:
+            if not logprobs or cassettes.error_type(exc) != "BadRequestError":
+                raise
+            # The model refused the logprobs parameter: rely on self-reported confidence
+            logger.warning("Cascade: %s rejected logprobs (%s), screening without them", model, exc)
+            _logprobs_rejected.add(model)
+            response = screen(False)
+    except BudgetExceeded:
+        logger.info("Survey %s: budget reached, %s not screened", state["survey_id"], agent_name)
+        return {}
+
+    raw = _extract_answer_json(response.content)
+    answers, fallback_ids = _validate_answers(raw, sub_questions)
+    token_usage = _attribute_input_tokens(state["survey_id"], model, _extract_token_usage(response), {
+        "persona": len(system_prompt) - len(memory_block),
+        "memory": len(memory_block),
+        "sub_questions": len(sub_questions_text),
+        "instructions": len(user_prompt) - len(sub_questions_text),
+    })
+
+    confidence = _logprob_confidence(response)
+    if confidence is None:
+        confidence = _self_reported_confidence(raw)
+    # Missing or invalid answers mean the cheap model was inconsistent
+    escalate = bool(fallback_ids) or confidence < threshold
+
+    call = {
+        "stage": "screen",
+        "model": model,
+        "token_usage": token_usage,
+        "escalated": escalate,
+    }
+    if escalate:
+        logger.info(
+            "Cascade: escalating %s (confidence=%.2f, invalid=%d)",
+            agent_name, confidence, len(fallback_ids),
+        )
+        return {
+            "escalations": [{
+                "respondent": respondent,
+                "agent_name": agent_name,
+                "confidence": confidence,
+            }],
+            "cascade_calls": [call],
+        }
 
     return {
         "responses": [{
@@ -204,10 +517,83 @@ def survey_respond(state: SurveyAgentState) -> dict:
             "model": model,
             "answers": answers,
             "token_usage": token_usage,
-        }]
+            "stage": "screen",
+            "confidence": confidence,
+        }],
+        "cascade_calls": [call],
     }
 
 
+def cascade_escalate(state: CascadeAgentState) -> dict:
+    """Re-ask an uncertain persona on the expensive model; its answer is final."""
+    result = survey_respond(state)
+    if not result["responses"]:
+        return {}  # over budget
+    response = result["responses"][0]
+    response["stage"] = "escalate"
+    return {
+        "responses": [response],
+        "cascade_calls": [{
+            "stage": "escalate",
+            "model": state["model"],
+            "token_usage": response["token_usage"],
+            "escalated": False,
+        }],
+    }
+
+
+def collect_screen(state: CascadeState) -> dict:
+    """Barrier after the screening stage; routing happens on the outgoing edge."""
+    return {}
+
+
+def _stage_totals(calls: list[dict], price_as: str | None = None) -> dict:
+    """Sum call counts, tokens and cost for one cascade stage."""
+    input_tokens = sum((c["token_usage"] or {}).get("input_tokens", 0) for c in calls)
+    output_tokens = sum((c["token_usage"] or {}).get("output_tokens", 0) for c in calls)
+    cost = sum(estimate_cost(price_as or c["model"], c["token_usage"]) for c in calls)
+    return {
+        "calls": len(calls),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost": round(cost, 6),
+    }
+
+
+def cascade_report(state: CascadeState) -> dict:
+    """Summarize per-stage call counts, escalation rate and cost savings."""
+    calls = state.get("cascade_calls", [])
+    screen_calls = [c for c in calls if c["stage"] == "screen"]
+    escalate_calls = [c for c in calls if c["stage"] == "escalate"]
+    expensive_model = state["expensive_model"]
+
+    screen = _stage_totals(screen_calls)
+    escalate = _stage_totals(escalate_calls)
+    actual_cost = screen["cost"] + escalate["cost"]
+    # Baseline: every screened persona answered by the expensive model alone,
+    # priced from the screening prompts (same persona + sub-questions)
+    baseline_cost = _stage_totals(screen_calls, price_as=expensive_model)["cost"]
+    escalated = sum(1 for c in screen_calls if c["escalated"])
+
+    summary = {
+        "mode": "cascade",
+        "cheap_model": state["cheap_model"],
+        "expensive_model": expensive_model,
+        "confidence_threshold": state["confidence_threshold"],
+        "stages": {"screen": screen, "escalate": escalate},
+        "escalated": escalated,
+        "escalation_rate": round(escalated / len(screen_calls), 4) if screen_calls else 0.0,
+        "actual_cost": round(actual_cost, 6),
+        "baseline_cost": round(baseline_cost, 6),
+        "cost_savings": round(baseline_cost - actual_cost, 6),
+    }
+    logger.info(
+        "Cascade complete: %d/%d escalated, cost $%.4f vs $%.4f baseline",
+        escalated, len(screen_calls), actual_cost, baseline_cost,
+    )
+    return {"cascade_summary": summary}
+
+
 # ---------------------------------------------------------------------------
 # Debate mode: all rounds are open-ended discussion, then thematic analysis
 # ---------------------------------------------------------------------------
@@ -224,16 +610,31 @@ def debate_respond(state: DebateAgentState) -> dict:
     persona_memory = state.get("persona_memory", True)
     round_number = state["round_number"]
     num_rounds = state["num_rounds"]
-    prior_transcript = state.get("prior_transcript", "")
+    prior_transcript = get_context(survey_id, state.get("context_round", round_number))
 
-    system_prompt = _build_system_prompt(respondent, survey_id, persona_memory)
+    system_prompt, memory_block = _persona_prompt(respondent, survey_id, persona_memory)
 
-    if round_number == 1 or not prior_transcript:
+    peer_messages = state.get("peer_messages")
+    if round_number > 1 and peer_messages is not None:
+        earlier_rounds = f"\nSummary of earlier rounds:\n{prior_transcript}\n" if prior_transcript else ""
+        own_statement = state.get("own_statement") or "(you did not speak)"
+        peer_statements = "\n".join(f"- {m['agent_name']}: {m['text']}" for m in peer_messages) or "(no one else spoke)"
+        user_prompt = DEBATE_DISCUSS_PEERS_USER.format(
+            question=question,
+            round_number=round_number,
+            num_rounds=num_rounds,
+            earlier_rounds=earlier_rounds,
+            own_statement=own_statement,
+            peer_statements=peer_statements,
+        )
+        transcript_chars = len(earlier_rounds) + len(own_statement) + len(peer_statements)
+    elif round_number == 1 or not prior_transcript:
         user_prompt = DEBATE_DISCUSS_USER.format(
             question=question,
             round_number=round_number,
             num_rounds=num_rounds,
         )
+        transcript_chars = 0
     else:
         user_prompt = DEBATE_DISCUSS_FOLLOWUP_USER.format(
             question=question,
@@ -241,20 +642,38 @@ def debate_respond(state: DebateAgentState) -> dict:
             num_rounds=num_rounds,
             prior_transcript=prior_transcript,
         )
+        transcript_chars = len(prior_transcript)
 
-    llm = get_llm(model, api_key, temperature=temperature)
-    response = llm.invoke([
+    messages = [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt),
-    ])
+    ]
+    served_model = model
+    try:
+        if state.get("routing"):
+            response, served_model = call_routed(
+                survey_id, model, state["api_keys"], lambda llm: llm.invoke(messages), temperature,
+            )
+        else:
+            llm = get_llm(model, api_key, temperature=temperature)
+            response = call_llm(survey_id, lambda: llm.invoke(messages), model)
+    except BudgetExceeded:
+        logger.info("Survey %s: budget reached, %s silent in round %d", survey_id, agent_name, round_number)
+        return {"debate_messages": []}
 
-    token_usage = _extract_token_usage(response)
+    token_usage = _attribute_input_tokens(survey_id, served_model, _extract_token_usage(response), {
+        "persona": len(system_prompt) - len(memory_block),
+        "memory": len(memory_block),
+        "transcript": transcript_chars,
+        "instructions": len(user_prompt) - transcript_chars,
+    })
 
     return {
         "debate_messages": [{
             "respondent_id": respondent["id"],
             "agent_name": agent_name,
             "model": model,
+            "served_model": served_model,
             "round": round_number,
             "text": response.content.strip(),
             "token_usage": token_usage,
@@ -262,14 +681,10 @@ def debate_respond(state: DebateAgentState) -> dict:
     }
 
 
-def collect_round(state: DebateState) -> dict:
-    """After a discussion round, build the raw transcript for the next round. No synthesis."""
-    debate_messages = state.get("debate_messages", [])
-    current_round = state["current_round"]
-
-    # Build full raw transcript of all messages so far, organized by round
+def _build_raw_transcript(debate_messages: list[dict], from_round: int, to_round: int) -> str:
+    """Build the raw transcript of all debate messages in rounds [from_round, to_round]."""
     transcript_parts: list[str] = []
-    for round_num in range(1, current_round + 1):
+    for round_num in range(from_round, to_round + 1):
         round_msgs = [m for m in debate_messages if m.get("round") == round_num]
         if not round_msgs:
             continue
@@ -277,19 +692,406 @@ def collect_round(state: DebateState) -> dict:
         for msg in round_msgs:
             transcript_parts.append(f"{msg['agent_name']}: {msg['text']}")
         transcript_parts.append("")
+    return "\n".join(transcript_parts).strip()
+
+
+def _fold_into_digest(state: DebateState, digest: str, round_transcript: str, max_tokens: int) -> str:
+    """Fold one round into the running digest, compressing only when over budget."""
+    merged = f"{digest}\n\n{round_transcript}".strip()
+    if estimate_tokens(merged) <= max_tokens:
+        return merged
+
+    llm = _get_summary_llm(state)
+    if llm:
+        try:
+            response = call_llm(state["survey_id"], lambda: llm.invoke([
+                SystemMessage(content=DEBATE_DIGEST_SYSTEM),
+                HumanMessage(content=DEBATE_DIGEST_USER.format(
+                    question=state["question"],
+                    digest=digest or "(empty)",
+                    round_transcript=round_transcript,
+                    max_words=max(50, int(max_tokens * 0.75)),
+                )),
+            ]), model_name(llm))
+            merged = response.content.strip()
+        except RunCancelled:
+            raise
+        except BudgetExceeded:
+            logger.info("Survey %s: budget reached, truncating digest", state["survey_id"])
+        except Exception:
+            logger.exception("Digest summarization failed, truncating instead")
+    return truncate_to_tokens(merged, max_tokens)
+
+
+_round_answers: dict[str, dict[int, list[float]]] = {}  # survey_id -> round -> [first, last] answer time
+_round_answers_lock = threading.Lock()
+
+
+def debate_respond_barrier(state: DebateAgentState) -> dict:
+    """`debate_respond` as a barrier-round node: also notes when the answer arrived."""
+    update = debate_respond(state)
+    now = time.monotonic()
+    with _round_answers_lock:
+        times = _round_answers.setdefault(state["survey_id"], {}).setdefault(state["round_number"], [now, now])
+        times[1] = now
+    return update
+
+
+def release_round_timings(survey_id: str) -> None:
+    with _round_answers_lock:
+        _round_answers.pop(survey_id, None)
+
+
+def debate_round(state: DebateState, *, fan_out: Callable[[DebateState], list]) -> dict:
+    """Run one discussion round under the quorum policy.
+
+    Calls run on the debate's own pool; the round closes as soon as
+    `quorum_fraction` of them have answered or `round_deadline_s` has passed.
+    Stragglers keep running and their messages are carried into the next
+    round. Messages are streamed as they arrive through the custom stream.
+
+    Stragglers from earlier rounds are harvested at both ends of the round:
+    those that finished between rounds open this round's transcript, those
+    that finish while it runs close it. A late message therefore lags its
+    own round by one round, never more.
+    """
+    survey_id = state["survey_id"]
+    current_round = state["current_round"]
+    writer = get_stream_writer()
+
+    # Messages from last round's stragglers that have arrived since it closed
+    late_messages = [{**m, "late": True} for m in stragglers.harvest(survey_id)]
+    for msg in late_messages:
+        writer({"debate_message": msg})
+
+    busy = stragglers.busy(survey_id)
+    pending: dict[Future, str] = {}
+    for send in fan_out(state):
+        key = agent_key(send.arg["respondent"]["id"], send.arg["model"])
+        if key in busy:
+            continue  # still answering an earlier round
+        future = stragglers.submit(survey_id, key, partial(debate_respond, send.arg))
+        pending[future] = key
+
+    quorum = math.ceil(len(pending) * state.get("quorum_fraction", 1.0))
+    deadline = time.monotonic() + state.get("round_deadline_s", settings.round_deadline_s)
+    messages: list[dict] = []
+    answered = 0
+    first_answer_at = None
+    while pending and answered < quorum:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = pending.pop(future)
+            stragglers.finish(survey_id, key)
+            answered += 1
+            first_answer_at = first_answer_at or time.monotonic()
+            try:
+                new_messages = future.result()["debate_messages"]
+            except RunCancelled:
+                raise
+            except Exception:
+                logger.exception("Debate call for %s failed in round %d", key, current_round)
+                continue
+            for msg in new_messages:
+                writer({"debate_message": msg})
+            messages.extend(new_messages)
 
+    if first_answer_at is not None:
+        metrics.DEBATE_BARRIER_WAIT.observe(time.monotonic() - first_answer_at, "quorum")
+    # Earlier rounds' stragglers that answered while this round ran
+    for msg in stragglers.harvest(survey_id):
+        msg = {**msg, "late": True}
+        writer({"debate_message": msg})
+        late_messages.append(msg)
+    late_agents = [
+        {"respondent_id": int(key.split(":", 1)[0]), "model": key.split(":", 1)[1]}
+        for key in pending.values()
+    ]
+    if late_agents:
+        logger.info(
+            "Debate %s: round %d closed with %d/%d answers, %d late",
+            survey_id, current_round, answered, answered + len(late_agents), len(late_agents),
+        )
     return {
-        "current_round": current_round + 1,
+        "debate_messages": late_messages + messages,
+        "late_agents": late_agents,
     }
 
 
-def analyze_debate(state: DebateState) -> dict:
-    """After all discussion rounds, perform thematic analysis of the full debate."""
+def _debate_agents(state: DebateState) -> list[str]:
+    """Keys of every (panelist, model) agent that takes part in the debate."""
+    from backend.services.llm import _detect_provider
+    api_keys = state["api_keys"]
+    return [
+        agent_key(p["id"], model)
+        for p in state["panel"]
+        for model in state["models"]
+        if api_keys.get(_detect_provider(model))
+    ]
+
+
+def collect_round(state: DebateState) -> dict:
+    """After a discussion round, build the next round's context once for all panelists.
+
+    "full" strategy: the raw transcript of every round so far.
+    "rolling" strategy: the latest round verbatim plus an incrementally built
+    digest of older rounds, kept under the configured token budget.
+
+    With a sparse topology the latest round is not shared: each agent instead
+    gets k peer messages (`peer_assignments`) and the shared context holds only
+    the digest of older rounds.
+    """
     debate_messages = state.get("debate_messages", [])
+    current_round = state["current_round"]
+    update: dict = {"current_round": current_round + 1}
+
+    with _round_answers_lock:
+        times = _round_answers.get(state["survey_id"], {}).pop(current_round, None)
+    if times:
+        metrics.DEBATE_BARRIER_WAIT.observe(times[1] - times[0], "barrier")
+
+    # Map step of the debate analysis starts now, in the background
+    _submit_round_partials(state, debate_messages)
+
+    # No further discussion round will read the context
+    if current_round >= state["num_rounds"]:
+        return update
+
+    topology = state.get("topology", "full")
+    sparse = topology != "full"
+    latest_msgs = [m for m in debate_messages if m.get("round") == current_round]
+    peer_k = state.get("peer_k") or settings.debate_peer_k
+    if sparse:
+        update["peer_assignments"] = select_peers(
+            topology,
+            _debate_agents(state),
+            latest_msgs,
+            k=peer_k,
+            contrast_fraction=settings.debate_contrast_fraction,
+            seed_key=state["survey_id"],
+        )
+
+    rolling = state.get("context_strategy", "full") == "rolling"
+    if not rolling:
+        update["round_context"] = "" if sparse else _build_raw_transcript(debate_messages, 1, current_round)
+        return update
+
+    budget = state.get("context_token_budget") or settings.debate_context_token_budget
+    latest = _build_raw_transcript(debate_messages, current_round, current_round)
+    latest_tokens = estimate_tokens(latest)
+    if sparse and latest_msgs:
+        # Each agent reads only k of the latest messages
+        latest_tokens = latest_tokens * min(peer_k, len(latest_msgs)) // len(latest_msgs)
+    digest = state.get("transcript_digest", "")
+    if current_round > 1:
+        # The previous "latest" round now becomes history
+        previous = _build_raw_transcript(debate_messages, current_round - 1, current_round - 1)
+        digest_budget = max(budget - latest_tokens, budget // 4)
+        digest = _fold_into_digest(state, digest, previous, digest_budget)
+
+    if sparse:
+        round_context = digest
+    elif digest:
+        round_context = f"Summary of earlier rounds:\n{digest}\n\n{latest}"
+    else:
+        round_context = latest
+    logger.info(
+        "Debate %s: round %d shared context ~%d tokens (digest ~%d)",
+        state["survey_id"], current_round + 1, estimate_tokens(round_context), estimate_tokens(digest),
+    )
+    update["transcript_digest"] = digest
+    update["round_context"] = round_context
+    return update
+
+
+def _message_key(msg: dict) -> tuple:
+    return (msg["respondent_id"], msg["model"], msg["round"])
+
+
+def _map_round_chunk(survey_id: str, llm, question: str, num_rounds: int, round_number: int,
+                     chunk_number: int, num_chunks: int, messages: list[dict]) -> dict:
+    """Map step: partial thematic analysis of one chunk of one round."""
+    excerpt = "\n\n".join(
+        f"**{m['agent_name']}** (ID {m['respondent_id']}): {m['text']}" for m in messages
+    )
+    result = call_llm(survey_id, lambda: llm.with_structured_output(RoundAnalysis, include_raw=True).invoke([
+        SystemMessage(content=DEBATE_MAP_SYSTEM),
+        HumanMessage(content=DEBATE_MAP_USER.format(
+            question=question,
+            round_number=round_number,
+            num_rounds=num_rounds,
+            chunk_number=chunk_number,
+            num_chunks=num_chunks,
+            excerpt=excerpt,
+        )),
+    ]), model_name(llm))
+    parsed = result["parsed"]
+    if parsed is None:
+        raise ValueError(f"Round {round_number} chunk {chunk_number} analysis did not parse")
+    return {
+        "round": round_number,
+        "analysis": parsed.model_dump(),
+        "token_usage": _extract_token_usage(result["raw"]),
+    }
+
+
+def _submit_round_partials(state: DebateState, debate_messages: list[dict]) -> None:
+    """Start map jobs for every message not yet covered by one, chunked per round."""
+    fresh = set(partials.claim(state["survey_id"], [_message_key(m) for m in debate_messages]))
+    if not fresh:
+        return
+    llm = _get_summary_llm(state)
+    if not llm:
+        return
+
+    chunk_size = settings.analysis_chunk_size
+    by_round: dict[int, list[dict]] = {}
+    for msg in debate_messages:
+        if _message_key(msg) in fresh:
+            by_round.setdefault(msg["round"], []).append(msg)
+    for round_number, msgs in sorted(by_round.items()):
+        chunks = [msgs[i:i + chunk_size] for i in range(0, len(msgs), chunk_size)]
+        for i, chunk in enumerate(chunks, 1):
+            partials.submit(state["survey_id"], partial(
+                _map_round_chunk, state["survey_id"], llm, state["question"], state["num_rounds"],
+                round_number, i, len(chunks), chunk,
+            ))
+        logger.info(
+            "Debate %s: started %d partial analyses for round %d",
+            state["survey_id"], len(chunks), round_number,
+        )
+
+
+def _format_partials(results: list[dict]) -> str:
+    """Compact text of the map results, grouped by round, for the reduce prompt."""
+    sections = []
+    for result in sorted(results, key=lambda r: r["round"]):
+        analysis = result["analysis"]
+        lines = [f"### Round {result['round']}"]
+        for theme in analysis["themes"]:
+            lines.append(
+                f"- **{theme['label']}** ({theme['sentiment']}), IDs {theme['respondent_ids']}: "
+                f"{theme['description']}"
+            )
+            lines.extend(f"  - {arg}" for arg in theme["key_arguments"])
+        if analysis["consensus_points"]:
+            lines.append("Consensus: " + "; ".join(analysis["consensus_points"]))
+        if analysis["key_tensions"]:
+            lines.append("Tensions: " + "; ".join(analysis["key_tensions"]))
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def _format_clusters(pre: dict) -> str:
+    """Precomputed clusters with representative excerpts, for the labelling prompt."""
+    sections = []
+    for i, cluster in enumerate(pre["clusters"]):
+        lines = [
+            f"### Cluster {i} — IDs {cluster['respondent_ids']}",
+            f"Distinctive terms: {', '.join(cluster['top_terms'])}",
+        ]
+        lines.extend(
+            f"- ID {r['respondent_id']}: {truncate_to_tokens(r['text'], 150)}"
+            for r in cluster["representatives"]
+        )
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+def _format_drift(pre: dict, limit: int = 5) -> str:
+    movers = [d for d in pre["drift"] if d["drift"] > 0][:limit]
+    if not movers:
+        return "No panelist changed position between rounds."
+    return "\n".join(
+        f"- ID {d['respondent_id']}: drift {d['drift']:.2f} (per round: {d['round_drift']})"
+        for d in movers
+    )
+
+
+def _union_partial_points(results: list[dict], analysis: dict) -> dict:
+    """Fill consensus points and tensions from the map results (used without a reduce call)."""
+    consensus: list[str] = []
+    tensions: list[str] = []
+    for result in sorted(results, key=lambda r: r["round"]):
+        consensus.extend(result["analysis"]["consensus_points"])
+        tensions.extend(result["analysis"]["key_tensions"])
+    analysis["consensus_points"] = list(dict.fromkeys(consensus))[:5]
+    analysis["key_tensions"] = list(dict.fromkeys(tensions))[:5]
+    return analysis
+
+
+def _apply_cluster_labels(preview: dict, labeling: ClusterLabeling) -> dict:
+    """Final analysis: clusters (and so assignments) from the preview, labels from the LLM."""
+    labels = {c.cluster: c for c in labeling.clusters}
+    themes = []
+    for i, theme in enumerate(preview["themes"]):
+        named = labels.get(i)
+        if named is None:
+            themes.append(theme)
+            continue
+        themes.append({
+            "label": named.label,
+            "description": named.description,
+            "respondent_ids": theme["respondent_ids"],
+            "key_arguments": named.key_arguments or theme["key_arguments"],
+            "sentiment": named.sentiment,
+        })
+    return {
+        "themes": themes,
+        "consensus_points": labeling.consensus_points,
+        "key_tensions": labeling.key_tensions,
+        "synthesis": labeling.synthesis,
+        "position_drift": preview["position_drift"],
+    }
+
+
+def analyze_debate(state: DebateState) -> dict:
+    """Thematic analysis: local pre-clustering, then the LLM labels the clusters.
+
+    Final positions are clustered locally (see `graph.positions`), which fixes
+    the theme assignments and is streamed at once as a preview. Partial
+    analyses of each round were started in `collect_round` as soon as the
+    round closed; the reduce call only names and describes the precomputed
+    clusters, using those partials and representative excerpts.
+    """
+    survey_id = state["survey_id"]
+    writer = get_stream_writer()
+    # Quorum rounds: give the final round's stragglers up to one more round
+    # deadline to answer; whatever is still running after that is dropped
+    late_messages = [
+        {**m, "late": True}
+        for m in stragglers.harvest(survey_id, timeout=state.get("round_deadline_s", settings.round_deadline_s))
+    ]
+    for msg in late_messages:
+        writer({"debate_message": msg})
+    debate_messages = state.get("debate_messages", []) + late_messages
     question = state["question"]
     panel = state["panel"]
     num_rounds = state["num_rounds"]
 
+    pre = precluster(debate_messages, seed_key=survey_id)
+    preview = preview_analysis(pre)
+    writer({"debate_preview": preview})
+    logger.info(
+        "Debate %s: pre-clustered %d panelists into %d clusters (silhouette %.2f)",
+        survey_id, sum(len(c["respondent_ids"]) for c in pre["clusters"]),
+        len(pre["clusters"]), pre["silhouette"],
+    )
+
+    llm = _get_summary_llm(state)
+    if not llm:
+        logger.warning("No model with a valid API key for debate analysis, keeping the local preview")
+        return {"analysis": preview, "debate_messages": late_messages}
+
+    # Catch up on anything not mapped yet (late messages, resumed runs)
+    _submit_round_partials(state, debate_messages)
+    results = partials.collect(survey_id)
+    partials.release(survey_id)
+    map_usage = [r["token_usage"] for r in results]
+
     # Build panelist roster
     roster_lines = []
     for p in panel:
@@ -299,64 +1101,39 @@ def analyze_debate(state: DebateState) -> dict:
         roster_lines.append(f"- ID {p['id']}: {role} in {industry} ({region})")
     panelist_roster = "\n".join(roster_lines)
 
-    # Build full transcript organized by round
-    transcript_parts = []
-    for round_num in range(1, num_rounds + 1):
-        round_msgs = [m for m in debate_messages if m.get("round") == round_num]
-        if not round_msgs:
-            continue
-        transcript_parts.append(f"### Round {round_num}")
-        for msg in round_msgs:
-            transcript_parts.append(
-                f"**{msg['agent_name']}** (ID {msg['respondent_id']}): {msg['text']}"
-            )
-        transcript_parts.append("")
-    full_transcript = "\n\n".join(transcript_parts)
-
-    llm = _get_summary_llm(state)
-    if not llm:
-        logger.error("No model with a valid API key available for debate analysis")
-        return {
-            "analysis": {
-                "themes": [],
-                "consensus_points": [],
-                "key_tensions": [],
-                "synthesis": "Unable to generate analysis — no API key available.",
-            }
-        }
-
-    # Use structured output for reliable thematic extraction
-    structured_llm = llm.with_structured_output(DebateAnalysis)
-
-    analysis_prompt = DEBATE_ANALYSIS_USER.format(
+    reduce_prompt = DEBATE_REDUCE_USER.format(
         question=question,
         num_rounds=num_rounds,
         num_panelists=len(panel),
         panelist_roster=panelist_roster,
-        full_transcript=full_transcript,
+        num_clusters=len(pre["clusters"]),
+        clusters_text=_format_clusters(pre),
+        drift_text=_format_drift(pre),
+        partials_text=_format_partials(results),
     )
 
     try:
-        result: DebateAnalysis = structured_llm.invoke([
-            SystemMessage(content=DEBATE_ANALYSIS_SYSTEM),
-            HumanMessage(content=analysis_prompt),
-        ])
-        token_usage = None  # structured output doesn't always expose usage
-        analysis_dict = result.model_dump()
-        analysis_dict["token_usage"] = token_usage
-    except Exception:
-        logger.exception("Structured analysis failed, falling back to unstructured")
-        # Fallback: get raw text and return a minimal analysis
-        raw_response = llm.invoke([
-            SystemMessage(content=DEBATE_ANALYSIS_SYSTEM),
-            HumanMessage(content=analysis_prompt),
-        ])
-        analysis_dict = {
-            "themes": [],
-            "consensus_points": [],
-            "key_tensions": [],
-            "synthesis": raw_response.content.strip(),
-            "token_usage": _extract_token_usage(raw_response),
-        }
+        result = call_llm(survey_id, lambda: llm.with_structured_output(ClusterLabeling, include_raw=True).invoke([
+            SystemMessage(content=DEBATE_REDUCE_SYSTEM),
+            HumanMessage(content=reduce_prompt),
+        ]), model_name(llm))
+        if result["parsed"] is None:
+            raise ValueError("Reduce step did not return cluster labels")
+        analysis_dict = _apply_cluster_labels(preview, result["parsed"])
+        reduce_usage = _extract_token_usage(result["raw"])
+    except RunCancelled:
+        raise
+    except Exception as exc:
+        if isinstance(exc, BudgetExceeded):
+            logger.info("Survey %s: budget reached, keeping local cluster labels", survey_id)
+        else:
+            logger.exception("Cluster labelling failed, keeping local labels")
+        analysis_dict = _union_partial_points(results, {k: v for k, v in preview.items() if k != "preview"})
+        reduce_usage = None
 
-    return {"analysis": analysis_dict}
+    analysis_dict["token_usage"] = _sum_token_usage(map_usage + [reduce_usage])
+    logger.info(
+        "Debate %s: labelled %d clusters from %d partial analyses",
+        survey_id, len(analysis_dict["themes"]), len(results),
+    )
+    return {"analysis": analysis_dict, "debate_messages": late_messages}
@@ -0,0 +1,65 @@
+"""Per-debate registry of background per-round ("map") analyses.
+
+`collect_round` submits partial thematic analyses of each finished round as
+soon as it closes; `analyze_debate` only has to wait for the last ones and
+run the reduce step.
+"""
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from backend.config import settings
+from backend.services.llm import BudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_futures: dict[str, list[Future]] = {}
+_submitted: dict[str, set[tuple]] = {}  # survey_id -> message keys already sent to a map job
+_lock = threading.Lock()
+
+
+def claim(survey_id: str, keys: list[tuple]) -> list[tuple]:
+    """Return the keys not yet claimed by an earlier map job, and claim them."""
+    with _lock:
+        seen = _submitted.setdefault(survey_id, set())
+        fresh = [k for k in keys if k not in seen]
+        seen.update(fresh)
+    return fresh
+
+
+def submit(survey_id: str, fn: Callable[[], dict]) -> None:
+    with _lock:
+        executor = _executors.get(survey_id)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.analysis_max_workers,
+                thread_name_prefix=f"analysis-{survey_id[:8]}",
+            )
+            _executors[survey_id] = executor
+        _futures.setdefault(survey_id, []).append(executor.submit(fn))
+
+
+def collect(survey_id: str) -> list[dict]:
+    """Wait for every submitted map job and return the successful results."""
+    with _lock:
+        futures = list(_futures.get(survey_id, []))
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except BudgetExceeded:
+            logger.info("Survey %s: budget reached, partial debate analysis skipped", survey_id)
+        except Exception:
+            logger.exception("Partial debate analysis failed")
+    return results
+
+
+def release(survey_id: str) -> None:
+    with _lock:
+        executor = _executors.pop(survey_id, None)
+        _futures.pop(survey_id, None)
+        _submitted.pop(survey_id, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+"""Local pre-clustering of debate positions, ahead of (or instead of) the LLM.
+
+Each panelist's position in a round is the text of their messages in that
+round (joined across models). All positions share one TF-IDF index, so the
+final positions can be clustered and compared with earlier rounds to
+measure drift. The LLM then only labels the precomputed clusters; without
+an LLM the same clusters make a fast preview of the analysis.
+"""
+import re
+import zlib
+
+from backend.services.clustering import cluster_texts, top_terms
+from backend.services.similarity import SparseVector, cosine, tfidf_vectors
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _positions(debate_messages: list[dict]) -> dict[int, dict[int, str]]:
+    """respondent_id -> round -> that round's text."""
+    positions: dict[int, dict[int, list[str]]] = {}
+    for msg in debate_messages:
+        positions.setdefault(msg["respondent_id"], {}).setdefault(msg["round"], []).append(msg["text"])
+    return {
+        rid: {rnd: "\n\n".join(texts) for rnd, texts in by_round.items()}
+        for rid, by_round in positions.items()
+    }
+
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = _SENTENCE_RE.split(text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "…"
+
+
+def _distance(a: SparseVector, b: SparseVector) -> float:
+    return round(max(0.0, 1.0 - cosine(a, b)), 3)
+
+
+def precluster(debate_messages: list[dict], seed_key: str = "", max_k: int = 8) -> dict:
+    """Cluster every panelist's latest position and measure drift across rounds.
+
+    Returns ``{"clusters": [...], "drift": [...], "silhouette": float}``.
+    Clusters are a partition of the panelists who spoke, largest first; each
+    carries its members, top terms, and the member statements closest to the
+    cluster centre. Drift is ``1 - cosine`` between a panelist's first and
+    latest positions, with the per-round steps in between.
+    """
+    positions = _positions(debate_messages)
+    keys = [(rid, rnd) for rid, by_round in positions.items() for rnd in sorted(by_round)]
+    vectors = dict(zip(keys, tfidf_vectors([positions[rid][rnd] for rid, rnd in keys])))
+
+    respondents = sorted(positions)
+    latest_round = {rid: max(positions[rid]) for rid in respondents}
+    final_vectors = [vectors[(rid, latest_round[rid])] for rid in respondents]
+    labels, score = cluster_texts(final_vectors, max_k=max_k, seed=zlib.crc32(seed_key.encode()))
+
+    clusters = []
+    for c in range(max(labels) + 1 if labels else 0):
+        members = [i for i, lab in enumerate(labels) if lab == c]
+        terms = top_terms(final_vectors, labels, c, n=5)
+        # Representative statements: members whose final position is closest to the cluster's terms
+        term_vec = {t: 1.0 for t in terms}
+        ranked = sorted(members, key=lambda i: cosine(final_vectors[i], term_vec), reverse=True)
+        clusters.append({
+            "respondent_ids": [respondents[i] for i in members],
+            "top_terms": terms,
+            "representatives": [
+                {"respondent_id": respondents[i], "text": positions[respondents[i]][latest_round[respondents[i]]]}
+                for i in ranked[:3]
+            ],
+        })
+
+    drift = []
+    for rid in respondents:
+        rounds = sorted(positions[rid])
+        steps = [
+            _distance(vectors[(rid, a)], vectors[(rid, b)])
+            for a, b in zip(rounds, rounds[1:])
+        ]
+        drift.append({
+            "respondent_id": rid,
+            "drift": _distance(vectors[(rid, rounds[0])], vectors[(rid, rounds[-1])]),
+            "round_drift": steps,
+        })
+    drift.sort(key=lambda d: d["drift"], reverse=True)
+
+    return {"clusters": clusters, "drift": drift, "silhouette": round(score, 3)}
+
+
+def preview_analysis(pre: dict) -> dict:
+    """DebateAnalysis-shaped result built from the clusters alone, without an LLM."""
+    themes = []
+    for cluster in pre["clusters"]:
+        terms = cluster["top_terms"]
+        themes.append({
+            "label": " / ".join(t.title() for t in terms[:3]) or "Other",
+            "description": f"{len(cluster['respondent_ids'])} panelists whose final statements centre on "
+                           f"{', '.join(terms) or 'no distinctive terms'}.",
+            "respondent_ids": cluster["respondent_ids"],
+            "key_arguments": [_first_sentence(r["text"]) for r in cluster["representatives"]],
+            "sentiment": "neutral",
+        })
+    movers = [d for d in pre["drift"] if d["drift"] > 0][:3]
+    synthesis = f"Preview from local clustering: {len(themes)} position clusters."
+    if movers:
+        synthesis += " Largest position shifts: " + ", ".join(
+            f"ID {d['respondent_id']} ({d['drift']:.2f})" for d in movers
+        ) + "."
+    return {
+        "themes": themes,
+        "consensus_points": [],
+        "key_tensions": [],
+        "synthesis": synthesis,
+        "position_drift": pre["drift"],
+        "preview": True,
+    }
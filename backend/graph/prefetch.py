@@ -0,0 +1,75 @@
+"""Process-local store of persona prompts rendered ahead of a run.
+
+A survey's panel is fixed when it is created, so its persona system prompts,
+memory included, can be rendered before anyone clicks Run: creating a survey
+starts `ensure_prompts` in the background and the run calls it again when it
+starts, waiting for (or reusing) that work. Persona nodes then read their
+prompt here instead of querying their own history every round.
+
+Prompts older than `MAX_AGE_S` are rendered again when a run starts, since a
+panelist may have answered another survey since, and dropped if no run has
+claimed them. A run holds its prompts until it ends and `release_prompts`
+drops them.
+"""
+import threading
+import time
+from collections.abc import Callable
+
+MAX_AGE_S = 300.0
+
+_prompts: dict[str, tuple[float, dict[int, tuple[str, str]]]] = {}  # survey_id -> (rendered_at, prompts)
+_survey_locks: dict[str, threading.Lock] = {}
+_held: set[str] = set()  # surveys whose run is using their prompts
+_lock = threading.Lock()
+
+
+def ensure_prompts(
+    survey_id: str,
+    render: Callable[[], dict[int, tuple[str, str]]],
+    hold: bool = False,
+) -> bool:
+    """Render the survey's prompts unless fresh ones are published; returns whether it rendered.
+
+    `render` returns respondent_id -> (system prompt, memory block). A caller
+    arriving while another renders waits for it instead of rendering twice.
+    A run passes `hold` so its prompts stay until `release_prompts`.
+    """
+    with _lock:
+        _sweep()
+        if hold:
+            _held.add(survey_id)
+        survey_lock = _survey_locks.setdefault(survey_id, threading.Lock())
+    with survey_lock:
+        with _lock:
+            entry = _prompts.get(survey_id)
+        if entry and time.monotonic() - entry[0] < MAX_AGE_S:
+            return False
+        prompts = render()
+        with _lock:
+            _prompts[survey_id] = (time.monotonic(), prompts)
+        return True
+
+
+def get_prompt(survey_id: str, respondent_id: int) -> tuple[str, str] | None:
+    """The panelist's (system prompt, memory block), if rendered ahead."""
+    with _lock:
+        entry = _prompts.get(survey_id)
+    return entry[1].get(respondent_id) if entry else None
+
+
+def release_prompts(survey_id: str) -> None:
+    with _lock:
+        _prompts.pop(survey_id, None)
+        _survey_locks.pop(survey_id, None)
+        _held.discard(survey_id)
+
+
+def _sweep() -> None:
+    """Drop stale prompts of surveys that never ran. Called with `_lock` held."""
+    now = time.monotonic()
+    for survey_id in [
+        s for s, (rendered_at, _) in _prompts.items()
+        if s not in _held and now - rendered_at >= MAX_AGE_S
+    ]:
+        del _prompts[survey_id]
+        _survey_locks.pop(survey_id, None)
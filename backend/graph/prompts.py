@@ -54,6 +54,11 @@ IMPORTANT:
 - You MUST pick one of the listed options for each sub-question. Do not invent new options.
 - Return ONLY the JSON object, no other text."""
 
+SURVEY_CONFIDENCE_SUFFIX = """
+
+Also include a "confidence" key with a number between 0.0 and 1.0 saying how sure you are that these answers truly reflect who you are (1.0 = completely sure, 0.0 = pure guess). Example:
+{{"sq_1": "Option A", "sq_2": "Option B", "confidence": 0.8}}"""
+
 # ---------------------------------------------------------------------------
 # Debate mode prompts — all rounds are open-ended discussion
 # ---------------------------------------------------------------------------
@@ -76,33 +81,79 @@ Here is what everyone has said so far:
 
 Now respond. You've heard what others think — you may hold your position, shift it, or refine it. In 2-4 sentences, share where you stand now and why. Engage with specific points others made. Be direct."""
 
+DEBATE_DISCUSS_PEERS_USER = """You're in Round {round_number} of {num_rounds} in a panel discussion about:
+
+"{question}"
+{earlier_rounds}
+Last round, you said:
+
+{own_statement}
+
+Here is what some of the other panelists said last round:
+
+{peer_statements}
+
+Now respond. You've heard what others think — you may hold your position, shift it, or refine it. In 2-4 sentences, share where you stand now and why. Engage with specific points others made. Be direct."""
+
+DEBATE_DIGEST_SYSTEM = """You compress panel discussion transcripts into a faithful running digest. Keep every distinct position, who holds it (by speaker name), notable shifts between rounds, and the strongest arguments. Drop repetition, pleasantries and filler. Never invent content."""
+
+DEBATE_DIGEST_USER = """Update the running digest of an ongoing panel discussion about:
+
+"{question}"
+
+Current digest of earlier rounds (may be empty):
+
+{digest}
+
+New round to fold in:
+
+{round_transcript}
+
+Write the updated digest in at most {max_words} words. Return only the digest text."""
+
 # ---------------------------------------------------------------------------
-# Debate analysis — final thematic extraction after all discussion rounds
+# Debate analysis — map per round chunk as rounds close, reduce after the last
 # ---------------------------------------------------------------------------
 
-DEBATE_ANALYSIS_SYSTEM = """You are an expert qualitative researcher analyzing a multi-round panel discussion. Your job is to perform thematic analysis: identify distinct position clusters, map respondents to them, and synthesize the overall debate outcome.
+DEBATE_MAP_SYSTEM = """You are an expert qualitative researcher coding one excerpt of a multi-round panel discussion. Identify the distinct position clusters among the panelists in this excerpt only, give each a vivid descriptive label, and assign every panelist who speaks in the excerpt to exactly one cluster by respondent ID. Keep key arguments short and close to the panelists' own words."""
+
+DEBATE_MAP_USER = """Question under discussion: "{question}"
+
+Excerpt: Round {round_number} of {num_rounds} (part {chunk_number} of {num_chunks}).
 
-Think like a researcher doing grounded-theory coding:
-1. Read all responses across all rounds to understand each panelist's trajectory
-2. Identify natural clusters of opinion — people who share similar positions, reasoning, or values
-3. Label each cluster with a vivid, descriptive name (not generic like "Group A")
-4. Note where panelists shifted positions between rounds — this signals persuasive arguments
-5. Extract consensus points (where most agree) and key tensions (where they diverge)
+{excerpt}
 
-Be precise about which respondent IDs belong to which cluster. One respondent belongs to exactly one cluster."""
+Identify the position clusters in this excerpt, assign each speaking panelist (by ID) to exactly one cluster, and note consensus points and tensions."""
 
-DEBATE_ANALYSIS_USER = """Analyze this {num_rounds}-round panel debate and extract the key themes.
+DEBATE_REDUCE_SYSTEM = """You are an expert qualitative researcher writing up a multi-round panel discussion. The panelists' final positions have already been grouped into clusters; the cluster memberships are fixed and must not be changed.
+
+For each cluster:
+1. Give it a vivid, descriptive label (not generic like "Group A")
+2. Summarize what its members believe and why, using the representative excerpts
+3. List the key arguments, staying close to the panelists' own words
+4. Judge the overall sentiment
+
+Then use the per-round partial analyses and the position drift to extract consensus points (where most agree), key tensions (where they diverge), and note which arguments moved people between rounds in the synthesis."""
+
+DEBATE_REDUCE_USER = """Label the position clusters of this {num_rounds}-round panel debate.
 
 **Question:** "{question}"
 
 **Panelists ({num_panelists} total):**
 {panelist_roster}
 
-**Full Discussion Transcript:**
+**Precomputed clusters of final positions ({num_clusters}):**
+
+{clusters_text}
+
+**Largest position shifts across rounds (0 = unchanged, 1 = entirely different):**
+{drift_text}
+
+**Partial analyses by round:**
 
-{full_transcript}
+{partials_text}
 
-Identify the distinct position clusters, assign every panelist to exactly one cluster, extract key arguments, note consensus points and tensions, and write an overall synthesis."""
+Return one label entry per cluster number, plus consensus points, tensions and an overall synthesis."""
 
 ANALYZER_SYSTEM = """You are a survey design expert. Your job is to take the user's input and turn each distinct question into a structured sub-question with categorical answer options.
 
@@ -12,6 +12,9 @@ class SurveyAgentState(TypedDict):
     temperature: float | None
     survey_id: str
     persona_memory: bool
+    samples_per_persona: int
+    routing: bool  # route within the model's group (see services.llm.call_routed)
+    api_keys: dict[str, str]  # only when routing: keys for the group's other providers
 
 
 class SurveyState(TypedDict):
@@ -23,9 +26,25 @@ class SurveyState(TypedDict):
     temperatures: dict[str, float]  # model -> temperature
     survey_id: str
     persona_memory: bool
+    samples_per_persona: int
+    routing: bool
     responses: Annotated[list[dict], operator.add]
 
 
+class CascadeAgentState(SurveyAgentState):
+    stage: str  # "screen" (cheap model) | "escalate" (expensive model)
+    confidence_threshold: float
+
+
+class CascadeState(SurveyState):
+    cheap_model: str
+    expensive_model: str
+    confidence_threshold: float
+    escalations: Annotated[list[dict], operator.add]  # personas to re-ask on the expensive model
+    cascade_calls: Annotated[list[dict], operator.add]  # per-call stage/model/token usage
+    cascade_summary: dict | None
+
+
 class DebateAgentState(TypedDict):
     respondent: dict
     agent_name: str
@@ -37,7 +56,11 @@ class DebateAgentState(TypedDict):
     persona_memory: bool
     round_number: int
     num_rounds: int
-    prior_transcript: str  # full raw transcript of all prior messages
+    context_round: int  # key into graph.context for the shared prior-rounds transcript
+    peer_messages: list[dict] | None  # sparse topologies: the k peer messages this agent reads
+    own_statement: str | None  # sparse topologies: this agent's own previous message
+    routing: bool
+    api_keys: dict[str, str]  # only when routing
 
 
 class DebateState(TypedDict):
@@ -48,7 +71,19 @@ class DebateState(TypedDict):
     temperatures: dict[str, float]
     survey_id: str
     persona_memory: bool
+    routing: bool
     num_rounds: int
     current_round: int
     debate_messages: Annotated[list[dict], operator.add]
+    context_strategy: str  # "full" (raw transcript) | "rolling" (digest + latest round)
+    context_token_budget: int
+    transcript_digest: str  # compressed rounds older than the latest one
+    round_context: str  # prior-rounds context for the upcoming round, built once in collect_round
+    topology: str  # "full" | "similarity" | "small_world"
+    peer_k: int
+    peer_assignments: dict[str, list[int]]  # agent key -> indices into the latest round's messages
+    round_policy: str  # "barrier" (wait for every call) | "quorum"
+    quorum_fraction: float
+    round_deadline_s: float
+    late_agents: list[dict]  # quorum rounds: agents still answering when the round closed
     analysis: dict | None
@@ -0,0 +1,85 @@
+"""Per-debate registry of in-flight panelist calls for quorum rounds.
+
+A quorum round closes before every call has returned. The unfinished calls
+keep running on the debate's thread pool and stay registered here, so the
+next round can skip those busy agents and carry their late messages into
+its transcript instead of dropping them.
+"""
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_inflight: dict[str, dict[str, Future]] = {}  # survey_id -> agent key -> future
+_lock = threading.Lock()
+
+
+def submit(survey_id: str, key: str, fn: Callable[[], dict]) -> Future:
+    """Run one panelist call on the debate's pool and register it as in flight."""
+    with _lock:
+        executor = _executors.get(survey_id)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.round_max_workers,
+                thread_name_prefix=f"debate-{survey_id[:8]}",
+            )
+            _executors[survey_id] = executor
+        future = executor.submit(fn)
+        _inflight.setdefault(survey_id, {})[key] = future
+    return future
+
+
+def finish(survey_id: str, key: str) -> None:
+    """Mark an agent's call as collected by its own round."""
+    with _lock:
+        _inflight.get(survey_id, {}).pop(key, None)
+
+
+def busy(survey_id: str) -> set[str]:
+    """Agents whose call from an earlier round is still running."""
+    with _lock:
+        return {k for k, f in _inflight.get(survey_id, {}).items() if not f.done()}
+
+
+def harvest(survey_id: str, timeout: float = 0.0) -> list[dict]:
+    """Collect the messages of straggler calls that have finished since their round closed.
+
+    With a `timeout`, first wait up to that long for the calls still in
+    flight, so the last round's stragglers are not cut off by the analysis.
+    """
+    if timeout > 0:
+        with _lock:
+            inflight = list(_inflight.get(survey_id, {}).values())
+        if inflight:
+            _, not_done = wait(inflight, timeout=timeout)
+            if not_done:
+                logger.info("Debate %s: %d straggler calls still running after %.0fs", survey_id, len(not_done), timeout)
+    with _lock:
+        pending = _inflight.get(survey_id, {})
+        done = {k: f for k, f in pending.items() if f.done()}
+        for key in done:
+            del pending[key]
+
+    messages = []
+    for key, future in done.items():
+        try:
+            messages.extend(future.result().get("debate_messages", []))
+        except Exception:
+            logger.exception("Late debate call for %s failed", key)
+    return messages
+
+
+def release(survey_id: str) -> None:
+    """Abandon remaining stragglers and shut the debate's pool down."""
+    with _lock:
+        executor = _executors.pop(survey_id, None)
+        abandoned = _inflight.pop(survey_id, {})
+    for future in abandoned.values():
+        future.cancel()
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,91 @@
+"""Debate topologies: which peers' messages each panelist sees in the next round.
+
+"full" — everyone reads everyone (the default, O(N²) tokens per debate).
+"similarity" — k peers per agent from a local TF-IDF index over the latest
+round: mostly the closest positions, plus a few deliberately contrasting ones.
+"small_world" — a fixed Watts–Strogatz graph over the panel (ring lattice of
+k neighbours with a few random long-range shortcuts), stable across rounds.
+"""
+import math
+import random
+import zlib
+
+from backend.services.similarity import similarity_matrix, tfidf_vectors
+
+# Probability of rewiring each ring edge into a random shortcut
+SMALL_WORLD_REWIRE_P = 0.1
+
+
+def agent_key(respondent_id: int, model: str) -> str:
+    """Stable ID of one panelist-model agent in a debate."""
+    return f"{respondent_id}:{model}"
+
+
+def _small_world_neighbours(agents: list[str], k: int, seed: int) -> dict[str, list[str]]:
+    n = len(agents)
+    rng = random.Random(seed)
+    half = max(1, k // 2)
+    neighbours: dict[str, list[str]] = {}
+    for i, agent in enumerate(agents):
+        picked: list[str] = []
+        for offset in range(1, half + 1):
+            for j in ((i + offset) % n, (i - offset) % n):
+                if rng.random() < SMALL_WORLD_REWIRE_P:
+                    j = rng.randrange(n)
+                candidate = agents[j]
+                if candidate != agent and candidate not in picked:
+                    picked.append(candidate)
+        neighbours[agent] = picked[:k]
+    return neighbours
+
+
+def _similarity_neighbours(
+    agents: list[str],
+    latest: dict[str, str],
+    k: int,
+    contrast_fraction: float,
+) -> dict[str, list[str]]:
+    speakers = [a for a in agents if a in latest]
+    index = {a: i for i, a in enumerate(speakers)}
+    sims = similarity_matrix(tfidf_vectors([latest[a] for a in speakers]))
+    n_contrast = min(k, math.floor(k * contrast_fraction + 0.5))
+
+    neighbours: dict[str, list[str]] = {}
+    for agent in agents:
+        others = [s for s in speakers if s != agent]
+        if agent not in index:
+            # Did not speak last round: nothing to compare, take the first k speakers
+            neighbours[agent] = others[:k]
+            continue
+        row = sims[index[agent]]
+        ranked = sorted(others, key=lambda s: row[index[s]], reverse=True)
+        similar = ranked[:k - n_contrast]
+        contrasting = [s for s in reversed(ranked) if s not in similar][:n_contrast]
+        neighbours[agent] = similar + contrasting
+    return neighbours
+
+
+def select_peers(
+    topology: str,
+    agents: list[str],
+    latest_messages: list[dict],
+    k: int,
+    contrast_fraction: float,
+    seed_key: str,
+) -> dict[str, list[int]]:
+    """Map each agent to the indices (into `latest_messages`) of the peers it will read.
+
+    `latest_messages` are the previous round's messages; each must carry
+    `respondent_id`, `model` and `text`.
+    """
+    by_agent = {agent_key(m["respondent_id"], m["model"]): i for i, m in enumerate(latest_messages)}
+    if topology == "small_world":
+        seed = zlib.crc32(seed_key.encode())
+        neighbours = _small_world_neighbours(agents, k, seed)
+    else:
+        latest_text = {a: latest_messages[i]["text"] for a, i in by_agent.items()}
+        neighbours = _similarity_neighbours(agents, latest_text, k, contrast_fraction)
+    return {
+        agent: [by_agent[p] for p in peers if p in by_agent]
+        for agent, peers in neighbours.items()
+    }
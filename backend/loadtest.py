@@ -0,0 +1,416 @@
+"""Load test: many concurrent survey clients against one backend, through the real protocol.
+
+Each client does what the frontend does — `POST /api/surveys`, `POST
+/breakdown` (survey mode; the analyzer is skipped), then opens
+`/ws/surveys/{id}`, sends its init message and reads events until
+`survey_done`. Stages step through every combination of concurrency, panel
+size and debate rounds (0 = survey mode), one after another on the same
+server. Per client it measures time to the first event, to the first
+response and to completion; per stage it scrapes `/metrics` for event loop
+lag, DuckDB lock waits, in-flight LLM calls and API process RSS.
+
+    python -m backend.loadtest --spawn --clients 1,10,25 --panel-sizes 10,100 --rounds 0,3
+
+`--spawn` starts uvicorn on a free port with `LLM_STUB=true` and a fresh
+database (other settings come from the environment, e.g. `JOB_PROCESSES`);
+otherwise `--url` points at a running backend, which should have the stub
+enabled. Results are written as JSON under `--out`; `--compare` prints
+each stage against an earlier result file.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+logger = logging.getLogger(__name__)
+
+BREAKDOWN_OPTIONS = ["Airflow", "Dagster", "Prefect", "dbt Cloud", "Cron / none"]
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][\w:]*)(?:\{([^}]*)\})? (\S+)$')
+
+
+def _parse_metrics(text: str) -> dict[str, float]:
+    """Prometheus text as {name: value} summed over labels, bucket lines as `name:le`."""
+    values: dict[str, float] = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        if name.endswith("_bucket"):
+            le = re.search(r'le="([^"]+)"', labels or "")
+            name = f"{name}:{le.group(1) if le else '+Inf'}"
+        values[name] = values.get(name, 0.0) + float(value)
+    return values
+
+
+def _histogram(before: dict, after: dict, name: str) -> dict:
+    """Count, mean and bucket-bound p50/p99 of what a histogram recorded between two scrapes."""
+    count = after.get(f"{name}_count", 0) - before.get(f"{name}_count", 0)
+    if count <= 0:
+        return {"count": 0, "mean": None, "p50": None, "p99": None}
+    total = after.get(f"{name}_sum", 0) - before.get(f"{name}_sum", 0)
+    prefix = f"{name}_bucket:"
+    bounds = sorted(
+        (float(key[len(prefix):]), after[key] - before.get(key, 0))
+        for key in after if key.startswith(prefix)
+    )
+
+    def quantile(q: float) -> float:
+        for bound, cumulative in bounds:
+            if cumulative >= q * count:
+                return bound
+        return float("inf")
+
+    return {"count": int(count), "mean": round(total / count, 6), "p50": quantile(0.5), "p99": quantile(0.99)}
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {"p50": at(0.5), "p95": at(0.95), "max": round(ordered[-1], 4)}
+
+
+class _Scraper:
+    """Polls `/metrics` in the background, keeping every parsed sample."""
+
+    def __init__(self, http: httpx.AsyncClient, interval: float):
+        self._http = http
+        self._interval = interval
+        self.samples: list[tuple[float, dict]] = []
+        self._task: asyncio.Task | None = None
+
+    async def scrape(self) -> dict:
+        response = await self._http.get("/metrics")
+        response.raise_for_status()
+        sample = _parse_metrics(response.text)
+        self.samples.append((time.perf_counter(), sample))
+        return sample
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self.scrape()
+            except httpx.HTTPError:
+                pass  # a scrape lost to an overloaded server is not a stage failure
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def peak(self, name: str, since: float) -> float | None:
+        values = [sample.get(name) for t, sample in self.samples if t >= since and name in sample]
+        return max(values) if values else None
+
+
+async def _client(
+    http: httpx.AsyncClient,
+    ws_base: str,
+    number: int,
+    panel_size: int,
+    rounds: int,
+    models: list[str],
+    api_keys: dict[str, str],
+    delay: float,
+) -> dict:
+    await asyncio.sleep(delay)
+    result = {"client": number, "error": None, "events": 0, "responses": 0,
+              "create_s": None, "first_event_s": None, "first_response_s": None, "completion_s": None}
+    question = f"Which orchestrator does your team run in production? (load test client {number})"
+    start = time.perf_counter()
+    response = await http.post("/api/surveys", json={
+        "question": question, "panel_size": panel_size, "filters": None,
+        "models": models, "analyzer_model": models[0],
+    })
+    response.raise_for_status()
+    survey_id = response.json()["id"]
+    result["create_s"] = time.perf_counter() - start
+    if not rounds:
+        response = await http.post(f"/api/surveys/{survey_id}/breakdown", json={"breakdown": {
+            "original_question": question,
+            "sub_questions": [{"id": "sq_1", "text": question, "answer_options": BREAKDOWN_OPTIONS, "chart_type": "pie"}],
+        }})
+        response.raise_for_status()
+
+    init = {"api_keys": api_keys, "chat_mode": "debate" if rounds else "survey", "num_rounds": rounds or 1}
+    async with connect(f"{ws_base}/ws/surveys/{survey_id}", max_size=None) as ws:
+        sent = time.perf_counter()
+        await ws.send(json.dumps(init))
+        try:
+            async for raw in ws:
+                now = time.perf_counter() - sent
+                event = json.loads(raw)
+                result["events"] += 1
+                if result["first_event_s"] is None:
+                    result["first_event_s"] = now
+                if event["type"] in ("survey_response", "debate_message"):
+                    result["responses"] += 1
+                    if result["first_response_s"] is None:
+                        result["first_response_s"] = now
+                elif event["type"] == "error":
+                    result["error"] = event["data"]["message"]
+                elif event["type"] == "survey_done":
+                    result["completion_s"] = now
+                    break
+        except ConnectionClosed:
+            pass
+    if result["completion_s"] is None and result["error"] is None:
+        result["error"] = "Closed before survey_done"
+    return result
+
+
+async def _stage(
+    http: httpx.AsyncClient,
+    ws_base: str,
+    scraper: _Scraper,
+    clients: int,
+    panel_size: int,
+    rounds: int,
+    args: argparse.Namespace,
+) -> dict:
+    api_keys = {provider: "load-test" for provider in ("openai", "anthropic", "google")}
+    before = await scraper.scrape()
+    started = time.perf_counter()
+    tasks = [
+        asyncio.wait_for(
+            _client(http, ws_base, i, panel_size, rounds, args.models, api_keys, args.ramp_s * i / clients),
+            args.timeout_s,
+        )
+        for i in range(clients)
+    ]
+    outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    wall = time.perf_counter() - started
+    after = await scraper.scrape()
+
+    results = []
+    for i, outcome in enumerate(outcomes):
+        if isinstance(outcome, BaseException):
+            reason = "Timed out" if isinstance(outcome, asyncio.TimeoutError) else f"{type(outcome).__name__}: {outcome}"
+            outcome = {"client": i, "error": reason}
+        results.append(outcome)
+    finished = [r for r in results if r.get("completion_s") is not None]
+    errors = [r["error"] for r in results if r.get("error")]
+    rss = scraper.peak("panelchat_process_resident_bytes", started)
+    return {
+        "clients": clients,
+        "panel_size": panel_size,
+        "rounds": rounds,
+        "wall_s": round(wall, 3),
+        "completed": len(finished),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:5],
+        "events": sum(r.get("events", 0) for r in results),
+        "responses": sum(r.get("responses", 0) for r in results),
+        "create_s": _percentiles([r["create_s"] for r in results if r.get("create_s") is not None]),
+        "first_event_s": _percentiles([r["first_event_s"] for r in results if r.get("first_event_s") is not None]),
+        "first_response_s": _percentiles([r["first_response_s"] for r in results if r.get("first_response_s") is not None]),
+        "completion_s": _percentiles([r["completion_s"] for r in finished]),
+        "event_loop_lag_s": _histogram(before, after, "panelchat_event_loop_lag_seconds"),
+        "db_lock_wait_s": _histogram(before, after, "panelchat_db_lock_wait_seconds"),
+        "llm_calls": int(after.get("panelchat_llm_call_seconds_count", 0) - before.get("panelchat_llm_call_seconds_count", 0)),
+        "llm_calls_in_flight_max": scraper.peak("panelchat_llm_calls_in_flight", started),
+        "ws_connections_max": scraper.peak("panelchat_ws_connections", started),
+        "rss_mb_max": round(rss / 2**20, 1) if rss is not None else None,
+        "clients_detail": results,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn(stub_latency_s: float, log_path: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {
+        **os.environ,
+        "LLM_STUB": "true",
+        "LLM_STUB_LATENCY_S": str(stub_latency_s),
+        "DUCKDB_PATH": os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "loadtest.duckdb"),
+    }
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def _wait_healthy(http: httpx.AsyncClient, process: subprocess.Popen | None, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}")
+        try:
+            if (await http.get("/api/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become healthy")
+
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() or None
+
+
+def _fmt(value, scale: float = 1.0, digits: int = 2) -> str:
+    return "-" if value is None else f"{value * scale:.{digits}f}"
+
+
+def _log_stage(stage: dict) -> None:
+    mode = f"debate x{stage['rounds']}" if stage["rounds"] else "survey"
+    logger.info(
+        f"{stage['clients']:>4} clients  panel {stage['panel_size']:>4}  {mode:<10}"
+        f"  done {stage['completed']:>3}/{stage['clients']:<3} errors {stage['errors']:>3}"
+        f"  first event p95 {_fmt(stage['first_event_s']['p95'])}s"
+        f"  first response p95 {_fmt(stage['first_response_s']['p95'])}s"
+        f"  completion p50/p95 {_fmt(stage['completion_s']['p50'])}/{_fmt(stage['completion_s']['p95'])}s"
+        f"  loop lag p99 {_fmt(stage['event_loop_lag_s']['p99'], 1000, 0)}ms"
+        f"  db lock mean {_fmt(stage['db_lock_wait_s']['mean'], 1000, 1)}ms"
+        f"  rss {_fmt(stage['rss_mb_max'], digits=0)}MB"
+    )
+    for error in stage["error_samples"]:
+        logger.warning("      error: %s", error)
+
+
+COMPARED = (
+    ("first_event_s", "p95"),
+    ("first_response_s", "p95"),
+    ("completion_s", "p95"),
+    ("event_loop_lag_s", "p99"),
+    ("db_lock_wait_s", "mean"),
+    ("rss_mb_max", None),
+    ("errors", None),
+)
+
+
+def _compare(current: dict, previous: dict) -> None:
+    logger.info("Against %s (%s):", previous.get("label") or previous.get("git"), previous["started_at"])
+    earlier = {(s["clients"], s["panel_size"], s["rounds"]): s for s in previous["stages"]}
+    for stage in current["stages"]:
+        old = earlier.get((stage["clients"], stage["panel_size"], stage["rounds"]))
+        if old is None:
+            continue
+        parts = []
+        for key, field in COMPARED:
+            new_value = stage[key][field] if field else stage[key]
+            old_value = old[key][field] if field else old[key]
+            if new_value is None or old_value is None:
+                continue
+            change = f"{(new_value - old_value) / old_value * 100:+.0f}%" if old_value else "n/a"
+            parts.append(f"{key}{'.' + field if field else ''} {old_value:g} -> {new_value:g} ({change})")
+        logger.info(
+            "  %d clients, panel %d, rounds %d: %s",
+            stage["clients"], stage["panel_size"], stage["rounds"], "; ".join(parts),
+        )
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    process = None
+    url = args.url
+    os.makedirs(args.out, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    if args.spawn:
+        log_path = os.path.join(args.out, f"server-{stamp}.log")
+        process, url = _spawn(args.stub_latency_s, log_path)
+        logger.info("Started backend at %s (log: %s)", url, log_path)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout_s, limits=limits) as http:
+            await _wait_healthy(http, process)
+            scraper = _Scraper(http, args.scrape_s)
+            scraper.start()
+            ws_base = url.replace("http", "ws", 1)
+            report = {
+                "label": args.label,
+                "git": _git_revision(),
+                "started_at": stamp,
+                "url": url,
+                "spawned": args.spawn,
+                "stub_latency_s": args.stub_latency_s if args.spawn else None,
+                "models": args.models,
+                "stages": [],
+            }
+            try:
+                for rounds in args.rounds:
+                    for panel_size in args.panel_sizes:
+                        for clients in args.clients:
+                            stage = await _stage(http, ws_base, scraper, clients, panel_size, rounds, args)
+                            report["stages"].append(stage)
+                            _log_stage(stage)
+            finally:
+                await scraper.stop()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    return report
+
+
+def _int_list(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend to load (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start a stubbed backend on a free port")
+    parser.add_argument("--clients", type=_int_list, default=[1, 5, 10, 25], help="Concurrent clients per stage")
+    parser.add_argument("--panel-sizes", type=_int_list, default=[10, 50])
+    parser.add_argument("--rounds", type=_int_list, default=[0, 2], help="Debate rounds; 0 runs a survey")
+    parser.add_argument("--models", type=lambda s: s.split(","), default=["gpt-4.1-mini"])
+    parser.add_argument("--stub-latency-s", type=float, default=0.5, help="LLM_STUB_LATENCY_S of a spawned backend")
+    parser.add_argument("--ramp-s", type=float, default=0.0, help="Spread each stage's client starts over this long")
+    parser.add_argument("--timeout-s", type=float, default=600.0, help="Per-client limit")
+    parser.add_argument("--scrape-s", type=float, default=0.5, help="Interval between /metrics scrapes")
+    parser.add_argument("--label", default="", help="Name for this result, e.g. the branch under test")
+    parser.add_argument("--out", default="loadtest-results")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per request otherwise
+
+    report = asyncio.run(_run(args))
+    name = "-".join(part for part in (report["started_at"], args.label or report["git"]) if part)
+    path = os.path.join(args.out, f"{name}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info("Saved %s", path)
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.db import init_db, close_db
-from backend.routers import respondents, surveys, ws
+from backend.routers import answers, jobs, metrics, respondents, surveys, ws
+from backend.services import jobs as job_manager
+from backend.services.metrics import watch_event_loop
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    loop_watcher = asyncio.create_task(watch_event_loop())
     yield
+    loop_watcher.cancel()
+    job_manager.shutdown()
     close_db()
 
 
@@ -24,11 +30,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Breakdown-Cache", "X-Breakdown-Similarity"],
 )
 
 app.include_router(respondents.router)
 app.include_router(surveys.router)
+app.include_router(jobs.router)
+app.include_router(answers.router)
 app.include_router(ws.router)
+app.include_router(metrics.router)
 
 
 @app.get("/api/health")
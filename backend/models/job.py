@@ -0,0 +1,130 @@
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from backend.config import settings
+
+
+class RunOptions(BaseModel):
+    """How to run a survey or debate — the WebSocket init message or the REST start body.
+
+    Unknown modes and out-of-range numbers are rejected rather than read as
+    the defaults, so a typo never starts a different run from the one asked for.
+    """
+    api_keys: dict[str, str] = {}
+    temperatures: dict[str, float] = {}
+    persona_memory: bool = True
+    chat_mode: Literal["survey", "debate"] = "survey"
+    num_rounds: int = Field(default=3, ge=1)
+    run_mode: Literal["compare", "cascade"] = "compare"
+    cascade: dict | None = None
+    samples_per_persona: int = 1
+    debate_context: Literal["full", "rolling"] = "full"
+    context_token_budget: int = Field(default_factory=lambda: settings.debate_context_token_budget, gt=0)
+    debate_topology: Literal["full", "similarity", "small_world"] = "full"
+    peer_k: int = Field(default_factory=lambda: settings.debate_peer_k, ge=1)
+    round_policy: Literal["barrier", "quorum"] = "barrier"
+    quorum_fraction: float = Field(default=0.8, gt=0, le=1)
+    round_deadline_s: float = Field(default_factory=lambda: settings.round_deadline_s, gt=0)
+    resume: bool = True
+    priority: Literal["auto", "interactive", "batch"] = "auto"
+    profile: bool = False  # also sample the CPU while the run lasts
+    budget_usd: float | None = Field(default=None, ge=0)  # stop starting LLM calls once projected spend would pass it
+    routing: bool = False  # answer persona calls on the healthiest model of each model's MODEL_GROUPS group
+
+    @field_validator("samples_per_persona", mode="before")
+    @classmethod
+    def at_least_one_sample(cls, v: Any) -> int:
+        return max(1, int(v))
+
+    @model_validator(mode="after")
+    def routing_needs_one_sample(self) -> "RunOptions":
+        # A persona's samples are one answer distribution: failing over part of them would mix models in it
+        if self.routing and self.samples_per_persona > 1:
+            raise ValueError("routing cannot be combined with samples_per_persona above 1")
+        return self
+
+
+class QueueStats(BaseModel):
+    """How long a job's LLM calls waited for the shared scheduler."""
+    calls: int = 0  # calls started
+    queued: int = 0  # calls waiting right now
+    wait_avg_s: float = 0.0
+    wait_max_s: float = 0.0
+
+
+class JobStatus(BaseModel):
+    survey_id: str
+    status: str  # "queued" | "running" | "completed" | "failed" | "cancelled"
+    chat_mode: str
+    priority: str  # "interactive" | "batch"
+    events: int  # events published so far (what a new subscriber replays)
+    subscribers: int
+    error: str | None = None
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    queue: QueueStats = QueueStats()
+
+
+class SpanStat(BaseModel):
+    category: str  # "run" | "queue" | "round" | "node" | "prompt" | "llm" | "parse" | "db"
+    name: str
+    count: int
+    total_s: float
+    max_s: float
+
+
+class Span(BaseModel):
+    name: str
+    category: str
+    start_us: int  # since the job was queued
+    duration_us: int
+    thread: int  # index into RunProfile.threads
+    args: dict[str, Any] = {}
+
+
+class RunProfile(BaseModel):
+    """Where a survey's latest run spent its time."""
+    survey_id: str
+    started_at: str  # when the job was queued
+    status: str | None = None
+    duration_s: float | None = None
+    dropped: int = 0  # spans not kept past PROFILE_MAX_SPANS
+    cpu_profile: bool = False  # whether folded CPU samples are available (format=folded)
+    summary: list[SpanStat]
+    threads: list[str]
+    spans: list[Span] | None = None
+
+
+class ModelEstimate(BaseModel):
+    model: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    latency_s: float  # expected per call
+    history_calls: int  # ledger calls the output and latency figures come from; 0 = defaults
+
+
+class RoundEstimate(BaseModel):
+    round: int
+    context_tokens: int  # transcript in each panelist's prompt
+    input_tokens: int
+    output_tokens: int
+    duration_s: float
+
+
+class RunEstimate(BaseModel):
+    """What running a survey with some `RunOptions` is expected to take, before it runs."""
+    survey_id: str
+    chat_mode: str
+    panelists: int
+    sized_panelists: int  # panelists whose prompts were sized; fewer with fast=true
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    duration_s: float
+    models: list[ModelEstimate]
+    rounds: list[RoundEstimate] = []  # debate only
@@ -32,12 +32,36 @@ class DebateAnalysis(BaseModel):
     synthesis: str = Field(description="3-5 sentence overall synthesis of the debate outcome")
 
 
+class RoundAnalysis(BaseModel):
+    """Partial ("map") analysis of one chunk of a single debate round."""
+    themes: list[DebateTheme] = Field(description="Position clusters among the panelists in this excerpt, largest first")
+    consensus_points: list[str] = Field(description="Points most panelists in this excerpt agree on")
+    key_tensions: list[str] = Field(description="Disagreements or fault lines in this excerpt")
+
+
+class ClusterLabel(BaseModel):
+    cluster: int = Field(description="Number of the precomputed cluster being labelled")
+    label: str = Field(description="Short descriptive label for this position cluster, e.g. 'Pro-AI Pragmatists'")
+    description: str = Field(description="2-3 sentence summary of what this group believes and why")
+    key_arguments: list[str] = Field(description="3-5 bullet-point arguments or quotes representative of this cluster")
+    sentiment: str = Field(description="Overall sentiment: 'positive', 'negative', 'mixed', or 'neutral'")
+
+
+class ClusterLabeling(BaseModel):
+    """Labels for locally precomputed debate clusters; membership is fixed."""
+    clusters: list[ClusterLabel] = Field(description="One entry per precomputed cluster")
+    consensus_points: list[str] = Field(description="Key points most or all panelists agree on")
+    key_tensions: list[str] = Field(description="Main disagreements or fault lines in the group")
+    synthesis: str = Field(description="3-5 sentence overall synthesis of the debate outcome")
+
+
 class SurveyRequest(BaseModel):
     question: str
     panel_size: int = 5
     filters: dict[str, list[str]] | None = None
     models: list[str]
     analyzer_model: str
+    analyzer_api_key: str | None = None  # analyze the question in the background right away
 
 
 class SurveyRunRequest(BaseModel):
@@ -52,6 +76,8 @@ class SurveyResponse(BaseModel):
     agent_name: str
     model: str
     answers: dict[str, str]  # sub_question_id -> chosen option
+    answer_distribution: dict[str, dict[str, int]] | None = None  # sub_question_id -> option -> votes
+    served_model: str | None = None  # the model that answered; differs from `model` when routing failed over
 
 
 class SurveySession(BaseModel):
@@ -75,3 +101,88 @@ class SurveySummary(BaseModel):
     question: str
     panel_size: int
     created_at: str | None = None
+
+
+class SurveyOverview(BaseModel):
+    """A survey without its bulky parts (responses, panel, debate transcript), only their counts."""
+    id: str
+    question: str
+    breakdown: QuestionBreakdown | None = None
+    panel_size: int
+    filters: dict[str, list[str]] | None = None
+    models: list[str]
+    chat_mode: str | None = None
+    debate_analysis: dict | None = None
+    created_at: str | None = None
+    panel_count: int
+    response_count: int
+    debate_message_count: int
+
+
+class ResponsePage(BaseModel):
+    responses: list[SurveyResponse]
+    next_cursor: str | None = None  # pass back as `cursor` for the next page; None on the last page
+
+
+class PromptSectionRow(BaseModel):
+    """Input tokens one prompt section cost a model's persona calls in a survey."""
+    model: str
+    section: str  # "persona" | "memory" | "sub_questions" | "transcript" | "instructions"
+    calls: int
+    tokens: int
+    avg_tokens: float  # per call
+    share: float  # of the model's input tokens in this survey
+
+
+class LedgerRow(BaseModel):
+    """One model's LLM calls in a survey, from the call ledger."""
+    model: str
+    provider: str
+    calls: int
+    errors: int
+    input_tokens: int  # including cached_input_tokens
+    cached_input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    latency_avg_s: float
+    latency_p95_s: float
+
+
+class SurveyLedger(BaseModel):
+    survey_id: str
+    calls: int
+    input_tokens: int
+    cached_input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    models: list[LedgerRow]
+
+
+class AggregateRow(BaseModel):
+    sub_question_id: str
+    model: str
+    group: str | None = None  # value of the group_by attribute, if grouped
+    option: str
+    weight: float  # responses choosing the option (multi-sample responses split theirs)
+
+
+class SurveyAggregates(BaseModel):
+    survey_id: str
+    group_by: str | None = None
+    responses: dict[str, int]  # model -> responses saved
+    rows: list[AggregateRow]
+
+
+class CrosstabRow(BaseModel):
+    survey_id: str
+    sub_question_id: str
+    segment: dict[str, str | None]  # dimension -> value, e.g. {"role": "Data Engineer", "model": "gpt-4.1"}
+    option: str
+    weight: float
+    responses: int  # responses giving the option any weight
+    share: float  # weight / all weight of this segment for the sub-question
+
+
+class Crosstab(BaseModel):
+    by: list[str]
+    rows: list[CrosstabRow]
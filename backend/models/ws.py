@@ -1,6 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from backend.config import settings
 
 
 class WSMessage(BaseModel):
     type: str  # "breakdown_complete" | "survey_response" | "survey_done" | "error"
     data: dict
+
+
+class StreamOptions(BaseModel):
+    """Framing a WebSocket client asks for in its init message (see services/stream.py)."""
+    flush_ms: int = 0  # 0 = one frame per event
+    encoding: str = "json"  # "json" | "msgpack"
+    buffer_events: int = Field(default_factory=lambda: settings.ws_buffer_events)
+    responses: bool = True  # False: skip survey_response messages, keep aggregate_update
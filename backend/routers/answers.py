@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Query
+
+from backend.models.survey import Crosstab
+from backend.services.aggregates import crosstab
+
+router = APIRouter(prefix="/api/answers", tags=["answers"])
+
+
+@router.get("/crosstab", response_model=Crosstab)
+def get_crosstab(
+    survey_id: list[str] = Query(...),
+    by: list[str] = Query(default=[]),
+    sub_question_id: str | None = None,
+):
+    try:
+        return crosstab(survey_id, by, sub_question_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
@@ -0,0 +1,46 @@
+import logging
+
+from fastapi import APIRouter, HTTPException
+
+from backend.models.job import JobStatus, RunOptions
+from backend.services import jobs
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("", response_model=list[JobStatus])
+def list_all():
+    return [job.to_status() for job in jobs.list_jobs()]
+
+
+@router.post("/{survey_id}", response_model=JobStatus, status_code=202)
+def start(survey_id: str, options: RunOptions):
+    try:
+        job = jobs.start(survey_id, options)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except jobs.JobConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    except jobs.JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return job.to_status()
+
+
+@router.get("/{survey_id}", response_model=JobStatus)
+def status(survey_id: str):
+    job = jobs.get(survey_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No job for this survey")
+    return job.to_status()
+
+
+@router.post("/{survey_id}/cancel", response_model=JobStatus)
+def cancel(survey_id: str):
+    job = jobs.cancel(survey_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="No job for this survey")
+    return job.to_status()
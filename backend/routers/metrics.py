@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.services.metrics import PROCESS_RESIDENT_BYTES, registry, resident_bytes
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Server metrics in the Prometheus text exposition format."""
+    PROCESS_RESIDENT_BYTES.set(value=resident_bytes())
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
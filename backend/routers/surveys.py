@@ -1,6 +1,8 @@
+import asyncio
 import logging
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from backend.models.survey import (
@@ -8,15 +10,32 @@ from backend.models.survey import (
     SurveySession,
     SurveySummary,
     QuestionBreakdown,
+    SurveyAggregates,
+    SurveyOverview,
+    ResponsePage,
+    PromptSectionRow,
+    SurveyLedger,
 )
+from backend.models.job import RunEstimate, RunOptions, RunProfile
+from backend.services import ledger, profiling
+from backend.services.estimator import estimate_run
 from backend.services.panel import select_panel
 from backend.services.history import (
     create_survey,
     list_surveys,
     get_survey,
     update_breakdown,
+    survey_exists,
+    get_survey_overview,
+    list_responses,
+    export_responses_ndjson,
+    export_responses_arrow,
+    get_prompt_sections,
 )
 from backend.services.analyzer import analyze_question
+from backend.services.speculation import speculate
+from backend.services.aggregates import get_aggregates
+from backend.graph.positions import precluster, preview_analysis
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +45,7 @@ router = APIRouter(prefix="/api/surveys", tags=["surveys"])
 class AnalyzeRequest(BaseModel):
     model: str
     api_key: str
+    fresh: bool = False  # skip the breakdown cache
 
 
 class BreakdownSubmission(BaseModel):
@@ -33,7 +53,14 @@ class BreakdownSubmission(BaseModel):
 
 
 @router.post("", response_model=SurveySession)
-def create(req: SurveyRequest):
+async def create(req: SurveyRequest):
+    """Create the survey and start preparing its run (see `services.speculation`)."""
+    session = await asyncio.to_thread(_create, req)
+    speculate(session, req.analyzer_model, req.analyzer_api_key)
+    return session
+
+
+def _create(req: SurveyRequest) -> SurveySession:
     panel = select_panel(req.panel_size, req.filters)
     panel_dicts = [r.model_dump() for r in panel]
     session = create_survey(
@@ -48,17 +75,23 @@ def create(req: SurveyRequest):
 
 
 @router.post("/{survey_id}/analyze", response_model=QuestionBreakdown)
-async def analyze(survey_id: str, req: AnalyzeRequest):
-    session = get_survey(survey_id)
+async def analyze(survey_id: str, req: AnalyzeRequest, response: Response):
+    """Break the survey's question down; `X-Breakdown-Cache` says whether it came from the cache."""
+    # DuckDB calls are blocking, keep them off the event loop
+    session = await asyncio.to_thread(get_survey, survey_id)
     if not session:
         raise HTTPException(status_code=404, detail="Survey not found")
 
-    breakdown = await analyze_question(
+    breakdown, cache, similarity = await analyze_question(
         question=session.question,
         model=req.model,
         api_key=req.api_key,
+        fresh=req.fresh,
     )
-    update_breakdown(survey_id, breakdown)
+    await asyncio.to_thread(update_breakdown, survey_id, breakdown)
+    response.headers["X-Breakdown-Cache"] = cache
+    if cache != "miss":
+        response.headers["X-Breakdown-Similarity"] = f"{similarity:.3f}"
     return breakdown
 
 
@@ -71,9 +104,148 @@ def submit_breakdown(survey_id: str, req: BreakdownSubmission):
     return req.breakdown
 
 
+@router.get("/{survey_id}/debate/preview")
+def debate_preview(survey_id: str):
+    """Thematic analysis preview from local clustering only — no LLM call."""
+    session = get_survey(survey_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    if not session.debate_messages:
+        raise HTTPException(status_code=409, detail="Survey has no debate messages")
+    return preview_analysis(precluster(session.debate_messages, seed_key=survey_id))
+
+
+@router.get("/{survey_id}/aggregates", response_model=SurveyAggregates)
+def aggregates(survey_id: str, group_by: str | None = None):
+    """Weighted option counts per sub-question and model, computed in DuckDB."""
+    try:
+        result = get_aggregates(survey_id, group_by)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return result
+
+
+@router.get("/{survey_id}/summary", response_model=SurveyOverview)
+def summary(survey_id: str):
+    """The survey's metadata and counts, without responses, panel or debate transcript."""
+    overview = get_survey_overview(survey_id)
+    if not overview:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return overview
+
+
+@router.get("/{survey_id}/responses", response_model=ResponsePage)
+def responses(
+    survey_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    model: str | None = None,
+):
+    """One page of responses in save order; pass `next_cursor` back as `cursor` for the next."""
+    if not survey_exists(survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    try:
+        return list_responses(survey_id, limit, cursor, model)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/{survey_id}/responses/export")
+def export_responses(survey_id: str, format: str = "ndjson"):
+    """Stream every response as NDJSON, or as an Arrow IPC stream with `format=arrow`."""
+    if format not in ("ndjson", "arrow"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or arrow")
+    if not survey_exists(survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    if format == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Arrow export requires pyarrow")
+        return StreamingResponse(
+            export_responses_arrow(survey_id),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"Content-Disposition": f'attachment; filename="{survey_id}.arrows"'},
+        )
+    return StreamingResponse(
+        export_responses_ndjson(survey_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{survey_id}.ndjson"'},
+    )
+
+
+@router.get("/{survey_id}/prompt-tokens", response_model=list[PromptSectionRow])
+def prompt_tokens(survey_id: str):
+    """Persona-call input tokens per model and prompt section, summed over the survey's runs."""
+    if not survey_exists(survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return get_prompt_sections(survey_id)
+
+
+@router.post("/{survey_id}/estimate", response_model=RunEstimate)
+def estimate(survey_id: str, options: RunOptions, fast: bool = False):
+    """Expected calls, tokens, cost and duration of running the survey with these options.
+
+    `fast=true` sizes a sample of the panel instead of every panelist.
+    """
+    session = get_survey(survey_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    try:
+        return estimate_run(session, options, fast=fast)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/{survey_id}/ledger", response_model=SurveyLedger)
+def call_ledger(survey_id: str):
+    """LLM calls, tokens, latency and cost per model, over all of the survey's runs."""
+    if not survey_exists(survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return ledger.get_ledger(survey_id)
+
+
+@router.get("/{survey_id}/profile", response_model=RunProfile)
+def profile(survey_id: str, format: str = "json", spans: bool = True):
+    """Span timeline of the survey's latest run.
+
+    `format=chrome` returns it as a Chrome trace, `format=folded` the sampled
+    CPU stacks of a run started with `profile: true`.
+    """
+    if format not in ("json", "chrome", "folded"):
+        raise HTTPException(status_code=400, detail="format must be json, chrome or folded")
+    run = profiling.load_profile(survey_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="No profiled run for this survey")
+    if format == "chrome":
+        return JSONResponse(
+            profiling.chrome_trace(run),
+            headers={"Content-Disposition": f'attachment; filename="{survey_id}.trace.json"'},
+        )
+    if format == "folded":
+        if not run["cpu_profile"]:
+            raise HTTPException(status_code=404, detail="Run was not CPU-profiled; start it with profile: true")
+        return PlainTextResponse(run["cpu_profile"])
+    return RunProfile(
+        **{k: run[k] for k in ("survey_id", "started_at", "status", "duration_s", "dropped", "threads")},
+        cpu_profile=run["cpu_profile"] is not None,
+        summary=profiling.summarize(run["spans"]),
+        spans=run["spans"] if spans else None,
+    )
+
+
 @router.get("", response_model=list[SurveySummary])
-def list_all():
-    return list_surveys()
+def list_all(response: Response, limit: int | None = Query(None, ge=1, le=500), cursor: str | None = None):
+    """Surveys newest first. With `limit`, the next page's cursor is in the `X-Next-Cursor` header."""
+    try:
+        surveys, next_cursor = list_surveys(limit, cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return surveys
 
 
 @router.get("/{survey_id}", response_model=SurveySession)
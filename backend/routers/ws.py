@@ -1,190 +1,90 @@
 import asyncio
 import json
 import logging
-import queue
-import threading
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
 
-from backend.services.history import (
-    get_survey,
-    save_response,
-    save_debate_message,
-    save_debate_analysis,
-    save_chat_mode,
-)
-from backend.graph.builder import build_survey_graph, build_debate_graph
+from backend.config import settings
+from backend.models.job import RunOptions
+from backend.models.ws import StreamOptions
+from backend.services import jobs, metrics
+from backend.services.stream import negotiate, send_events
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-_SENTINEL = object()
-
 
 @router.websocket("/ws/surveys/{survey_id}")
 async def survey_ws(websocket: WebSocket, survey_id: str):
+    """Stream a survey's run to the client.
+
+    The run itself is a background job (see `services.jobs`): this socket
+    starts one from its init message, or attaches to the job already running
+    for the survey, replays the events published so far and then forwards
+    new ones. Disconnecting only detaches; the job keeps running.
+    """
     await websocket.accept()
+    metrics.WS_CONNECTIONS.inc()
+    job = None
+    events = None
 
     try:
         # First message must contain the API keys + config
         init_raw = await websocket.receive_text()
         init_msg = json.loads(init_raw)
-        api_keys = init_msg.get("api_keys", {})
-        temperatures = init_msg.get("temperatures", {})
-        persona_memory = init_msg.get("persona_memory", True)
-        chat_mode = init_msg.get("chat_mode", "survey")
-        num_rounds = init_msg.get("num_rounds", 3)
-
-        if not api_keys or not any(api_keys.values()):
-            await websocket.send_json({"type": "error", "data": {"message": "At least one API key required"}})
-            await websocket.close()
-            return
-
-        session = get_survey(survey_id)
-        if not session:
-            await websocket.send_json({"type": "error", "data": {"message": "Survey not found"}})
-            await websocket.close()
-            return
-
-        if not session.panel:
-            await websocket.send_json({"type": "error", "data": {"message": "No panel selected"}})
-            await websocket.close()
-            return
+        stream = StreamOptions(**init_msg)
+        encoding = negotiate(stream.encoding)
+        batched = stream.flush_ms > 0
 
-        # Persist chat mode so historical loads know whether this is a survey or debate
-        save_chat_mode(survey_id, chat_mode)
-        logger.info("Survey %s: chat_mode=%s, persisted to DB", survey_id, chat_mode)
-
-        if chat_mode == "debate":
-            graph = build_debate_graph()
-            initial_state = {
-                "question": session.question,
-                "panel": session.panel,
-                "models": session.models,
-                "api_keys": api_keys,
-                "temperatures": temperatures,
-                "survey_id": survey_id,
-                "persona_memory": persona_memory,
-                "num_rounds": num_rounds,
-                "current_round": 1,
-                "debate_messages": [],
-                "analysis": None,
-            }
+        job = jobs.get_active(survey_id)
+        if job:
+            logger.info("Survey %s: attaching to running job", survey_id)
         else:
-            if not session.breakdown:
-                await websocket.send_json({"type": "error", "data": {"message": "No breakdown configured"}})
+            try:
+                job = jobs.start(survey_id, RunOptions(**init_msg))
+            except (LookupError, ValueError, ValidationError, jobs.JobConflict, jobs.JobQueueFull) as exc:
+                message = exc.errors()[0]["msg"] if isinstance(exc, ValidationError) else str(exc)
+                await websocket.send_json({"type": "error", "data": {"message": message}})
                 await websocket.close()
                 return
 
-            sub_questions_dicts = [sq.model_dump() for sq in session.breakdown.sub_questions]
-            graph = build_survey_graph()
-            initial_state = {
-                "question": session.question,
-                "sub_questions": sub_questions_dicts,
-                "panel": session.panel,
-                "models": session.models,
-                "api_keys": api_keys,
-                "temperatures": temperatures,
-                "survey_id": survey_id,
-                "persona_memory": persona_memory,
-                "responses": [],
-            }
-
-        # Thread-safe queue for streaming chunks from graph thread to async handler
-        chunk_queue: queue.Queue = queue.Queue()
-
-        def run_graph():
-            try:
-                for chunk in graph.stream(initial_state, stream_mode="updates"):
-                    chunk_queue.put(chunk)
-                chunk_queue.put(_SENTINEL)
-            except Exception as exc:
-                logger.exception("Graph execution failed")
-                chunk_queue.put(exc)
-
-        thread = threading.Thread(target=run_graph, daemon=True)
-        thread.start()
-
-        loop = asyncio.get_event_loop()
-        while True:
-            item = await loop.run_in_executor(None, chunk_queue.get)
-
-            if item is _SENTINEL:
-                break
-
-            if isinstance(item, Exception):
-                await websocket.send_json({"type": "error", "data": {"message": str(item)}})
-                break
-
-            for node_name, node_output in item.items():
-                if node_name == "survey_respond":
-                    responses = node_output.get("responses", [])
-                    for resp in responses:
-                        saved = save_response(
-                            survey_id=survey_id,
-                            respondent_id=resp["respondent_id"],
-                            agent_name=resp["agent_name"],
-                            model=resp["model"],
-                            answers=resp["answers"],
-                        )
-                        await websocket.send_json({
-                            "type": "survey_response",
-                            "data": {
-                                "id": saved.id,
-                                "survey_id": survey_id,
-                                "respondent_id": resp["respondent_id"],
-                                "agent_name": resp["agent_name"],
-                                "model": resp["model"],
-                                "answers": resp["answers"],
-                                "token_usage": resp.get("token_usage"),
-                            },
-                        })
-
-                elif node_name == "debate_respond":
-                    debate_messages = node_output.get("debate_messages", [])
-                    for msg in debate_messages:
-                        msg_data = {
-                            "respondent_id": msg["respondent_id"],
-                            "agent_name": msg["agent_name"],
-                            "model": msg["model"],
-                            "round": msg["round"],
-                            "text": msg["text"],
-                            "token_usage": msg.get("token_usage"),
-                        }
-                        save_debate_message(survey_id, msg_data)
-                        logger.info("Survey %s: saved debate message from respondent %s round %s", survey_id, msg["respondent_id"], msg["round"])
-                        await websocket.send_json({
-                            "type": "debate_message",
-                            "data": msg_data,
-                        })
-
-                elif node_name == "collect_round":
-                    current_round = node_output.get("current_round", 1)
-                    round_data = {
-                        "round": current_round - 1,
-                        "total_rounds": num_rounds,
-                    }
-                    logger.info("Survey %s: completed round %s", survey_id, current_round - 1)
-                    await websocket.send_json({
-                        "type": "round_complete",
-                        "data": round_data,
-                    })
-
-                elif node_name == "analyze_debate":
-                    analysis = node_output.get("analysis")
-                    if analysis:
-                        save_debate_analysis(survey_id, analysis)
-                        logger.info("Survey %s: saved debate analysis with %d themes", survey_id, len(analysis.get("themes", [])))
-                        await websocket.send_json({
-                            "type": "debate_analysis",
-                            "data": analysis,
-                        })
-
-        await websocket.send_json({
-            "type": "survey_done",
-            "data": {"survey_id": survey_id},
-        })
+        if batched or "encoding" in init_msg:
+            # Acknowledge in JSON so the client learns the encoding before switching decoders
+            await websocket.send_json({
+                "type": "stream_ready",
+                "data": {"flush_ms": stream.flush_ms, "encoding": encoding},
+            })
+
+        replay, events = job.subscribe(asyncio.get_running_loop(), maxsize=stream.buffer_events)
+        if not stream.responses:
+            replay = [e for e in replay if e["type"] != "survey_response"]
+        await send_events(websocket, replay, encoding, batched, settings.ws_batch_max)
+        done = False
+        while not done:
+            event = await events.get()
+            metrics.WS_QUEUE_DEPTH.observe(events.qsize() + 1)
+            if batched and event is not None and event is not jobs.LAGGED:
+                # Coalesce whatever else arrives within the flush interval into one frame
+                await asyncio.sleep(stream.flush_ms / 1000)
+            pending: list[dict] = []
+            while True:
+                if event is None or event is jobs.LAGGED:
+                    done = True
+                    break
+                if stream.responses or event["type"] != "survey_response":
+                    pending.append(event)
+                if not batched or len(pending) >= settings.ws_batch_max or events.empty():
+                    break
+                event = events.get_nowait()
+            if event is jobs.LAGGED:
+                logger.warning("Survey %s: dropping subscriber that fell %d events behind", survey_id, stream.buffer_events)
+                pending.append({"type": "error", "data": {"message": "Client fell behind; reconnect to resume"}})
+            if pending:
+                await send_events(websocket, pending, encoding, batched, settings.ws_batch_max)
+        if event is jobs.LAGGED:
+            await websocket.close(code=1013)
 
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected for survey %s", survey_id)
@@ -194,3 +94,7 @@ async def survey_ws(websocket: WebSocket, survey_id: str):
             await websocket.send_json({"type": "error", "data": {"message": str(exc)}})
         except Exception:
             pass
+    finally:
+        metrics.WS_CONNECTIONS.dec()
+        if job and events is not None:
+            job.unsubscribe(events)
@@ -0,0 +1,138 @@
+"""Option counts per sub-question and model, kept incrementally or queried from DuckDB.
+
+A response counts once per sub-question. Multi-sample responses split that
+vote across options in proportion to their sample counts
+(`answer_distribution`); single-draw responses put it all on their answer —
+the same weighting the frontend charts use.
+"""
+from backend.db import execute_query
+from backend.models.survey import AggregateRow, Crosstab, CrosstabRow, SurveyAggregates
+from backend.services.panel import FILTERABLE_COLUMNS
+
+CROSSTAB_DIMENSIONS = [*FILTERABLE_COLUMNS, "model"]
+
+
+def answer_weights(answers: dict, distribution: dict | None, sub_question_id: str) -> dict[str, float]:
+    votes = (distribution or {}).get(sub_question_id)
+    if votes:
+        total = sum(votes.values())
+        if total > 0:
+            return {option: n / total for option, n in votes.items()}
+    chosen = answers.get(sub_question_id)
+    return {chosen: 1.0} if chosen else {}
+
+
+def response_delta(resp: dict, sub_question_ids: list[str]) -> dict:
+    """The `aggregate_update` one new response contributes: {model, responses, counts}."""
+    return {
+        "model": resp["model"],
+        "responses": 1,
+        "counts": {
+            sq_id: answer_weights(resp["answers"], resp.get("answer_distribution"), sq_id)
+            for sq_id in sub_question_ids
+        },
+    }
+
+
+def merge_deltas(deltas: list[dict]) -> list[dict]:
+    """Sum deltas into one per model (e.g. to snapshot a resumed run's saved responses)."""
+    merged: dict[str, dict] = {}
+    for delta in deltas:
+        total = merged.setdefault(delta["model"], {"model": delta["model"], "responses": 0, "counts": {}})
+        total["responses"] += delta["responses"]
+        for sq_id, weights in delta["counts"].items():
+            counts = total["counts"].setdefault(sq_id, {})
+            for option, weight in weights.items():
+                counts[option] = counts.get(option, 0.0) + weight
+    return list(merged.values())
+
+
+def get_aggregates(survey_id: str, group_by: str | None = None) -> SurveyAggregates | None:
+    """Weighted option counts for a saved survey, read from the `survey_answers` facts.
+
+    `group_by` splits the counts by a respondent attribute (one of
+    FILTERABLE_COLUMNS); raises ValueError for any other column. Returns
+    None if the survey does not exist.
+    """
+    if group_by is not None and group_by not in FILTERABLE_COLUMNS:
+        raise ValueError(f"Cannot group by {group_by!r}; use one of {', '.join(FILTERABLE_COLUMNS)}")
+    if not execute_query("SELECT 1 FROM surveys WHERE id = ?", [survey_id]).fetchone():
+        return None
+    group_expr = f"CAST(r.{group_by} AS VARCHAR)" if group_by else "NULL"
+
+    rows = execute_query(
+        f"""SELECT a.sub_question_id, a.model, {group_expr} AS grp, a.option, sum(a.weight)
+            FROM survey_answers a
+            LEFT JOIN respondents r ON r.id = a.respondent_id
+            WHERE a.survey_id = ?
+            GROUP BY ALL
+            ORDER BY a.sub_question_id, a.model, grp, a.option""",
+        [survey_id],
+    ).fetchall()
+
+    responses = execute_query(
+        "SELECT model, count(*) FROM survey_responses WHERE survey_id = ? GROUP BY model ORDER BY model",
+        [survey_id],
+    ).fetchall()
+
+    return SurveyAggregates(
+        survey_id=survey_id,
+        group_by=group_by,
+        responses={r[0]: r[1] for r in responses},
+        rows=[
+            AggregateRow(sub_question_id=r[0], model=r[1], group=r[2], option=r[3], weight=round(r[4], 6))
+            for r in rows
+        ],
+    )
+
+
+def crosstab(survey_ids: list[str], by: list[str], sub_question_id: str | None = None) -> Crosstab:
+    """Answer × segment table over one or many surveys, in one DuckDB query.
+
+    Segments are any mix of FILTERABLE_COLUMNS and "model". Each row is one
+    (survey, sub-question, segment, option) cell with its weighted count and
+    its share of the segment's answers to that sub-question.
+    """
+    invalid = [dim for dim in by if dim not in CROSSTAB_DIMENSIONS]
+    if invalid:
+        raise ValueError(f"Cannot segment by {', '.join(invalid)}; use {', '.join(CROSSTAB_DIMENSIONS)}")
+    if not survey_ids:
+        raise ValueError("At least one survey_id required")
+    dims = list(dict.fromkeys(by))
+    dim_exprs = [("a.model" if dim == "model" else f"CAST(r.{dim} AS VARCHAR)") + f" AS {dim}" for dim in dims]
+    segment = ", ".join(dims)
+
+    query = f"""
+        SELECT a.survey_id, a.sub_question_id, {"".join(e + ", " for e in dim_exprs)}a.option,
+               sum(a.weight) AS weight, count(DISTINCT a.response_id) AS responses
+        FROM survey_answers a
+        LEFT JOIN respondents r ON r.id = a.respondent_id
+        WHERE a.survey_id IN ({", ".join("?" * len(survey_ids))})
+    """
+    params: list = list(survey_ids)
+    if sub_question_id:
+        query += " AND a.sub_question_id = ?"
+        params.append(sub_question_id)
+    rows = execute_query(
+        f"""SELECT *, weight / sum(weight) OVER (PARTITION BY survey_id, sub_question_id{", " + segment if segment else ""}) AS share
+            FROM ({query} GROUP BY ALL)
+            ORDER BY survey_id, sub_question_id{", " + segment if segment else ""}, option""",
+        params,
+    ).fetchall()
+
+    n = len(dims)
+    return Crosstab(
+        by=dims,
+        rows=[
+            CrosstabRow(
+                survey_id=row[0],
+                sub_question_id=row[1],
+                segment=dict(zip(dims, row[2:2 + n])),
+                option=row[2 + n],
+                weight=round(row[3 + n], 6),
+                responses=row[4 + n],
+                share=round(row[5 + n], 6),
+            )
+            for row in rows
+        ],
+    )
@@ -1,8 +1,10 @@
+import asyncio
 import logging
 
 from langchain_core.messages import SystemMessage, HumanMessage
 
 from backend.models.survey import QuestionBreakdown
+from backend.services import breakdowns
 from backend.services.llm import get_llm
 
 logger = logging.getLogger(__name__)
@@ -25,18 +27,65 @@ ANALYZER_USER = """Convert the following into structured sub-questions with cate
 {question}"""
 
 
+_inflight: dict[tuple[str, str], asyncio.Future] = {}  # (normalized question, model) -> pending analysis
+
+
 async def analyze_question(
     question: str,
     model: str,
     api_key: str,
-) -> QuestionBreakdown:
+    fresh: bool = False,
+) -> tuple[QuestionBreakdown, str, float]:
+    """Break a question down into sub-questions: from the cache if it (or a near-duplicate)
+    was analyzed with this model before, otherwise with an LLM call that does not block
+    the event loop.
+
+    Returns the breakdown, where it came from ("exact", "similar" or "miss") and the
+    similarity of the cached question. `fresh` skips the cache lookup; the new
+    breakdown still replaces the cached one.
+    """
+    if not fresh:
+        cached = await asyncio.to_thread(breakdowns.lookup, question, model)
+        if cached:
+            breakdown, similarity = cached
+            logger.info("Breakdown cache hit for model=%s (similarity %.2f)", model, similarity)
+            return breakdown, "exact" if similarity == 1.0 else "similar", similarity
+
+    # Concurrent requests for the same question share one LLM call
+    key = (breakdowns.normalize_question(question), model)
+    while (pending := _inflight.get(key)) is not None:
+        try:
+            breakdown = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled() or asyncio.current_task().cancelling():
+                raise
+            continue  # the leading request was cancelled, not this one: take over
+        return breakdown.model_copy(update={"original_question": question}), "miss", 0.0
+    pending = _inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        breakdown = await _generate(question, model, api_key)
+    except Exception as exc:
+        pending.set_exception(exc)
+        pending.exception()  # retrieved: waiters re-raise it, nobody else needs to
+        raise
+    else:
+        pending.set_result(breakdown)
+    finally:
+        _inflight.pop(key, None)
+        if not pending.done():
+            pending.cancel()  # cancelled or interrupted: release the waiters
+    await asyncio.to_thread(breakdowns.store, question, model, breakdown)
+    return breakdown, "miss", 0.0
+
+
+async def _generate(question: str, model: str, api_key: str) -> QuestionBreakdown:
     """Use an LLM with structured output to break down a question into sub-questions."""
     llm = get_llm(model, api_key)
     structured_llm = llm.with_structured_output(QuestionBreakdown)
 
     logger.info("Analyzing question with model=%s", model)
 
-    result = structured_llm.invoke([
+    result = await structured_llm.ainvoke([
         SystemMessage(content=ANALYZER_SYSTEM),
         HumanMessage(content=ANALYZER_USER.format(question=question)),
     ])
@@ -0,0 +1,144 @@
+"""Cache of analyzer breakdowns, keyed by normalized question text and analyzer model.
+
+Questions are normalized (Unicode-folded, lowercased, punctuation dropped,
+whitespace collapsed) before lookup, so retyping a question with different
+case or punctuation is an exact hit. Near-duplicates, such as a changed word
+or a reordered clause, are found through an in-memory index of character
+shingles: candidates sharing a shingle are scored by Jaccard similarity, and
+the closest one at or above `BREAKDOWN_SIMILARITY` is offered, but only if it
+has the same content words in the same order. Wording that shares most of its
+characters can still ask the opposite ("should we" / "should we not"), so a
+near-duplicate may differ from the question in `STOPWORDS` alone.
+
+Entries live in `breakdown_cache`, so exact hits survive restarts and are
+shared by every process using the database. The shingle index is built from
+that table on first use and only sees entries this process adds after that.
+"""
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+
+from backend.config import settings
+from backend.db import execute_query
+from backend.models.survey import QuestionBreakdown
+
+SHINGLE_CHARS = 4
+
+# Words that can be added, dropped or swapped without changing what is asked.
+# Negations, quantifiers and comparatives ("not", "no", "all", "more") are
+# deliberately absent.
+STOPWORDS = frozenset("""
+    a an the this that these those
+    is are was were be been being am do does did has have had
+    i me my we us our you your they them their it its
+    of in on at to for with by from about into as
+    please currently today generally usually
+""".split())
+
+_index: dict[str, dict[str, tuple[str, frozenset[str]]]] | None = None  # model -> key -> (normalized, shingles)
+_postings: dict[tuple[str, str], set[str]] = {}  # (model, shingle) -> keys
+_index_lock = threading.Lock()
+
+
+def normalize_question(question: str) -> str:
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _shingles(normalized: str) -> frozenset[str]:
+    if len(normalized) <= SHINGLE_CHARS:
+        return frozenset([normalized])
+    return frozenset(normalized[i:i + SHINGLE_CHARS] for i in range(len(normalized) - SHINGLE_CHARS + 1))
+
+
+def _content_words(normalized: str) -> list[str]:
+    return [word for word in normalized.split() if word not in STOPWORDS]
+
+
+def _key(normalized: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalized}".encode()).hexdigest()
+
+
+def _add_to_index(key: str, model: str, normalized: str) -> None:
+    shingles = _shingles(normalized)
+    _index.setdefault(model, {})[key] = (normalized, shingles)
+    for shingle in shingles:
+        _postings.setdefault((model, shingle), set()).add(key)
+
+
+def _ensure_index() -> None:
+    global _index
+    with _index_lock:
+        if _index is not None:
+            return
+        _index = {}
+        for key, model, normalized in execute_query(
+            "SELECT key, model, normalized_question FROM breakdown_cache",
+        ).fetchall():
+            _add_to_index(key, model, normalized)
+
+
+def _most_similar(model: str, normalized: str) -> tuple[str, float] | None:
+    """The closest indexed question of this model at or above `BREAKDOWN_SIMILARITY` that
+    differs from `normalized` only in stopwords, with its Jaccard similarity.
+    """
+    shingles = _shingles(normalized)
+    content = _content_words(normalized)
+    with _index_lock:
+        entries = _index.get(model, {})
+        shared: dict[str, int] = {}
+        for shingle in shingles:
+            for key in _postings.get((model, shingle), ()):
+                shared[key] = shared.get(key, 0) + 1
+        best = None
+        for key, overlap in shared.items():
+            other, other_shingles = entries[key]
+            similarity = overlap / (len(shingles) + len(other_shingles) - overlap)
+            if similarity < settings.breakdown_similarity or (best and similarity <= best[1]):
+                continue
+            if _content_words(other) == content:
+                best = (key, similarity)
+    return best
+
+
+def lookup(question: str, model: str) -> tuple[QuestionBreakdown, float] | None:
+    """A cached breakdown for the question (or a near-duplicate differing only in
+    stopwords) and its similarity, 1.0 if exact.
+
+    The breakdown's `original_question` is the question asked, not the cached one.
+    """
+    normalized = normalize_question(question)
+    key = _key(normalized, model)
+    similarity = 1.0
+    row = execute_query("SELECT breakdown FROM breakdown_cache WHERE key = ?", [key]).fetchone()
+    if not row:
+        _ensure_index()
+        match = _most_similar(model, normalized)
+        if not match:
+            return None
+        key, similarity = match
+        row = execute_query("SELECT breakdown FROM breakdown_cache WHERE key = ?", [key]).fetchone()
+        if not row:
+            return None
+    execute_query("UPDATE breakdown_cache SET hits = hits + 1 WHERE key = ?", [key])
+    breakdown = QuestionBreakdown.model_validate_json(row[0])
+    breakdown.original_question = question
+    return breakdown, similarity
+
+
+def store(question: str, model: str, breakdown: QuestionBreakdown) -> None:
+    normalized = normalize_question(question)
+    key = _key(normalized, model)
+    execute_query(
+        """INSERT INTO breakdown_cache (key, model, normalized_question, breakdown)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT (key) DO UPDATE SET breakdown = excluded.breakdown, created_at = now()""",
+        [key, model, normalized, json.dumps(breakdown.model_dump())],
+    )
+    _ensure_index()
+    with _index_lock:
+        if key not in _index.get(model, {}):
+            _add_to_index(key, model, normalized)
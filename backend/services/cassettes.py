@@ -0,0 +1,350 @@
+"""Recorded LLM traffic of survey runs, for rerunning them without providers.
+
+With `CASSETTE_MODE=record`, every LLM call a run makes is appended to
+`<CASSETTE_DIR>/<survey_id>.jsonl.gz`: one line per call with the model and
+its parameters, the prompt messages, the response (content, usage and
+response metadata) or the error, the recorded latency and when in the run
+it started.
+With `CASSETTE_MODE=replay` the same calls are answered from the survey's
+cassette instead, after the recorded latency times `CASSETTE_LATENCY_SCALE`
+(0 answers at once); no API key, provider package or network is needed.
+
+A replayed call is matched to the recorded call with the same model,
+parameters and prompt. When the prompt differs — the change under test
+edited it, or the memory block grew — it gets the next unused recording of
+the same model and call kind, so the run keeps its recorded shape. Recorded
+failures are replayed as `RecordedError`, which keeps the provider error's
+type name (`error_type`); calls with nothing left to replay
+raise `CassetteMiss`. Nodes handle both like a failed provider call.
+
+Recording and replay are keyed by the survey whose run is making the call,
+bound by `services.llm.call_llm`; calls outside a run (question analysis)
+go to the provider. `use` replays a cassette for a survey with another id.
+"""
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+_survey: contextvars.ContextVar[str | None] = contextvars.ContextVar("cassette_survey", default=None)
+
+
+class CassetteMiss(Exception):
+    """Raised for a replayed call that its survey's cassette has no response for."""
+
+
+class RecordedError(Exception):
+    """Raised for a replayed call whose recording failed, with the original error's type and message.
+
+    `error_type` is the class name of the provider's exception (e.g.
+    `BadRequestError`), for handlers that tell provider errors apart by name.
+    """
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(error_type, message)
+        self.error_type = error_type
+
+    def __str__(self) -> str:
+        return self.args[1]
+
+
+def error_type(exc: BaseException) -> str:
+    """The class name of the provider error behind `exc`, also when it is a replayed recording."""
+    if isinstance(exc, RecordedError):
+        return exc.error_type
+    return type(exc).__name__
+
+
+def bind(survey_id: str) -> contextvars.Token:
+    """Attribute LLM calls made in this context to the survey's cassette."""
+    return _survey.set(survey_id)
+
+
+def unbind(token: contextvars.Token) -> None:
+    _survey.reset(token)
+
+
+def cassette_path(survey_id: str) -> str:
+    return os.path.join(settings.cassette_dir, f"{survey_id}.jsonl.gz")
+
+
+class _Recorder:
+    """Appends a run's calls to its cassette as they finish, timed from the start of its first call."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._origin = time.time()
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def write(self, entry: dict) -> None:
+        entry["offset_s"] = round(entry.pop("started_at") - self._origin, 4)
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self.calls += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class _Player:
+    """Serves a cassette's responses: by exact request first, then in recorded order per call kind."""
+
+    def __init__(self, path: str):
+        self._by_key: dict[str, deque[dict]] = {}
+        self._by_kind: dict[tuple, deque[dict]] = {}
+        self._last: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.exact = self.reordered = self.missed = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                entry["used"] = False
+                self._by_key.setdefault(entry["key"], deque()).append(entry)
+                self._by_kind.setdefault(_kind(entry), deque()).append(entry)
+
+    def take(self, key: str, kind: tuple) -> dict:
+        with self._lock:
+            entry = self._next(self._by_key.get(key))
+            if entry is not None:
+                self.exact += 1
+            elif key in self._last:
+                # The same request again (a resumed run): answer it the same way
+                entry = self._last[key]
+                self.exact += 1
+            else:
+                entry = self._next(self._by_kind.get(kind))
+                if entry is None:
+                    self.missed += 1
+                    raise CassetteMiss(f"No recorded {kind[1]} call of {kind[0]} left to replay")
+                self.reordered += 1
+            entry["used"] = True
+            self._last[key] = entry
+            return entry
+
+    @staticmethod
+    def _next(entries: deque[dict] | None) -> dict | None:
+        while entries:
+            if not entries[0]["used"]:
+                return entries.popleft()
+            entries.popleft()
+        return None
+
+
+_recorders: dict[str, _Recorder] = {}
+_players: dict[str, _Player] = {}
+_sources: dict[str, str] = {}  # survey_id -> cassette to replay, set by `use`
+_lock = threading.Lock()
+
+
+def use(survey_id: str, path: str) -> None:
+    """Replay the cassette at `path` for this survey's runs in this process instead of the survey's own."""
+    with _lock:
+        _sources[survey_id] = path
+        _players.pop(survey_id, None)
+
+
+def _recorder(survey_id: str) -> _Recorder:
+    with _lock:
+        recorder = _recorders.get(survey_id)
+        if recorder is None:
+            recorder = _recorders[survey_id] = _Recorder(cassette_path(survey_id))
+        return recorder
+
+
+def _player(survey_id: str) -> _Player:
+    with _lock:
+        player = _players.get(survey_id)
+        if player is None:
+            path = _sources.get(survey_id) or cassette_path(survey_id)
+            if not os.path.exists(path):
+                raise CassetteMiss(f"No cassette at {path}")
+            player = _players[survey_id] = _Player(path)
+        return player
+
+
+def close(survey_id: str) -> None:
+    """Finish the survey's recording or replay when its run ends."""
+    with _lock:
+        recorder = _recorders.pop(survey_id, None)
+        player = _players.pop(survey_id, None)
+        _sources.pop(survey_id, None)
+    if recorder:
+        recorder.close()
+        logger.info("Survey %s: recorded %d LLM calls", survey_id, recorder.calls)
+    if player:
+        logger.info(
+            "Survey %s: replayed %d LLM calls exactly, %d in recorded order, %d missed",
+            survey_id, player.exact, player.reordered, player.missed,
+        )
+
+
+def _kind(entry: dict) -> tuple:
+    return entry["model"], entry["method"], entry.get("schema")
+
+
+def _request_key(model: str, method: str, schema: str | None, params: dict, prompts: list[list[dict]]) -> str:
+    payload = json.dumps([model, method, schema, params, prompts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _dump_result(method: str, result) -> object:
+    if method == "batch":
+        return [message_to_dict(m) for m in result]
+    if method == "generate":
+        return {
+            "generations": [
+                [{"message": message_to_dict(g.message), "generation_info": g.generation_info} for g in gens]
+                for gens in result.generations
+            ],
+            "llm_output": result.llm_output,
+        }
+    if method == "structured_raw":
+        parsed = result["parsed"]
+        return {
+            "raw": message_to_dict(result["raw"]),
+            "parsed": parsed.model_dump() if hasattr(parsed, "model_dump") else parsed,
+            "parsing_error": str(result["parsing_error"]) if result.get("parsing_error") else None,
+        }
+    if method == "structured":
+        return result.model_dump() if hasattr(result, "model_dump") else result
+    return message_to_dict(result)
+
+
+def _load_result(method: str, data, schema) -> object:
+    def validate(value):
+        return schema.model_validate(value) if value is not None and hasattr(schema, "model_validate") else value
+
+    if method == "batch":
+        return messages_from_dict(data)
+    if method == "generate":
+        return LLMResult(
+            generations=[
+                [
+                    ChatGeneration(message=messages_from_dict([g["message"]])[0], generation_info=g["generation_info"])
+                    for g in gens
+                ]
+                for gens in data["generations"]
+            ],
+            llm_output=data["llm_output"],
+        )
+    if method == "structured_raw":
+        return {
+            "raw": messages_from_dict([data["raw"]])[0],
+            "parsed": validate(data["parsed"]),
+            "parsing_error": ValueError(data["parsing_error"]) if data["parsing_error"] else None,
+        }
+    if method == "structured":
+        return validate(data)
+    return messages_from_dict([data])[0]
+
+
+class CassetteLLM:
+    """Stands in for a chat model: records or replays the calls of a run, passes others through.
+
+    Covers what the graph uses of a chat model — `invoke`, `batch`,
+    `generate`, `with_structured_output` and `ainvoke`. The provider model
+    is only built when a call actually goes to the provider.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        build: Callable[[], object],
+        params: dict,
+        schema=None,
+        include_raw: bool = False,
+    ):
+        self.model = model
+        self._build = build
+        self._params = params
+        self._schema = schema
+        self._include_raw = include_raw
+        self._inner = None
+
+    def _provider(self):
+        if self._inner is None:
+            inner = self._build()
+            if self._schema is not None:
+                inner = inner.with_structured_output(self._schema, include_raw=self._include_raw)
+            self._inner = inner
+        return self._inner
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs) -> "CassetteLLM":
+        return CassetteLLM(self.model, self._build, self._params, schema, include_raw)
+
+    def _method(self, method: str) -> str:
+        if self._schema is None:
+            return method
+        return "structured_raw" if self._include_raw else "structured"
+
+    def _call(self, method: str, prompts: list[list], call: Callable[[], object]):
+        survey_id = _survey.get()
+        if survey_id is None or settings.cassette_mode not in ("record", "replay"):
+            return call()
+        schema_name = getattr(self._schema, "__name__", None)
+        method = self._method(method)
+        request = [[message_to_dict(m) for m in messages] for messages in prompts]
+        key = _request_key(
+            self.model, method, schema_name, self._params,
+            [[(m["type"], m["data"].get("content")) for m in messages] for messages in request],
+        )
+        if settings.cassette_mode == "replay":
+            entry = _player(survey_id).take(key, (self.model, method, schema_name))
+            if settings.cassette_latency_scale > 0:
+                time.sleep(entry["latency_s"] * settings.cassette_latency_scale)
+            if entry.get("error"):
+                # Cassettes recorded before `error_type` was stored carry it as the message prefix
+                raise RecordedError(entry.get("error_type") or entry["error"].partition(":")[0], entry["error"])
+            return _load_result(method, entry["response"], self._schema)
+        recorder = _recorder(survey_id)
+        started_at = time.time()
+        start = time.perf_counter()
+        entry = {
+            "model": self.model, "method": method, "schema": schema_name, "params": self._params,
+            "key": key, "request": request, "started_at": started_at,
+        }
+        try:
+            result = call()
+        except Exception as exc:
+            recorder.write({
+                **entry, "error": f"{type(exc).__name__}: {exc}", "error_type": type(exc).__name__, "response": None,
+                "latency_s": round(time.perf_counter() - start, 4),
+            })
+            raise
+        recorder.write({
+            **entry, "response": _dump_result(method, result),
+            "latency_s": round(time.perf_counter() - start, 4),
+        })
+        return result
+
+    def invoke(self, messages: list, **kwargs):
+        return self._call("invoke", [messages], lambda: self._provider().invoke(messages, **kwargs))
+
+    def batch(self, inputs: list[list], **kwargs):
+        return self._call("batch", inputs, lambda: self._provider().batch(inputs, **kwargs))
+
+    def generate(self, batch_messages: list[list], **kwargs):
+        return self._call("generate", batch_messages, lambda: self._provider().generate(batch_messages, **kwargs))
+
+    async def ainvoke(self, messages: list, **kwargs):
+        if _survey.get() is None:
+            return await self._provider().ainvoke(messages, **kwargs)
+        return await asyncio.to_thread(self.invoke, messages, **kwargs)
@@ -0,0 +1,121 @@
+"""Local clustering of short texts over the TF-IDF vectors from `similarity`.
+
+Spherical k-means (cosine k-means on L2-normalized sparse vectors) with
+k-means++ seeding, k chosen by the silhouette score. Deterministic for a
+given seed; no external service or model is involved.
+"""
+import random
+
+from backend.services.similarity import SparseVector, normalize, cosine
+
+# Below this best silhouette the texts are treated as one undivided cluster
+MIN_SILHOUETTE = 0.05
+# Silhouette needs each scored point's similarity to every point; larger
+# inputs are scored on a seeded sample, so only those rows are computed
+SILHOUETTE_SAMPLE = 300
+
+
+def _centroid(members: list[SparseVector]) -> SparseVector:
+    total: dict[str, float] = {}
+    for vec in members:
+        for term, weight in vec.items():
+            total[term] = total.get(term, 0.0) + weight
+    return normalize(total)
+
+
+def _kmeans_pp(vectors: list[SparseVector], k: int, rng: random.Random) -> list[SparseVector]:
+    centroids = [vectors[rng.randrange(len(vectors))]]
+    while len(centroids) < k:
+        dist = [1.0 - max(cosine(v, c) for c in centroids) for v in vectors]
+        total = sum(dist)
+        if total <= 0:
+            break
+        pick = rng.random() * total
+        for i, d in enumerate(dist):
+            pick -= d
+            if pick <= 0:
+                centroids.append(vectors[i])
+                break
+    return centroids
+
+
+def kmeans(vectors: list[SparseVector], k: int, seed: int = 0, n_init: int = 3, max_iter: int = 30) -> list[int]:
+    """Cluster label per vector; the best of `n_init` seeded runs by total similarity."""
+    best_labels: list[int] = [0] * len(vectors)
+    best_score = float("-inf")
+    for run in range(n_init):
+        rng = random.Random(seed + run)
+        centroids = _kmeans_pp(vectors, k, rng)
+        labels: list[int] = []
+        for _ in range(max_iter):
+            new_labels = [
+                max(range(len(centroids)), key=lambda c: cosine(v, centroids[c]))
+                for v in vectors
+            ]
+            if new_labels == labels:
+                break
+            labels = new_labels
+            centroids = [
+                _centroid([v for v, lab in zip(vectors, labels) if lab == c]) or centroids[c]
+                for c in range(len(centroids))
+            ]
+        score = sum(cosine(v, centroids[lab]) for v, lab in zip(vectors, labels))
+        if score > best_score:
+            best_score, best_labels = score, labels
+    return _relabel(best_labels)
+
+
+def _relabel(labels: list[int]) -> list[int]:
+    """Renumber clusters 0..n-1 by size, largest first."""
+    sizes: dict[int, int] = {}
+    for lab in labels:
+        sizes[lab] = sizes.get(lab, 0) + 1
+    order = {lab: i for i, lab in enumerate(sorted(sizes, key=lambda lab: (-sizes[lab], lab)))}
+    return [order[lab] for lab in labels]
+
+
+def silhouette(rows: dict[int, list[float]], labels: list[int]) -> float:
+    """Mean silhouette (cosine distance) over the points whose similarity rows are given.
+
+    `rows` maps a point's index to its cosine similarity with every point.
+    """
+    scores = []
+    for i, sims in rows.items():
+        by_cluster: dict[int, list[float]] = {}
+        for j, sim in enumerate(sims):
+            if j != i:
+                by_cluster.setdefault(labels[j], []).append(1.0 - sim)
+        own = by_cluster.pop(labels[i], None)
+        if not own or not by_cluster:
+            scores.append(0.0)
+            continue
+        a = sum(own) / len(own)
+        b = min(sum(d) / len(d) for d in by_cluster.values())
+        scores.append((b - a) / max(a, b) if max(a, b) > 0 else 0.0)
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def cluster_texts(vectors: list[SparseVector], max_k: int = 8, seed: int = 0) -> tuple[list[int], float]:
+    """Cluster vectors with k chosen by silhouette; returns (labels, silhouette)."""
+    n = len(vectors)
+    if n < 3:
+        return [0] * n, 0.0
+
+    scored = range(n)
+    if n > SILHOUETTE_SAMPLE:
+        scored = random.Random(seed).sample(range(n), SILHOUETTE_SAMPLE)
+    rows = {i: [cosine(vectors[i], v) for v in vectors] for i in scored}
+
+    best_labels, best_score = [0] * n, MIN_SILHOUETTE
+    for k in range(2, min(max_k, n - 1) + 1):
+        labels = kmeans(vectors, k, seed)
+        score = silhouette(rows, labels)
+        if score > best_score:
+            best_labels, best_score = labels, score
+    return best_labels, (best_score if max(best_labels) > 0 else 0.0)
+
+
+def top_terms(vectors: list[SparseVector], labels: list[int], cluster: int, n: int = 3) -> list[str]:
+    """Highest-weight centroid terms of one cluster, for local labels."""
+    centroid = _centroid([v for v, lab in zip(vectors, labels) if lab == cluster])
+    return [t for t, _ in sorted(centroid.items(), key=lambda kv: (-kv[1], kv[0]))[:n]]
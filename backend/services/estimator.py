@@ -0,0 +1,370 @@
+"""Pre-run token, cost and duration estimates for a survey or debate.
+
+The estimate sizes the prompts the graph would send. Every panelist's persona
+prompt is rendered, and their memory block is measured from the answers it
+would hold. Both are cached: profiles per respondent and memory sections per
+response, since neither changes once written. Debate rounds add the
+transcript the way `RunOptions` would build it (full, rolling under its token
+budget, or peer statements), so it grows by one round of statements per
+round. Character counts become tokens through each model's calibration from
+reported usage (`services.tokens`).
+
+Output tokens and latency come from the model's successful calls in the
+ledger (`llm_calls`), per chat mode: the average output tokens, and latency
+as a linear fit on output tokens. Models with no history use defaults.
+Durations assume the run has the scheduler's `LLM_MAX_WORKERS` to itself and
+that debate rounds wait for every panelist.
+
+With `fast`, only an evenly spaced sample of `SAMPLE_PANELISTS` panelists is
+sized and the totals are scaled to the panel, so a large panel is answered
+in milliseconds.
+"""
+import math
+import threading
+import time
+
+from backend.config import settings
+from backend.db import execute_query
+from backend.graph.builder import pick_cascade_pair
+from backend.graph.nodes import _build_system_prompt, _format_history_entry, _format_sub_questions
+from backend.graph.prompts import (
+    PERSONA_MEMORY_BLOCK,
+    SURVEY_USER,
+    SURVEY_CONFIDENCE_SUFFIX,
+    DEBATE_DISCUSS_USER,
+    DEBATE_DISCUSS_FOLLOWUP_USER,
+    DEBATE_DISCUSS_PEERS_USER,
+    DEBATE_DIGEST_SYSTEM,
+    DEBATE_DIGEST_USER,
+    DEBATE_MAP_SYSTEM,
+    DEBATE_MAP_USER,
+    DEBATE_REDUCE_SYSTEM,
+    DEBATE_REDUCE_USER,
+)
+from backend.models.job import ModelEstimate, RoundEstimate, RunEstimate, RunOptions
+from backend.models.respondent import Respondent
+from backend.models.survey import SurveySession
+from backend.services.history import get_history_entries, list_history_responses
+from backend.services.llm import _detect_provider, supports_native_samples
+from backend.services.pricing import estimate_cost
+from backend.services.tokens import CHARS_PER_TOKEN, calibrated_tokens
+
+SAMPLE_PANELISTS = 50
+HISTORY_TTL_S = 60.0  # how long ledger statistics are reused
+
+# For models without successful calls in the ledger
+DEFAULT_LATENCY = (1.0, 0.02)  # seconds before the first token, seconds per output token
+DEFAULT_STATEMENT_TOKENS = 120  # a 2-4 sentence debate statement
+DEFAULT_MAP_OUTPUT_TOKENS = 400
+DEFAULT_REDUCE_OUTPUT_TOKENS = 800
+REDUCE_CHARS_PER_AGENT = 120  # roster line and share of the cluster excerpts
+ESCALATION_RATE = 0.3  # cascade: share of panelists assumed to be re-asked on the expensive model
+# The ledger does not tell debate statements from digest, map and reduce calls,
+# so those are sized from the defaults rather than from statement averages
+ANALYSIS_HISTORY: dict = {}
+
+_persona_chars: dict[int, int] = {}  # respondent id -> persona prompt length without memory
+_memory_sections: dict[str, int] = {}  # response id -> length of its memory section, numbered 0
+_cache_lock = threading.Lock()
+_history: tuple[float, dict] | None = None  # (loaded at, (model, chat_mode) -> stats)
+_history_lock = threading.Lock()
+
+
+def _memory_chars(respondent_ids: list[int], survey_id: str) -> dict[int, int]:
+    """Length of each respondent's memory block, as `_memory_block` would build it for this survey."""
+    rows = list_history_responses(respondent_ids, survey_id)
+    with _cache_lock:
+        missing = [response_id for _, response_id in rows if response_id not in _memory_sections]
+    if missing:
+        sizes = {
+            response_id: len(_format_history_entry(0, entry)) - 1
+            for response_id, entry in get_history_entries(missing).items()
+        }
+        with _cache_lock:
+            _memory_sections.update(sizes)
+
+    sections: dict[int, list[int]] = {}
+    with _cache_lock:
+        for respondent_id, response_id in rows:
+            sections.setdefault(respondent_id, []).append(_memory_sections.get(response_id, 0))
+    header = len(PERSONA_MEMORY_BLOCK.format(history_text=""))
+    return {
+        respondent_id: header + sum(n + len(str(i)) for i, n in enumerate(lengths, 1)) + 2 * (len(lengths) - 1)
+        for respondent_id, lengths in sections.items()
+    }
+
+
+def _system_prompt_chars(panel: list[dict], survey_id: str, persona_memory: bool) -> list[int]:
+    """Length of each panelist's system prompt, memory included."""
+    with _cache_lock:
+        missing = [p for p in panel if p["id"] not in _persona_chars]
+    sizes = {p["id"]: len(_build_system_prompt(p, "")) for p in missing}
+    memory = _memory_chars([p["id"] for p in panel], survey_id) if persona_memory else {}
+    with _cache_lock:
+        _persona_chars.update(sizes)
+        return [_persona_chars[p["id"]] + memory.get(p["id"], 0) for p in panel]
+
+
+def _ledger_history() -> dict[tuple[str, str], tuple]:
+    """(model, chat_mode) -> (calls, avg output tokens, avg latency, latency intercept, latency slope)."""
+    global _history
+    with _history_lock:
+        if _history and time.monotonic() - _history[0] < HISTORY_TTL_S:
+            return _history[1]
+        rows = execute_query(
+            """SELECT l.model, coalesce(json_extract_string(s.chat_mode, '$'), 'survey'),
+                      count(*), avg(l.output_tokens), avg(l.latency_s),
+                      regr_intercept(l.latency_s, l.output_tokens), regr_slope(l.latency_s, l.output_tokens)
+               FROM llm_calls l JOIN surveys s ON s.id = l.survey_id
+               WHERE l.error IS NULL
+               GROUP BY ALL""",
+        ).fetchall()
+        _history = (time.monotonic(), {(r[0], r[1]): r[2:] for r in rows})
+        return _history[1]
+
+
+class _CallModel:
+    """Expected output tokens and latency of one model's calls in a chat mode."""
+
+    def __init__(self, model: str, chat_mode: str, default_output: float, history: dict):
+        stats = history.get((model, chat_mode))
+        self.history_calls = stats[0] if stats else 0
+        self.output_tokens = stats[1] if stats and stats[1] else default_output
+        if not stats:
+            self.intercept, self.slope = DEFAULT_LATENCY
+        elif stats[3] is not None and stats[4] is not None and stats[3] >= 0 and stats[4] >= 0:
+            self.intercept, self.slope = stats[3], stats[4]
+        else:
+            # Too few or too uniform calls for a fit
+            self.intercept, self.slope = stats[2], 0.0
+
+    def latency(self, output_tokens: float | None = None) -> float:
+        return self.intercept + self.slope * (self.output_tokens if output_tokens is None else output_tokens)
+
+
+class _Tally:
+    """Calls, tokens and busy time per model."""
+
+    def __init__(self):
+        self.models: dict[str, dict] = {}
+
+    def add(self, model: str, calls: float, input_tokens: float, output_tokens: float, latency_s: float,
+            history_calls: int = 0) -> float:
+        """Count `calls` calls; returns their total busy seconds."""
+        entry = self.models.setdefault(model, {
+            "calls": 0.0, "input_tokens": 0.0, "output_tokens": 0.0, "busy_s": 0.0, "history_calls": 0,
+        })
+        entry["calls"] += calls
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["busy_s"] += calls * latency_s
+        entry["history_calls"] = max(entry["history_calls"], history_calls)
+        return calls * latency_s
+
+    def estimates(self) -> list[ModelEstimate]:
+        result = []
+        for model, e in self.models.items():
+            cost = estimate_cost(model, {"input_tokens": e["input_tokens"], "output_tokens": e["output_tokens"]})
+            result.append(ModelEstimate(
+                model=model,
+                calls=round(e["calls"]),
+                input_tokens=round(e["input_tokens"]),
+                output_tokens=round(e["output_tokens"]),
+                cost_usd=round(cost, 6),
+                latency_s=round(e["busy_s"] / e["calls"], 3) if e["calls"] else 0.0,
+                history_calls=e["history_calls"],
+            ))
+        return sorted(result, key=lambda m: m.cost_usd, reverse=True)
+
+
+def _wall_time(busy_s: float, longest_s: float) -> float:
+    """Duration of a batch of concurrent calls on the scheduler's workers."""
+    return max(busy_s / settings.llm_max_workers, longest_s)
+
+
+def _usable_models(session: SurveySession, options: RunOptions) -> list[str]:
+    """The survey's models that would run: those with an API key, or all of them if no keys were given."""
+    if not any(options.api_keys.values()):
+        return list(session.models)
+    return [m for m in session.models if options.api_keys.get(_detect_provider(m))]
+
+
+def estimate_run(session: SurveySession, options: RunOptions, fast: bool = False) -> RunEstimate:
+    """Expected calls, tokens, cost and duration of running the survey with these options.
+
+    Raises ValueError if the run could not start (no panel, no breakdown, no model).
+    """
+    if not session.panel:
+        raise ValueError("No panel selected")
+    models = _usable_models(session, options)
+    if not models:
+        raise ValueError("No model with an API key")
+    if options.chat_mode != "debate" and not session.breakdown:
+        raise ValueError("No breakdown configured")
+
+    panel = session.panel
+    if fast and len(panel) > SAMPLE_PANELISTS:
+        step = len(panel) / SAMPLE_PANELISTS
+        panel = [panel[int(i * step)] for i in range(SAMPLE_PANELISTS)]
+    scale = len(session.panel) / len(panel)
+    system_chars = sum(_system_prompt_chars(panel, session.id, options.persona_memory)) * scale
+    history = _ledger_history()
+    tally = _Tally()
+
+    if options.chat_mode == "debate":
+        names = sum(len(Respondent(**p).display_name()) for p in panel) * scale
+        rounds, duration = _estimate_debate(session, options, models, system_chars, names, history, tally)
+    else:
+        rounds = []
+        duration = _estimate_survey(session, options, models, system_chars, history, tally)
+
+    per_model = tally.estimates()
+    return RunEstimate(
+        survey_id=session.id,
+        chat_mode=options.chat_mode,
+        panelists=len(session.panel),
+        sized_panelists=len(panel),
+        calls=sum(m.calls for m in per_model),
+        input_tokens=sum(m.input_tokens for m in per_model),
+        output_tokens=sum(m.output_tokens for m in per_model),
+        cost_usd=round(sum(m.cost_usd for m in per_model), 6),
+        duration_s=round(duration, 1),
+        models=per_model,
+        rounds=rounds,
+    )
+
+
+def _estimate_survey(session: SurveySession, options: RunOptions, models: list[str], system_chars: float,
+                     history: dict, tally: _Tally) -> float:
+    panelists = len(session.panel)
+    sub_questions = [sq.model_dump() for sq in session.breakdown.sub_questions]
+    user_chars = len(SURVEY_USER.format(
+        question=session.question, sub_questions_text=_format_sub_questions(sub_questions),
+    ))
+    default_output = 10 + 15 * len(sub_questions)  # a JSON object with one answer per sub-question
+    samples = options.samples_per_persona
+
+    def stage(stage_models: list[str], share: float, extra_chars: int = 0) -> float:
+        busy = longest = 0.0
+        for model in stage_models:
+            calls = _CallModel(model, "survey", default_output, history)
+            requests = 1 if samples == 1 or supports_native_samples(model) else samples
+            latency = calls.latency(calls.output_tokens * samples / requests)
+            busy += tally.add(
+                model,
+                panelists * share * requests,
+                calibrated_tokens(model, (system_chars + panelists * (user_chars + extra_chars)) * share * requests),
+                panelists * share * calls.output_tokens * samples,
+                latency,
+                calls.history_calls,
+            )
+            longest = max(longest, latency)
+        return _wall_time(busy, longest)
+
+    if options.run_mode != "cascade":
+        return stage(models, 1.0)
+    cascade = options.cascade or {}
+    # `models` already holds only keyed models, or all of them for a keyless estimate
+    cheap, expensive = pick_cascade_pair(models, cascade.get("cheap_model"), cascade.get("expensive_model"))
+    return stage([cheap], 1.0, len(SURVEY_CONFIDENCE_SUFFIX)) + stage([expensive], ESCALATION_RATE)
+
+
+def _estimate_debate(session: SurveySession, options: RunOptions, models: list[str], system_chars: float,
+                     name_chars: float, history: dict, tally: _Tally) -> tuple[list[RoundEstimate], float]:
+    panelists = len(session.panel)
+    agents = panelists * len(models)
+    num_rounds = options.num_rounds
+    question = session.question
+    callers = {m: _CallModel(m, "debate", DEFAULT_STATEMENT_TOKENS, history) for m in models}
+    summary_model = models[0]  # the first model with a key summarizes and analyses
+
+    # One statement as it appears in a transcript: "Name: text"
+    statement_chars = sum(c.output_tokens for c in callers.values()) / len(callers) * CHARS_PER_TOKEN
+    line_chars = name_chars / panelists + 2 + statement_chars
+    round_chars = len("--- Round 1 ---") + agents * (line_chars + 1) + 2
+    sparse = options.debate_topology != "full"
+    peers = min(options.peer_k, max(agents - 1, 0))
+    rolling = options.debate_context == "rolling"
+    budget_chars = options.context_token_budget * CHARS_PER_TOKEN
+    latest_chars = peers * (line_chars + 3) if sparse else round_chars
+    digest_limit = max(budget_chars - latest_chars, budget_chars // 4)
+
+    rounds: list[RoundEstimate] = []
+    duration = 0.0
+    digest = 0.0
+    for round_number in range(1, num_rounds + 1):
+        fold_s = 0.0
+        if rolling and round_number >= 3:
+            # collect_round folds the round before the latest into the digest, calling the LLM when over budget
+            merged = digest + round_chars
+            if merged > digest_limit:
+                caller = _CallModel(summary_model, "debate", digest_limit / CHARS_PER_TOKEN, ANALYSIS_HISTORY)
+                prompt = len(DEBATE_DIGEST_SYSTEM) + len(DEBATE_DIGEST_USER) + digest + round_chars
+                out = digest_limit / CHARS_PER_TOKEN
+                fold_s = tally.add(
+                    summary_model, 1, calibrated_tokens(summary_model, prompt), out,
+                    caller.latency(out), caller.history_calls,
+                )
+                merged = digest_limit
+            digest = merged
+
+        if round_number == 1:
+            user_chars = len(DEBATE_DISCUSS_USER.format(question=question, round_number=1, num_rounds=num_rounds))
+            context = 0.0
+        elif sparse:
+            user_chars = len(DEBATE_DISCUSS_PEERS_USER.format(
+                question=question, round_number=round_number, num_rounds=num_rounds,
+                earlier_rounds="", own_statement="", peer_statements="",
+            ))
+            context = statement_chars + peers * (line_chars + 3)
+            if rolling and digest:
+                context += digest + len("\nSummary of earlier rounds:\n\n")
+        else:
+            user_chars = len(DEBATE_DISCUSS_FOLLOWUP_USER.format(
+                question=question, round_number=round_number, num_rounds=num_rounds, prior_transcript="",
+            ))
+            if rolling:
+                context = round_chars + (digest + len("Summary of earlier rounds:\n\n\n") if digest else 0)
+            else:
+                context = (round_number - 1) * round_chars
+
+        busy = longest = 0.0
+        input_tokens = output_tokens = 0.0
+        for model, caller in callers.items():
+            tokens_in = calibrated_tokens(model, system_chars + panelists * (user_chars + context))
+            latency = caller.latency()
+            busy += tally.add(model, panelists, tokens_in, panelists * caller.output_tokens, latency, caller.history_calls)
+            longest = max(longest, latency)
+            input_tokens += tokens_in
+            output_tokens += panelists * caller.output_tokens
+        round_s = _wall_time(busy, longest) + fold_s
+        duration += round_s
+        rounds.append(RoundEstimate(
+            round=round_number,
+            context_tokens=round(context / CHARS_PER_TOKEN),
+            input_tokens=round(input_tokens),
+            output_tokens=round(output_tokens),
+            duration_s=round(round_s, 1),
+        ))
+
+    # Map step: chunks of each round analysed in the background as rounds close
+    chunk = settings.analysis_chunk_size
+    mapper = _CallModel(summary_model, "debate", DEFAULT_MAP_OUTPUT_TOKENS, ANALYSIS_HISTORY)
+    map_latency = mapper.latency(DEFAULT_MAP_OUTPUT_TOKENS)
+    prompt = len(DEBATE_MAP_SYSTEM) + len(DEBATE_MAP_USER)
+    chunks = math.ceil(agents / chunk) * num_rounds
+    tally.add(
+        summary_model, chunks,
+        calibrated_tokens(summary_model, chunks * prompt + num_rounds * agents * (line_chars + 12)),
+        chunks * DEFAULT_MAP_OUTPUT_TOKENS, map_latency, mapper.history_calls,
+    )
+    # Reduce step after the last round: only the last round's maps and the labelling are waited for
+    reducer = _CallModel(summary_model, "debate", DEFAULT_REDUCE_OUTPUT_TOKENS, ANALYSIS_HISTORY)
+    reduce_latency = reducer.latency(DEFAULT_REDUCE_OUTPUT_TOKENS)
+    prompt = len(DEBATE_REDUCE_SYSTEM) + len(DEBATE_REDUCE_USER) + agents * REDUCE_CHARS_PER_AGENT
+    tally.add(
+        summary_model, 1, calibrated_tokens(summary_model, prompt), DEFAULT_REDUCE_OUTPUT_TOKENS,
+        reduce_latency, reducer.history_calls,
+    )
+    duration += _wall_time(math.ceil(agents / chunk) * map_latency, map_latency) + reduce_latency
+    return rounds, duration
@@ -1,11 +1,18 @@
+import base64
+import io
 import json
 import uuid
-from backend.db import execute_query
+from collections.abc import Iterator
+from backend.db import RemoteResult, execute_query
+from backend.services.aggregates import answer_weights
 from backend.models.survey import (
     SurveySession,
     SurveySummary,
     SurveyResponse,
     QuestionBreakdown,
+    SurveyOverview,
+    ResponsePage,
+    PromptSectionRow,
 )
 
 
@@ -44,12 +51,31 @@ def save_response(
     agent_name: str,
     model: str,
     answers: dict[str, str],
+    answer_distribution: dict[str, dict[str, int]] | None = None,
+    served_model: str | None = None,
 ) -> SurveyResponse:
     resp_id = str(uuid.uuid4())
     execute_query(
-        "INSERT INTO survey_responses (id, survey_id, respondent_id, agent_name, model, answers) VALUES (?, ?, ?, ?, ?, ?)",
-        [resp_id, survey_id, respondent_id, agent_name, model, json.dumps(answers)],
+        """INSERT INTO survey_responses
+               (id, survey_id, respondent_id, agent_name, model, answers, answer_distribution, served_model)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [
+            resp_id, survey_id, respondent_id, agent_name, model, json.dumps(answers),
+            json.dumps(answer_distribution) if answer_distribution is not None else None,
+            served_model,
+        ],
     )
+    facts = [
+        [survey_id, resp_id, respondent_id, model, sq_id, option, weight]
+        for sq_id in answers
+        for option, weight in answer_weights(answers, answer_distribution, sq_id).items()
+        if weight > 0
+    ]
+    if facts:
+        execute_query(
+            "INSERT INTO survey_answers VALUES " + ", ".join(["(?, ?, ?, ?, ?, ?, ?)"] * len(facts)),
+            [value for row in facts for value in row],
+        )
     return SurveyResponse(
         id=resp_id,
         survey_id=survey_id,
@@ -57,6 +83,8 @@ def save_response(
         agent_name=agent_name,
         model=model,
         answers=answers,
+        answer_distribution=answer_distribution,
+        served_model=served_model,
     )
 
 
@@ -108,6 +136,17 @@ def save_chat_mode(survey_id: str, chat_mode: str) -> None:
     )
 
 
+def clear_results(survey_id: str) -> None:
+    """Delete what earlier runs saved for the survey, so a run started over saves afresh."""
+    execute_query("DELETE FROM survey_answers WHERE survey_id = ?", [survey_id])
+    execute_query("DELETE FROM survey_responses WHERE survey_id = ?", [survey_id])
+    execute_query(
+        """UPDATE surveys SET debate_messages = NULL, round_summaries = NULL, debate_analysis = NULL
+           WHERE id = ?""",
+        [survey_id],
+    )
+
+
 def get_respondent_history(respondent_id: int, exclude_survey_id: str | None = None) -> list[dict]:
     """Retrieve a respondent's past survey answers for persona memory.
 
@@ -149,17 +188,110 @@ def get_respondent_history(respondent_id: int, exclude_survey_id: str | None = N
     return history
 
 
-def list_surveys() -> list[SurveySummary]:
+def list_history_responses(respondent_ids: list[int], exclude_survey_id: str | None = None) -> list[tuple[int, str]]:
+    """(respondent_id, response_id) of the respondents' past answers, oldest first, as memory would list them."""
+    if not respondent_ids:
+        return []
+    # Ids go in as one string: binding a Python list converts it element by element, far slower
+    return execute_query(
+        """SELECT respondent_id, id FROM survey_responses
+           WHERE respondent_id IN (SELECT CAST(unnest(string_split(?, ',')) AS INTEGER))
+             AND survey_id IS DISTINCT FROM ?
+           ORDER BY created_at ASC""",
+        [",".join(map(str, respondent_ids)), exclude_survey_id],
+    ).fetchall()
+
+
+def get_history_entries(response_ids: list[str]) -> dict[str, dict]:
+    """Responses in the shape `get_respondent_history` returns, keyed by response id."""
+    if not response_ids:
+        return {}
+    rows = execute_query(
+        """SELECT sr.id, s.question, s.breakdown, sr.answers
+           FROM survey_responses sr JOIN surveys s ON sr.survey_id = s.id
+           WHERE sr.id IN (SELECT unnest(string_split(?, ',')))""",
+        [",".join(response_ids)],
+    ).fetchall()
+    entries = {}
+    for response_id, question, breakdown_raw, answers_raw in rows:
+        answers = json.loads(answers_raw) if isinstance(answers_raw, str) else (answers_raw or {})
+        breakdown = json.loads(breakdown_raw) if isinstance(breakdown_raw, str) else breakdown_raw
+        entries[response_id] = {
+            "question": question,
+            "answers": answers,
+            "sub_questions": breakdown["sub_questions"] if breakdown and "sub_questions" in breakdown else [],
+        }
+    return entries
+
+
+def save_prompt_sections(survey_id: str, totals: dict[tuple[str, str], list[int]]) -> None:
+    """Add a run's per-section input token totals, (model, section) -> [calls, tokens], to the survey's."""
+    for (model, section), (calls, tokens) in totals.items():
+        execute_query(
+            """INSERT INTO prompt_token_sections (survey_id, model, section, calls, tokens)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (survey_id, model, section)
+               DO UPDATE SET calls = calls + excluded.calls, tokens = tokens + excluded.tokens""",
+            [survey_id, model, section, calls, tokens],
+        )
+
+
+def get_prompt_sections(survey_id: str) -> list[PromptSectionRow]:
     rows = execute_query(
-        "SELECT id, question, panel_size, created_at FROM surveys ORDER BY created_at DESC"
+        """SELECT model, section, calls, tokens,
+                  tokens / sum(tokens) OVER (PARTITION BY model) AS share
+           FROM prompt_token_sections WHERE survey_id = ?
+           ORDER BY model, tokens DESC""",
+        [survey_id],
     ).fetchall()
+    return [
+        PromptSectionRow(
+            model=r[0], section=r[1], calls=r[2], tokens=r[3],
+            avg_tokens=round(r[3] / r[2], 1) if r[2] else 0.0,
+            share=round(r[4] or 0.0, 4),
+        )
+        for r in rows
+    ]
+
+
+def encode_cursor(created_at, row_id: str) -> str:
+    """Opaque keyset cursor for the row after which the next page starts."""
+    return base64.urlsafe_b64encode(json.dumps([str(created_at), row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+    return created_at, row_id
+
+
+def list_surveys(limit: int | None = None, cursor: str | None = None) -> tuple[list[SurveySummary], str | None]:
+    """Surveys newest first, a page at a time; returns the page and the next page's cursor."""
+    query = "SELECT id, question, panel_size, created_at FROM surveys"
+    params: list = []
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query += " WHERE (created_at, id) < (CAST(? AS TIMESTAMP), ?)"
+        params += [created_at, row_id]
+    query += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    rows = execute_query(query, params).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
     return [
         SurveySummary(
             id=r[0], question=r[1], panel_size=r[2],
             created_at=str(r[3]) if r[3] else None,
         )
         for r in rows
-    ]
+    ], next_cursor
 
 
 def _parse_json_field(raw) -> object:
@@ -182,7 +314,8 @@ def get_survey(survey_id: str) -> SurveySession | None:
         return None
 
     response_rows = execute_query(
-        "SELECT id, survey_id, respondent_id, agent_name, model, answers FROM survey_responses WHERE survey_id = ? ORDER BY created_at",
+        """SELECT id, survey_id, respondent_id, agent_name, model, answers, answer_distribution, served_model
+           FROM survey_responses WHERE survey_id = ? ORDER BY created_at""",
         [survey_id],
     ).fetchall()
 
@@ -191,6 +324,8 @@ def get_survey(survey_id: str) -> SurveySession | None:
             id=r[0], survey_id=r[1], respondent_id=r[2],
             agent_name=r[3], model=r[4],
             answers=json.loads(r[5]) if isinstance(r[5], str) else r[5],
+            answer_distribution=_parse_json_field(r[6]),
+            served_model=r[7],
         )
         for r in response_rows
     ]
@@ -224,3 +359,142 @@ def get_survey(survey_id: str) -> SurveySession | None:
         debate_analysis=debate_analysis,
         created_at=str(row[7]) if row[7] else None,
     )
+
+
+def survey_exists(survey_id: str) -> bool:
+    return execute_query("SELECT 1 FROM surveys WHERE id = ?", [survey_id]).fetchone() is not None
+
+
+def get_survey_overview(survey_id: str) -> SurveyOverview | None:
+    """The survey without its responses, panel or debate transcript — only their counts."""
+    row = execute_query(
+        """SELECT id, question, breakdown, panel_size, filters, models, created_at, chat_mode,
+                  debate_analysis, coalesce(json_array_length(panel), 0),
+                  coalesce(json_array_length(debate_messages), 0),
+                  (SELECT count(*) FROM survey_responses WHERE survey_id = surveys.id)
+           FROM surveys WHERE id = ?""",
+        [survey_id],
+    ).fetchone()
+    if not row:
+        return None
+    breakdown_data = _parse_json_field(row[2])
+    return SurveyOverview(
+        id=row[0],
+        question=row[1],
+        breakdown=QuestionBreakdown(**breakdown_data) if breakdown_data else None,
+        panel_size=row[3],
+        filters=_parse_json_field(row[4]),
+        models=_parse_json_field(row[5]) or [],
+        created_at=str(row[6]) if row[6] else None,
+        chat_mode=_parse_json_field(row[7]),
+        debate_analysis=_parse_json_field(row[8]),
+        panel_count=row[9],
+        debate_message_count=row[10],
+        response_count=row[11],
+    )
+
+
+def list_responses(
+    survey_id: str,
+    limit: int,
+    cursor: str | None = None,
+    model: str | None = None,
+) -> ResponsePage:
+    """A survey's responses in save order, one keyset page at a time."""
+    query = """SELECT id, survey_id, respondent_id, agent_name, model, answers, answer_distribution, created_at,
+                      served_model
+               FROM survey_responses WHERE survey_id = ?"""
+    params: list = [survey_id]
+    if model:
+        query += " AND model = ?"
+        params.append(model)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query += " AND (created_at, id) > (CAST(? AS TIMESTAMP), ?)"
+        params += [created_at, row_id]
+    query += " ORDER BY created_at, id LIMIT ?"
+    params.append(limit + 1)
+    rows = execute_query(query, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][7], rows[-1][0])
+    return ResponsePage(
+        responses=[
+            SurveyResponse(
+                id=r[0], survey_id=r[1], respondent_id=r[2],
+                agent_name=r[3], model=r[4],
+                answers=_parse_json_field(r[5]),
+                answer_distribution=_parse_json_field(r[6]),
+                served_model=r[8],
+            )
+            for r in rows
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+EXPORT_BATCH_ROWS = 1000
+
+
+def export_responses_ndjson(survey_id: str) -> Iterator[bytes]:
+    """Responses as NDJSON, serialized by DuckDB and streamed in batches."""
+    cursor = execute_query(
+        """SELECT to_json({
+               id: id, survey_id: survey_id, respondent_id: respondent_id, agent_name: agent_name,
+               model: model, answers: answers, answer_distribution: answer_distribution,
+               served_model: served_model, created_at: created_at
+           })
+           FROM survey_responses WHERE survey_id = ? ORDER BY created_at, id""",
+        [survey_id],
+    )
+    while rows := cursor.fetchmany(EXPORT_BATCH_ROWS):
+        yield "".join(f"{r[0]}\n" for r in rows).encode()
+
+
+def export_responses_arrow(survey_id: str) -> Iterator[bytes]:
+    """Responses as an Arrow IPC stream (JSON columns stay JSON text). Requires pyarrow.
+
+    The stream always starts with the schema, so a survey without responses
+    is still a valid, empty stream.
+    """
+    import pyarrow as pa
+
+    cursor = execute_query(
+        """SELECT id, survey_id, respondent_id, agent_name, model,
+                  CAST(answers AS VARCHAR) AS answers,
+                  CAST(answer_distribution AS VARCHAR) AS answer_distribution, served_model, created_at
+           FROM survey_responses WHERE survey_id = ? ORDER BY created_at, id""",
+        [survey_id],
+    )
+    if isinstance(cursor, RemoteResult):
+        schema = pa.schema([
+            ("id", pa.string()), ("survey_id", pa.string()), ("respondent_id", pa.int32()),
+            ("agent_name", pa.string()), ("model", pa.string()), ("answers", pa.string()),
+            ("answer_distribution", pa.string()), ("served_model", pa.string()),
+            ("created_at", pa.timestamp("us")),
+        ])
+        batches = (
+            pa.RecordBatch.from_pylist([dict(zip(schema.names, r)) for r in rows], schema=schema)
+            for rows in iter(lambda: cursor.fetchmany(EXPORT_BATCH_ROWS), [])
+        )
+    else:
+        # to_arrow_reader supersedes the deprecated fetch_record_batch; older DuckDB only has the latter
+        to_reader = getattr(cursor, "to_arrow_reader", None) or cursor.fetch_record_batch
+        batches = to_reader(EXPORT_BATCH_ROWS)
+        schema = batches.schema
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield _drain(sink)
+        for batch in batches:
+            writer.write_batch(batch)
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -0,0 +1,812 @@
+"""In-process job manager that owns survey and debate graph execution.
+
+A job runs one survey's graph on a worker thread, independent of any
+WebSocket: it saves results to DuckDB and publishes each event to a replay
+buffer and to every attached subscriber. Jobs are started through REST or
+the WebSocket, wait in a bounded queue for one of `settings.job_workers`
+workers, and can be cancelled at any time — cancellation aborts the run's
+outstanding LLM calls through `services.llm.call_llm`.
+
+With `settings.job_processes` > 0 each worker drives a child process
+instead, so graph execution, prompt building and response parsing run
+outside the API process's GIL. Children reach DuckDB through the writer
+(see backend/dbserver.py) and send their events back over a queue.
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+from backend.config import settings
+from backend.dbserver import serve_in_background
+from backend.graph import partials, stragglers
+from backend.graph.builder import (
+    build_survey_graph,
+    build_cascade_graph,
+    build_debate_graph,
+    resolve_cascade_models,
+)
+from backend.graph.checkpoint import checkpointer, register_keys, release_keys
+from backend.graph.context import publish_context, release_contexts
+from backend.graph.nodes import release_round_timings, render_persona_prompts
+from backend.graph.prefetch import ensure_prompts, release_prompts
+from backend.models.job import JobStatus, QueueStats, RunOptions
+from backend.models.survey import SurveySession
+from backend.services.aggregates import merge_deltas, response_delta
+from backend.services.history import (
+    clear_results,
+    get_survey,
+    save_response,
+    save_debate_message,
+    save_debate_analysis,
+    save_chat_mode,
+    save_prompt_sections,
+)
+from backend.services import cassettes, ledger, metrics, profiling
+from backend.services.llm import RunCancelled, cancel_run, register_run, release_run, run_budget
+from backend.services.scheduler import scheduler, tenant_for
+from backend.services.tokens import estimate_tokens, take_sections
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+LAGGED = {"type": "lagged", "data": None}  # ends a subscriber queue that overflowed
+
+METRICS_FLUSH_S = 1.0  # how often a worker process reports its metrics, at most
+
+
+class JobConflict(Exception):
+    """The survey already has a queued or running job."""
+
+
+class JobQueueFull(Exception):
+    """The job queue is at `settings.job_queue_size`."""
+
+
+class Job:
+    """One run of a survey's graph plus the events it has published so far."""
+
+    def __init__(self, session: SurveySession, options: RunOptions, graph, initial_state: dict):
+        self.survey_id = session.id
+        self.session = session
+        self.options = options
+        self.graph = graph
+        self.initial_state = initial_state
+        self.priority = _priority(session, options)
+        self.tenant = tenant_for(options.api_keys)
+        self.status = "queued"
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.queue_stats: dict | None = None  # scheduler counters, frozen when the job finishes
+        self.final_event: dict | None = None  # `survey_done` or `cancelled`, published by `finish`
+        self.process: "_WorkerProcess | None" = None  # set while a worker process runs the job
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self._events: list[dict] = []
+        self._subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: dict | None) -> None:
+        event = {"type": event_type, "data": data}
+        with self._lock:
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+        for loop, q in subscribers:
+            self._deliver(loop, q, event)
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, maxsize: int = 0) -> tuple[list[dict], asyncio.Queue]:
+        """Attach a subscriber: the events so far, plus a queue for the live ones.
+
+        The queue receives None once the job has finished. A subscriber that
+        lets `maxsize` events pile up is dropped: its queue is emptied and
+        receives LAGGED, and it can attach again to replay what it missed.
+        """
+        q: asyncio.Queue = asyncio.Queue(maxsize)
+        with self._lock:
+            replay = list(self._events)
+            if self.status in ACTIVE_STATUSES:
+                self._subscribers.append((loop, q))
+            else:
+                q.put_nowait(None)
+        return replay, q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers = [(loop, sq) for loop, sq in self._subscribers if sq is not q]
+
+    def finish(
+        self,
+        status: str,
+        error: str | None = None,
+        queue_stats: dict | None = None,
+        final_event: dict | None = None,
+    ) -> None:
+        """Mark the job finished, publishing `final_event` in the same step.
+
+        A client that has seen the final event then never finds the job still
+        active, so reconnecting right away starts a new run instead of
+        replaying this one.
+        """
+        with self._lock:
+            if final_event is not None:
+                self._events.append(final_event)
+            self.final_event = final_event
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.queue_stats = queue_stats or scheduler.stats(self.survey_id)
+            subscribers, self._subscribers = self._subscribers, []
+        self.done.set()
+        for loop, q in subscribers:
+            if final_event is not None:
+                self._deliver(loop, q, final_event)
+            self._deliver(loop, q, None)
+
+    def _deliver(self, loop: asyncio.AbstractEventLoop, q: asyncio.Queue, event: dict | None) -> None:
+        try:
+            loop.call_soon_threadsafe(self._offer, q, event)
+        except RuntimeError:
+            # Subscriber's event loop is gone
+            self.unsubscribe(q)
+
+    def _offer(self, q: asyncio.Queue, event: dict | None) -> None:
+        """Queue an event on the subscriber's own loop."""
+        try:
+            q.put_nowait(event)
+        except asyncio.QueueFull:
+            self.unsubscribe(q)
+            while not q.empty():
+                q.get_nowait()
+            q.put_nowait(LAGGED)
+
+    def to_status(self) -> JobStatus:
+        with self._lock:
+            stats = self.queue_stats or scheduler.stats(self.survey_id)
+            return JobStatus(
+                survey_id=self.survey_id,
+                status=self.status,
+                chat_mode=self.options.chat_mode,
+                priority=self.priority,
+                events=len(self._events),
+                subscribers=len(self._subscribers),
+                error=self.error,
+                created_at=self.created_at,
+                started_at=self.started_at,
+                finished_at=self.finished_at,
+                queue=QueueStats(
+                    calls=stats["calls"],
+                    queued=stats["queued"],
+                    wait_avg_s=round(stats["wait_total_s"] / stats["calls"], 4) if stats["calls"] else 0.0,
+                    wait_max_s=round(stats["wait_max_s"], 4),
+                ),
+            )
+
+
+_jobs: dict[str, Job] = {}  # survey_id -> latest job
+_queue: queue.Queue[Job] = queue.Queue(maxsize=settings.job_queue_size)
+_workers: list[threading.Thread] = []
+_lock = threading.Lock()
+
+
+def _priority(session: SurveySession, options: RunOptions) -> str:
+    """Scheduler class for a run: small runs are interactive unless the client says otherwise."""
+    if options.priority in ("interactive", "batch"):
+        return options.priority
+    calls = len(session.panel) * len(session.models)
+    calls *= options.num_rounds if options.chat_mode == "debate" else options.samples_per_persona
+    return "interactive" if calls <= settings.interactive_max_calls else "batch"
+
+
+_graphs: dict[tuple[str, str], object] = {}  # (run kind, round policy) -> compiled graph
+_graphs_lock = threading.Lock()
+
+
+def _graph(kind: str, round_policy: str = "barrier"):
+    """The compiled graph for a kind of run. Compiled graphs hold no run state, so runs share one."""
+    key = (kind, round_policy if kind == "debate" else "barrier")
+    with _graphs_lock:
+        graph = _graphs.get(key)
+        if graph is None:
+            if kind == "debate":
+                graph = build_debate_graph(round_policy, checkpointer=checkpointer)
+            elif kind == "cascade":
+                graph = build_cascade_graph(checkpointer=checkpointer)
+            else:
+                graph = build_survey_graph(checkpointer=checkpointer)
+            _graphs[key] = graph
+    return graph
+
+
+def warm_graphs() -> None:
+    """Compile every graph a run can use, ahead of the first run."""
+    for kind, round_policy in (("survey", "barrier"), ("cascade", "barrier"), ("debate", "barrier"), ("debate", "quorum")):
+        _graph(kind, round_policy)
+
+
+def prefetch_prompts(session: SurveySession, hold: bool = False) -> None:
+    """Render the panel's persona prompts, unless fresh ones already are (see `graph.prefetch`)."""
+    if ensure_prompts(session.id, lambda: render_persona_prompts(session.id, session.panel), hold=hold):
+        logger.info("Survey %s: rendered %d persona prompts", session.id, len(session.panel))
+
+
+def _build_run(session: SurveySession, options: RunOptions) -> tuple:
+    """Pick the graph and initial state for a run; raises ValueError if it cannot run."""
+    if not options.api_keys or not any(options.api_keys.values()):
+        raise ValueError("At least one API key required")
+    if not session.panel:
+        raise ValueError("No panel selected")
+
+    base = {
+        "question": session.question,
+        "panel": session.panel,
+        "models": session.models,
+        "api_keys": options.api_keys,
+        "temperatures": options.temperatures,
+        "survey_id": session.id,
+        "persona_memory": options.persona_memory,
+        "routing": options.routing,
+    }
+    if options.chat_mode == "debate":
+        return _graph("debate", options.round_policy), {
+            **base,
+            "num_rounds": options.num_rounds,
+            "current_round": 1,
+            "debate_messages": [],
+            "context_strategy": options.debate_context,
+            "context_token_budget": options.context_token_budget,
+            "transcript_digest": "",
+            "round_context": "",
+            "topology": options.debate_topology,
+            "peer_k": options.peer_k,
+            "peer_assignments": {},
+            "round_policy": options.round_policy,
+            "quorum_fraction": options.quorum_fraction,
+            "round_deadline_s": options.round_deadline_s,
+            "late_agents": [],
+            "analysis": None,
+        }
+
+    if not session.breakdown:
+        raise ValueError("No breakdown configured")
+    initial_state = {
+        **base,
+        "sub_questions": [sq.model_dump() for sq in session.breakdown.sub_questions],
+        "samples_per_persona": options.samples_per_persona,
+        "responses": [],
+    }
+    if options.run_mode != "cascade":
+        return _graph("survey"), initial_state
+
+    cascade_cfg = options.cascade or {}
+    cheap_model, expensive_model = resolve_cascade_models(
+        session.models, options.api_keys,
+        cheap_model=cascade_cfg.get("cheap_model"),
+        expensive_model=cascade_cfg.get("expensive_model"),
+    )
+    logger.info("Survey %s: cascade %s -> %s", session.id, cheap_model, expensive_model)
+    initial_state.update({
+        "cheap_model": cheap_model,
+        "expensive_model": expensive_model,
+        "confidence_threshold": cascade_cfg.get(
+            "confidence_threshold", settings.cascade_confidence_threshold,
+        ),
+        "escalations": [],
+        "cascade_calls": [],
+        "cascade_summary": None,
+    })
+    return _graph("cascade"), initial_state
+
+
+def start(survey_id: str, options: RunOptions) -> Job:
+    """Queue a run of the survey.
+
+    Raises LookupError if the survey does not exist, ValueError if it cannot
+    run with these options, JobConflict if it already has an active job and
+    JobQueueFull if the queue is at capacity.
+    """
+    job = _new_job(survey_id, options, Job)
+
+    with _lock:
+        current = _jobs.get(survey_id)
+        if current and current.status in ACTIVE_STATUSES:
+            raise JobConflict("Survey is already running")
+        try:
+            _queue.put_nowait(job)
+        except queue.Full:
+            raise JobQueueFull("Too many queued runs, try again shortly") from None
+        _jobs[survey_id] = job
+        _evict_finished()
+        while len(_workers) < (settings.job_processes or settings.job_workers):
+            worker = threading.Thread(target=_worker, name=f"job-worker-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+    logger.info("Survey %s: queued %s job (%d queued)", survey_id, options.chat_mode, _queue.qsize())
+    return job
+
+
+def _new_job(survey_id: str, options: RunOptions, job_class: type[Job]) -> Job:
+    session = get_survey(survey_id)
+    if not session:
+        raise LookupError("Survey not found")
+    graph, initial_state = _build_run(session, options)
+    return job_class(session, options, graph, initial_state)
+
+
+def get(survey_id: str) -> Job | None:
+    with _lock:
+        return _jobs.get(survey_id)
+
+
+def get_active(survey_id: str) -> Job | None:
+    job = get(survey_id)
+    return job if job and job.status in ACTIVE_STATUSES else None
+
+
+def list_jobs() -> list[Job]:
+    with _lock:
+        return list(_jobs.values())
+
+
+def cancel(survey_id: str) -> Job | None:
+    """Cancel the survey's active job; its finished work stays checkpointed."""
+    job = get_active(survey_id)
+    if job is None:
+        return get(survey_id)
+    job.cancelled.set()
+    cancel_run(survey_id)
+    if job.process:
+        job.process.cancel(survey_id)
+    logger.info("Survey %s: cancel requested", survey_id)
+    return job
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """Cancel every active job and give running ones a moment to stop before the DB closes."""
+    active = [job for job in list_jobs() if job.status in ACTIVE_STATUSES]
+    for job in active:
+        cancel(job.survey_id)
+    deadline = time.monotonic() + timeout
+    for job in active:
+        if job.status == "running":
+            job.done.wait(max(0.0, deadline - time.monotonic()))
+
+
+def _evict_finished() -> None:
+    finished = sorted(
+        (j for j in _jobs.values() if j.status not in ACTIVE_STATUSES),
+        key=lambda j: j.finished_at or 0,
+    )
+    for job in finished[:max(0, len(finished) - settings.job_history)]:
+        del _jobs[job.survey_id]
+
+
+def _worker() -> None:
+    process = _WorkerProcess() if settings.job_processes else None
+    while True:
+        job = _queue.get()
+        try:
+            if job.cancelled.is_set():
+                job.finish("cancelled", final_event={"type": "cancelled", "data": {"survey_id": job.survey_id}})
+                continue
+            if process:
+                process.run(job)
+            else:
+                _run(job)
+        except Exception as exc:
+            logger.exception("Job for survey %s crashed", job.survey_id)
+            if job.status in ACTIVE_STATUSES:
+                job.publish("error", {"message": str(exc)})
+                job.finish(
+                    "failed", str(exc),
+                    final_event={"type": "survey_done", "data": {"survey_id": job.survey_id}},
+                )
+        finally:
+            _queue.task_done()
+
+
+def _run(job: Job) -> None:
+    survey_id = job.survey_id
+    session = job.session
+    options = job.options
+    graph = job.graph
+    job.status = "running"
+    job.started_at = time.time()
+    timeline = profiling.start_run(survey_id, since=job.created_at)
+    run_start = time.perf_counter()
+    profiling.record(survey_id, "queued", "queue", timeline.origin, run_start)
+    sampler = profiling.Sampler(settings.profile_sample_interval_ms / 1000).start() if options.profile else None
+    register_run(survey_id, job.tenant, job.priority, options.budget_usd)
+    budget = run_budget(survey_id)
+    register_keys(survey_id, options.api_keys)
+    if options.persona_memory:
+        try:
+            with profiling.span(survey_id, "persona_prompts", "db"):
+                prefetch_prompts(session, hold=True)
+        except Exception:
+            # Persona nodes fall back to loading their own history
+            logger.exception("Could not render persona prompts for survey %s", survey_id)
+
+    # Persist chat mode so historical loads know whether this is a survey or debate
+    save_chat_mode(survey_id, options.chat_mode)
+    logger.info("Survey %s: chat_mode=%s, persisted to DB", survey_id, options.chat_mode)
+
+    # One checkpoint thread per survey: a new job resumes where the last run stopped
+    config = {"configurable": {"thread_id": survey_id}}
+    saved_responses = {(r.respondent_id, r.model) for r in session.responses}
+    saved_messages = {(m["respondent_id"], m["model"], m["round"]) for m in session.debate_messages}
+    # Surveys also stream option counts, so charts need not recount every response
+    sub_question_ids = (
+        [sq.id for sq in session.breakdown.sub_questions]
+        if options.chat_mode != "debate" and session.breakdown else []
+    )
+
+    def emit_response(resp: dict) -> None:
+        key = (resp["respondent_id"], resp["model"])
+        if key in saved_responses:
+            return
+        saved_responses.add(key)
+        with profiling.span(survey_id, "save_response", "db"):
+            saved = save_response(
+                survey_id=survey_id,
+                respondent_id=resp["respondent_id"],
+                agent_name=resp["agent_name"],
+                model=resp["model"],
+                answers=resp["answers"],
+                answer_distribution=resp.get("answer_distribution"),
+                served_model=resp.get("served_model"),
+            )
+        resp_data = {
+            "id": saved.id,
+            "survey_id": survey_id,
+            "respondent_id": resp["respondent_id"],
+            "agent_name": resp["agent_name"],
+            "model": resp["model"],
+            "answers": resp["answers"],
+            "token_usage": resp.get("token_usage"),
+        }
+        if resp.get("answer_distribution") is not None:
+            resp_data["answer_distribution"] = resp["answer_distribution"]
+        if resp.get("served_model"):
+            resp_data["served_model"] = resp["served_model"]
+        if "stage" in resp:
+            resp_data["stage"] = resp["stage"]
+            resp_data["confidence"] = resp.get("confidence")
+        job.publish("survey_response", resp_data)
+        if sub_question_ids:
+            job.publish("aggregate_update", response_delta(resp, sub_question_ids))
+
+    def emit_debate_message(msg: dict) -> None:
+        msg_data = {
+            "respondent_id": msg["respondent_id"],
+            "agent_name": msg["agent_name"],
+            "model": msg["model"],
+            "round": msg["round"],
+            "text": msg["text"],
+            "token_usage": msg.get("token_usage"),
+        }
+        if msg.get("late"):
+            msg_data["late"] = True
+        if msg.get("served_model"):
+            msg_data["served_model"] = msg["served_model"]
+        key = (msg["respondent_id"], msg["model"], msg["round"])
+        if key in saved_messages:
+            return
+        saved_messages.add(key)
+        with profiling.span(survey_id, "save_debate_message", "db"):
+            save_debate_message(survey_id, msg_data)
+        logger.info("Survey %s: saved debate message from respondent %s round %s", survey_id, msg["respondent_id"], msg["round"])
+        job.publish("debate_message", msg_data)
+
+    def save_missing(values: dict) -> None:
+        """Save output of tasks that finished (and were checkpointed) but were never streamed."""
+        for resp in values.get("responses", []):
+            emit_response(resp)
+        for msg in values.get("debate_messages", []):
+            emit_debate_message(msg)
+        if values.get("analysis") and not session.debate_analysis:
+            save_debate_analysis(survey_id, values["analysis"])
+            session.debate_analysis = values["analysis"]
+
+    # The run's outcome is published last, once everything it produced is saved,
+    # so clients reacting to `survey_done` find the profile, ledger and token sections
+    status, error = "failed", None
+    done_data: dict = {"survey_id": survey_id}
+    try:
+        snapshot = graph.get_state(config)
+        graph_input: dict | None = job.initial_state
+        if not options.resume:
+            # Start over: earlier output would otherwise mask the new run's answers
+            if snapshot.values:
+                checkpointer.delete_thread(survey_id)
+            if saved_responses or saved_messages or session.debate_analysis:
+                clear_results(survey_id)
+                saved_responses.clear()
+                saved_messages.clear()
+                session.responses = []
+                session.debate_messages = []
+                session.round_summaries = []
+                session.debate_analysis = None
+        elif snapshot.values:
+            # Replay what earlier runs saved, then run only what is left
+            for resp in session.responses:
+                job.publish("survey_response", {**resp.model_dump(), "replayed": True})
+            if sub_question_ids:
+                saved = [response_delta(resp.model_dump(), sub_question_ids) for resp in session.responses]
+                for delta in merge_deltas(saved):
+                    job.publish("aggregate_update", {**delta, "replayed": True})
+            for msg in session.debate_messages:
+                job.publish("debate_message", {**msg, "replayed": True})
+            job.publish("run_resumed", {
+                "replayed_responses": len(session.responses),
+                "replayed_messages": len(session.debate_messages),
+                "pending": list(snapshot.next),
+            })
+            logger.info(
+                "Survey %s: resuming at %s (%d responses, %d debate messages already saved)",
+                survey_id, list(snapshot.next) or "end", len(saved_responses), len(saved_messages),
+            )
+            # Tasks that finished after the last run stopped are pending writes, not yet a new step
+            if not snapshot.next and not checkpointer.get_tuple(config).pending_writes:
+                # The last run finished; nothing to execute
+                save_missing(snapshot.values)
+                checkpointer.compact_thread(survey_id)
+                if session.debate_analysis:
+                    job.publish("debate_analysis", session.debate_analysis)
+                status = "completed"
+                return
+            graph_input = None
+            if options.chat_mode == "debate":
+                # Pending debate_respond tasks read the round context from the process-local store
+                values = snapshot.values
+                publish_context(survey_id, values.get("current_round", 1), values.get("round_context", ""))
+
+        run_summary = None
+        late_agents: list[dict] = []
+        budget_reported = False
+        round_start = time.perf_counter()
+        # "custom" carries debate messages streamed from inside quorum rounds
+        # and the local analysis preview
+        for mode, chunk in graph.stream(graph_input, config, stream_mode=["updates", "custom"]):
+            if job.cancelled.is_set():
+                raise RunCancelled(survey_id)
+            if budget and budget.skipped and not budget_reported:
+                # The run goes on, but its remaining calls are skipped
+                budget_reported = True
+                logger.info("Survey %s: budget of $%.4f reached", survey_id, budget.limit_usd)
+                job.publish("budget_exceeded", budget.to_dict())
+
+            if mode == "custom":
+                if "debate_message" in chunk:
+                    emit_debate_message(chunk["debate_message"])
+                elif "debate_preview" in chunk:
+                    job.publish("debate_preview", chunk["debate_preview"])
+                continue
+
+            for node_name, node_output in chunk.items():
+                if node_name in ("survey_respond", "cascade_screen", "cascade_escalate"):
+                    for resp in node_output.get("responses", []):
+                        emit_response(resp)
+
+                elif node_name == "cascade_report":
+                    run_summary = node_output.get("cascade_summary")
+                    job.publish("cascade_summary", run_summary)
+
+                elif node_name == "debate_respond":
+                    for msg in node_output.get("debate_messages", []):
+                        emit_debate_message(msg)
+
+                elif node_name == "debate_round":
+                    # Messages were already streamed through the custom channel
+                    late_agents = node_output.get("late_agents", [])
+
+                elif node_name == "collect_round":
+                    current_round = node_output.get("current_round", 1)
+                    round_data = {
+                        "round": current_round - 1,
+                        "total_rounds": options.num_rounds,
+                    }
+                    if "round_context" in node_output:
+                        round_data["context_tokens"] = estimate_tokens(node_output["round_context"])
+                    if options.round_policy == "quorum":
+                        round_data["late"] = late_agents
+                    logger.info("Survey %s: completed round %s", survey_id, current_round - 1)
+                    round_end = time.perf_counter()
+                    profiling.record(survey_id, f"round {current_round - 1}", "round", round_start, round_end)
+                    round_start = round_end
+                    job.publish("round_complete", round_data)
+
+                elif node_name == "analyze_debate":
+                    analysis = node_output.get("analysis")
+                    if analysis:
+                        save_debate_analysis(survey_id, analysis)
+                        logger.info("Survey %s: saved debate analysis with %d themes", survey_id, len(analysis.get("themes", [])))
+                        job.publish("debate_analysis", analysis)
+
+        save_missing(graph.get_state(config).values)
+        checkpointer.compact_thread(survey_id)
+
+        if run_summary:
+            done_data["summary"] = run_summary
+        if budget:
+            done_data["budget"] = budget.to_dict()
+        status = "completed"
+
+    except RunCancelled:
+        logger.info("Survey %s: run cancelled", survey_id)
+        status = "cancelled"
+    except Exception as exc:
+        logger.exception("Graph execution failed")
+        job.publish("error", {"message": str(exc)})
+        error = str(exc)
+    finally:
+        release_contexts(survey_id)
+        release_prompts(survey_id)
+        stragglers.release(survey_id)
+        partials.release(survey_id)
+        release_round_timings(survey_id)
+        release_keys(survey_id)
+        release_run(survey_id)
+        stats = scheduler.release(survey_id)
+        if stats["calls"]:
+            logger.info(
+                "Survey %s: %d LLM calls (%s), queue wait avg %.3fs max %.3fs",
+                survey_id, stats["calls"], job.priority,
+                stats["wait_total_s"] / stats["calls"], stats["wait_max_s"],
+            )
+        ledger.flush()
+        cassettes.close(survey_id)
+        try:
+            save_prompt_sections(survey_id, take_sections(survey_id))
+        except Exception:
+            logger.exception("Could not save prompt token sections for survey %s", survey_id)
+        run_end = time.perf_counter()
+        profiling.record(survey_id, "run", "run", run_start, run_end, status=status, chat_mode=options.chat_mode)
+        profiling.finish_run(survey_id)
+        cpu_profile = sampler.stop() if sampler else None
+        try:
+            profiling.save_profile(timeline, status, run_end - timeline.origin, cpu_profile)
+        except Exception:
+            logger.exception("Could not save run profile for survey %s", survey_id)
+        if status == "cancelled":
+            final_event = {"type": "cancelled", "data": {"survey_id": survey_id}}
+        else:
+            final_event = {"type": "survey_done", "data": done_data}
+        job.finish(status, error, stats, final_event)
+
+
+class _WorkerProcess:
+    """Child process that runs the jobs of one worker thread, one at a time."""
+
+    def __init__(self):
+        self._process: multiprocessing.Process | None = None
+        self._commands: multiprocessing.Queue | None = None
+        self._events: multiprocessing.Queue | None = None
+
+    def _ensure_started(self) -> None:
+        if self._process and self._process.is_alive():
+            return
+        if settings.db_server_address:
+            # This process is itself a client of a standalone writer
+            address, authkey = settings.db_server_address, settings.db_server_authkey
+        else:
+            address, authkey = serve_in_background()
+        ctx = multiprocessing.get_context("spawn")
+        self._commands = ctx.Queue()
+        self._events = ctx.Queue()
+        self._process = ctx.Process(
+            target=_process_main, args=(self._commands, self._events, address, authkey), daemon=True,
+        )
+        self._process.start()
+        logger.info("Started job worker process %d", self._process.pid)
+
+    def run(self, job: Job) -> None:
+        self._ensure_started()
+        job.status = "running"
+        job.started_at = time.time()
+        job.process = self
+        self._commands.put(("run", job.survey_id, job.options.model_dump()))
+        if job.cancelled.is_set():
+            self.cancel(job.survey_id)
+        while True:
+            try:
+                kind, data = self._events.get(timeout=1.0)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                logger.error("Job worker process for survey %s exited", job.survey_id)
+                job.publish("error", {"message": "Worker process exited"})
+                job.finish(
+                    "failed", "Worker process exited",
+                    final_event={"type": "survey_done", "data": {"survey_id": job.survey_id}},
+                )
+                return
+            if kind == "event":
+                job.publish(data["type"], data["data"])
+            elif kind == "metrics":
+                metrics.registry.merge(data)
+            else:
+                job.finish(data["status"], data["error"], data["queue"], data.get("final_event"))
+                return
+
+    def cancel(self, survey_id: str) -> None:
+        self._commands.put(("cancel", survey_id))
+
+
+_early_cancels: set[str] = set()  # worker process: cancels that arrived before their job was ready
+
+
+class _ForwardedJob(Job):
+    """A job inside a worker process: its events go to the parent, which owns the subscribers."""
+
+    events_out: multiprocessing.Queue
+    _metrics_sent_at = 0.0
+
+    def publish(self, event_type: str, data: dict | None) -> None:
+        self.events_out.put(("event", {"type": event_type, "data": data}))
+        if time.monotonic() - self._metrics_sent_at >= METRICS_FLUSH_S:
+            self.send_metrics()
+
+    def send_metrics(self) -> None:
+        """Hand what this process recorded to the parent's `/metrics` registry."""
+        self._metrics_sent_at = time.monotonic()
+        deltas = metrics.registry.take_deltas()
+        if deltas:
+            self.events_out.put(("metrics", deltas))
+
+
+def _run_forwarded(survey_id: str, options: RunOptions, events_out: multiprocessing.Queue) -> None:
+    try:
+        job = _new_job(survey_id, options, _ForwardedJob)
+    except Exception as exc:
+        logger.exception("Could not prepare job for survey %s", survey_id)
+        events_out.put(("event", {"type": "error", "data": {"message": str(exc)}}))
+        events_out.put(("finished", {
+            "status": "failed", "error": str(exc), "queue": None,
+            "final_event": {"type": "survey_done", "data": {"survey_id": survey_id}},
+        }))
+        return
+    job.events_out = events_out
+    with _lock:
+        _jobs[survey_id] = job
+        if survey_id in _early_cancels:
+            _early_cancels.discard(survey_id)
+            job.cancelled.set()
+    try:
+        _run(job)
+    finally:
+        job.send_metrics()
+        # Sent only after _run released the survey's registries, so a restart cannot race them
+        events_out.put(("finished", {
+            "status": job.status, "error": job.error, "queue": job.queue_stats, "final_event": job.final_event,
+        }))
+        with _lock:
+            _jobs.pop(survey_id, None)
+
+
+def _process_main(
+    commands: multiprocessing.Queue,
+    events_out: multiprocessing.Queue,
+    db_address: str,
+    db_authkey: str,
+) -> None:
+    """Entry point of a job worker process."""
+    logging.basicConfig(level=logging.INFO)
+    settings.db_server_address = db_address
+    settings.db_server_authkey = db_authkey
+    while (command := commands.get()) is not None:
+        action, survey_id, *args = command
+        if action == "cancel":
+            with _lock:
+                if survey_id not in _jobs:
+                    # Still preparing: _run_forwarded picks this up
+                    _early_cancels.add(survey_id)
+            cancel(survey_id)
+        elif action == "run":
+            threading.Thread(
+                target=_run_forwarded, args=(survey_id, RunOptions(**args[0]), events_out), daemon=True,
+            ).start()
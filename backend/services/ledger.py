@@ -0,0 +1,99 @@
+"""Per-call token and cost ledger.
+
+Every provider call made through `services.llm.call_llm` adds a row to
+`llm_calls`: its model, when it started, how long the provider took, the
+input, cached input and output tokens it reported and what that cost by the
+price table (`services.pricing`). Failed calls are kept with their error and
+no tokens. Rows are buffered in memory and written in batches — when
+`FLUSH_ROWS` are waiting and when a job finishes.
+"""
+import logging
+import threading
+from datetime import datetime
+
+from backend.db import execute_query
+from backend.models.survey import LedgerRow, SurveyLedger
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ROWS = 200
+
+_COLUMNS = (
+    "survey_id, model, provider, started_at, latency_s, "
+    "input_tokens, cached_input_tokens, output_tokens, cost_usd, error"
+)
+
+_pending: list[tuple] = []
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()  # keeps batches in order
+
+
+def record(
+    survey_id: str,
+    model: str,
+    provider: str,
+    started_at: float,
+    latency_s: float,
+    input_tokens: int = 0,
+    cached_input_tokens: int = 0,
+    output_tokens: int = 0,
+    cost_usd: float = 0.0,
+    error: str | None = None,
+) -> None:
+    row = (
+        survey_id, model, provider, datetime.fromtimestamp(started_at), latency_s,
+        input_tokens, cached_input_tokens, output_tokens, cost_usd, error,
+    )
+    with _pending_lock:
+        _pending.append(row)
+        full = len(_pending) >= FLUSH_ROWS
+    if full:
+        flush()
+
+
+def flush() -> None:
+    """Write every buffered row in one statement."""
+    with _flush_lock:
+        with _pending_lock:
+            rows = _pending[:]
+            _pending.clear()
+        if not rows:
+            return
+        placeholders = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"] * len(rows))
+        try:
+            execute_query(
+                f"INSERT INTO llm_calls ({_COLUMNS}) VALUES {placeholders}",
+                [value for row in rows for value in row],
+            )
+        except Exception:
+            logger.exception("Could not write %d ledger rows", len(rows))
+
+
+def get_ledger(survey_id: str) -> SurveyLedger:
+    """Calls, tokens, latency and cost per model over all of the survey's runs."""
+    rows = execute_query(
+        """SELECT model, any_value(provider), count(*), count(error),
+                  sum(input_tokens), sum(cached_input_tokens), sum(output_tokens), sum(cost_usd),
+                  avg(latency_s), quantile_cont(latency_s, 0.95)
+           FROM llm_calls WHERE survey_id = ?
+           GROUP BY model ORDER BY sum(cost_usd) DESC, model""",
+        [survey_id],
+    ).fetchall()
+    models = [
+        LedgerRow(
+            model=r[0], provider=r[1], calls=r[2], errors=r[3],
+            input_tokens=int(r[4] or 0), cached_input_tokens=int(r[5] or 0), output_tokens=int(r[6] or 0),
+            cost_usd=round(r[7] or 0.0, 6),
+            latency_avg_s=round(r[8] or 0.0, 4), latency_p95_s=round(r[9] or 0.0, 4),
+        )
+        for r in rows
+    ]
+    return SurveyLedger(
+        survey_id=survey_id,
+        calls=sum(m.calls for m in models),
+        input_tokens=sum(m.input_tokens for m in models),
+        cached_input_tokens=sum(m.cached_input_tokens for m in models),
+        output_tokens=sum(m.output_tokens for m in models),
+        cost_usd=round(sum(m.cost_usd for m in models), 6),
+        models=models,
+    )
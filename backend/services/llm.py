@@ -1,5 +1,138 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import TypeVar
+
 from langchain_core.language_models.chat_models import BaseChatModel
 
+from backend.config import settings
+from backend.services import cassettes, ledger, metrics, profiling
+from backend.services.pricing import estimate_cost
+from backend.services.scheduler import scheduler
+from backend.services.stub_llm import StubChatModel
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# What `get_llm` hands out: a provider model, or the stub / cassette stand-ins with the same call surface
+ChatModel = BaseChatModel | StubChatModel | cassettes.CassetteLLM
+
+# How often a waiting call checks whether its run was cancelled
+CANCEL_POLL_S = 0.1
+
+# survey_id -> (cancelled, tenant, priority, budget)
+_runs: dict[str, tuple[threading.Event, str, str, "RunBudget | None"]] = {}
+_runs_lock = threading.Lock()
+
+
+class RunCancelled(Exception):
+    """Raised from a run's LLM calls once the run has been cancelled."""
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of starting an LLM call that would take the run past its budget."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call has not answered within its deadline; the call itself keeps running."""
+
+
+class RunBudget:
+    """A run's spending cap, checked before each of its LLM calls is queued.
+
+    A call is admitted while what the run has spent, plus the projected cost
+    of its admitted but unfinished calls, plus this call's projected cost
+    stays within the limit. A call's projected cost is the average cost of
+    the model's finished calls in this run; until one has finished it is
+    unknown, so further calls of that model wait for the first.
+    """
+
+    def __init__(self, limit_usd: float):
+        self.limit_usd = limit_usd
+        self.spent_usd = 0.0
+        self.reserved_usd = 0.0
+        self.skipped = 0
+        self._costs: dict[str, tuple[float, int]] = {}  # model -> (total, finished calls)
+        self._probing: set[str] = set()
+        self._cond = threading.Condition()
+
+    def admit(self, model: str, cancelled: threading.Event) -> float:
+        """Reserve one call's projected cost; raises BudgetExceeded if it does not fit."""
+        with self._cond:
+            while model not in self._costs and model in self._probing:
+                if cancelled.is_set():
+                    raise RunCancelled()
+                self._cond.wait(CANCEL_POLL_S)
+            total, calls = self._costs.get(model, (0.0, 0))
+            projected = total / calls if calls else 0.0
+            if self.spent_usd + self.reserved_usd + projected > self.limit_usd:
+                self.skipped += 1
+                raise BudgetExceeded(model)
+            if not calls:
+                self._probing.add(model)
+            self.reserved_usd += projected
+            return projected
+
+    def settle(self, model: str, projected: float, cost: float | None) -> None:
+        """Replace a call's reservation with what it cost; None if it never finished."""
+        with self._cond:
+            self.reserved_usd -= projected
+            if cost is not None:
+                self.spent_usd += cost
+                total, calls = self._costs.get(model, (0.0, 0))
+                self._costs[model] = (total + cost, calls + 1)
+            self._probing.discard(model)
+            self._cond.notify_all()
+
+    def to_dict(self) -> dict:
+        with self._cond:
+            return {
+                "budget_usd": self.limit_usd,
+                "spent_usd": round(self.spent_usd, 6),
+                "skipped_calls": self.skipped,
+            }
+
+
+class ModelHealth:
+    """Rolling latency and error rate of each model's recent calls, across runs.
+
+    Keeps each model's last `window` outcomes from the past `window_s`
+    seconds. A model's score is its expected time to a good answer: mean
+    latency of the successful calls over their share of all calls. A model
+    with no recent outcomes scores 0, so it is tried (again, once its
+    failures have aged out) before the measured ones.
+    """
+
+    def __init__(self, window: int = 50, window_s: float = 300.0):
+        self._window = window
+        self._window_s = window_s
+        self._outcomes: dict[str, deque[tuple[float, float | None]]] = {}  # model -> (at, latency or None if failed)
+        self._lock = threading.Lock()
+
+    def record(self, model: str, latency_s: float | None) -> None:
+        """Add a call's outcome: its latency, or None if it failed or missed its deadline."""
+        with self._lock:
+            self._outcomes.setdefault(model, deque(maxlen=self._window)).append((time.monotonic(), latency_s))
+
+    def score(self, model: str) -> float:
+        cutoff = time.monotonic() - self._window_s
+        with self._lock:
+            recent = [latency for at, latency in self._outcomes.get(model, ()) if at >= cutoff]
+        if not recent:
+            return 0.0
+        ok = [latency for latency in recent if latency is not None]
+        if not ok:
+            return math.inf
+        return sum(ok) / len(ok) * len(recent) / len(ok)
+
+
+health = ModelHealth()
+
 
 def _detect_provider(model: str) -> str:
     if model.startswith("claude"):
@@ -11,13 +144,60 @@ def _detect_provider(model: str) -> str:
     raise ValueError(f"Cannot detect provider for model: {model}")
 
 
-def get_llm(model: str, api_key: str, temperature: float | None = None) -> BaseChatModel:
+# OpenAI chat models that return token logprobs; reasoning models (o-series, gpt-5) reject the parameter
+LOGPROB_MODEL_PREFIXES = ("gpt-4.1", "gpt-4o", "gpt-4-turbo", "gpt-3.5-turbo")
+
+
+def supports_logprobs(model: str) -> bool:
+    """Whether the model can return token logprobs (OpenAI chat models, not reasoning models)."""
+    return model.startswith(LOGPROB_MODEL_PREFIXES)
+
+
+def supports_native_samples(model: str) -> bool:
+    """Whether one request can return several completions (`n` on OpenAI, candidate count on Gemini)."""
+    return model.startswith(("gpt", "gemini"))
+
+
+def model_group(model: str) -> list[str]:
+    """The models interchangeable with `model` per MODEL_GROUPS, itself first; just `model` if it is in no group."""
+    for members in settings.model_groups.values():
+        if model in members:
+            return [model] + [m for m in members if m != model]
+    return [model]
+
+
+def _key_for(model: str, api_keys: dict[str, str]) -> str:
+    try:
+        return api_keys.get(_detect_provider(model), "")
+    except ValueError:
+        return ""
+
+
+def get_llm(
+    model: str,
+    api_key: str,
+    temperature: float | None = None,
+    logprobs: bool = False,
+    n: int | None = None,
+) -> ChatModel:
     provider = _detect_provider(model)
 
     kwargs: dict = {}
     if temperature is not None:
         kwargs["temperature"] = temperature
+    if logprobs and supports_logprobs(model):
+        kwargs["logprobs"] = True
+    if n and n > 1 and supports_native_samples(model):
+        kwargs["n"] = n
+
+    if settings.cassette_mode:
+        return cassettes.CassetteLLM(model, lambda: _provider_llm(provider, model, api_key, kwargs), kwargs)
+    return _provider_llm(provider, model, api_key, kwargs)
 
+
+def _provider_llm(provider: str, model: str, api_key: str, kwargs: dict) -> BaseChatModel | StubChatModel:
+    if settings.llm_stub:
+        return StubChatModel(model, n=kwargs.get("n"))
     if provider == "anthropic":
         from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(
@@ -41,3 +221,223 @@ def get_llm(model: str, api_key: str, temperature: float | None = None) -> BaseC
         )
     else:
         raise ValueError(f"Unknown provider: {provider}")
+
+
+def register_run(
+    survey_id: str,
+    tenant: str = "",
+    priority: str = "interactive",
+    budget_usd: float | None = None,
+) -> threading.Event:
+    """Start tracking a run so its LLM calls are fairly scheduled, can be cancelled and stay within
+    `budget_usd`, if given.
+
+    Returns the run's cancelled flag.
+    """
+    budget = RunBudget(budget_usd) if budget_usd is not None else None
+    with _runs_lock:
+        run = _runs.setdefault(survey_id, (threading.Event(), tenant, priority, budget))
+    return run[0]
+
+
+def run_budget(survey_id: str) -> RunBudget | None:
+    with _runs_lock:
+        run = _runs.get(survey_id)
+    return run[3] if run else None
+
+
+def cancel_run(survey_id: str) -> None:
+    with _runs_lock:
+        run = _runs.get(survey_id)
+    if run is not None:
+        run[0].set()
+
+
+def release_run(survey_id: str) -> None:
+    with _runs_lock:
+        _runs.pop(survey_id, None)
+
+
+def model_name(llm: ChatModel) -> str:
+    """The model a chat model was built for (ChatOpenAI calls it `model_name`, the others `model`)."""
+    name = getattr(llm, "model_name", None) or getattr(llm, "model", "") or ""
+    return name.removeprefix("models/")
+
+
+def _token_usage(result) -> tuple[int, int, int]:
+    """(input, output, cached input) tokens of whatever an LLM call returned: a message, a batch,
+    a generate() result or a structured output with its raw message."""
+    if isinstance(result, dict):
+        result = result.get("raw")
+    if isinstance(result, list):
+        usages = [_token_usage(r) for r in result]
+        return sum(u[0] for u in usages), sum(u[1] for u in usages), sum(u[2] for u in usages)
+    generations = getattr(result, "generations", None)
+    if generations:
+        # Usage is reported once per request and repeated on every candidate
+        result = getattr(generations[0][0], "message", None)
+    usage = getattr(result, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read")
+    return usage.get("input_tokens") or 0, usage.get("output_tokens") or 0, cached or 0
+
+
+def _claim_health(timing: dict | None) -> bool:
+    """Whether this report of a call's health outcome is its first: a call that
+    missed its deadline has already been recorded as failed when it returns."""
+    if timing is None:
+        return True
+    token = object()
+    return timing.setdefault("health", token) is token
+
+
+def _instrumented(
+    fn: Callable[[], T],
+    model: str,
+    survey_id: str,
+    charge: Callable[[float | None], None] | None = None,
+    timing: dict | None = None,
+) -> Callable[[], T]:
+    """Wrap a call to record its metrics, span, ledger row and health; `charge` receives its cost.
+
+    `timing["start"]` is set when the call starts running, and `timing` is
+    shared with `call_llm`'s deadline so the call reports one health outcome.
+    """
+    try:
+        provider = _detect_provider(model)
+    except ValueError:
+        provider = "unknown"
+    submitted = time.perf_counter()
+
+    def run() -> T:
+        metrics.LLM_CALLS_IN_FLIGHT.inc(provider)
+        started_at = time.time()
+        start = time.perf_counter()
+        if timing is not None:
+            timing["start"] = start
+        profiling.record(survey_id, "scheduler_wait", "queue", submitted, start)
+        token = cassettes.bind(survey_id)
+        try:
+            result = fn()
+        except Exception as exc:
+            elapsed = time.perf_counter() - start
+            metrics.LLM_CALL_ERRORS.inc(provider, model, type(exc).__name__)
+            if _claim_health(timing):
+                health.record(model, None)
+            profiling.record(survey_id, "llm_call", "llm", start, start + elapsed, model=model, error=type(exc).__name__)
+            ledger.record(survey_id, model, provider, started_at, elapsed, error=type(exc).__name__)
+            if charge:
+                charge(None)
+            raise
+        finally:
+            cassettes.unbind(token)
+            elapsed = time.perf_counter() - start
+            metrics.LLM_CALLS_IN_FLIGHT.dec(provider)
+            metrics.LLM_CALL_SECONDS.observe(elapsed, provider, model)
+        if _claim_health(timing):
+            health.record(model, elapsed)
+        input_tokens, output_tokens, cached_tokens = _token_usage(result)
+        cost = estimate_cost(model, {
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "cached_input_tokens": cached_tokens,
+        })
+        if charge:
+            charge(cost)
+        ledger.record(survey_id, model, provider, started_at, elapsed, input_tokens, cached_tokens, output_tokens, cost)
+        profiling.record(
+            survey_id, "llm_call", "llm", start, start + elapsed,
+            model=model, input_tokens=input_tokens, output_tokens=output_tokens,
+        )
+        if input_tokens:
+            metrics.LLM_INPUT_TOKENS.inc(provider, model, amount=input_tokens)
+        if output_tokens:
+            metrics.LLM_OUTPUT_TOKENS.inc(provider, model, amount=output_tokens)
+            metrics.LLM_OUTPUT_TOKENS_PER_SECOND.observe(output_tokens / max(elapsed, 1e-6), provider, model)
+        return result
+
+    return run
+
+
+def call_llm(survey_id: str, fn: Callable[[], T], model: str = "", deadline_s: float | None = None) -> T:
+    """Make one LLM call on behalf of a survey run.
+
+    Every provider call made while running a graph goes through here and is
+    queued on the shared fair scheduler under the run's tenant and priority.
+    Calls for a cancelled run are never started, and calls already in flight
+    are abandoned within `CANCEL_POLL_S`: the waiting node raises
+    `RunCancelled` instead of blocking on the provider's response.
+
+    With a run budget, a call whose projected cost would take the run past
+    it is never queued: `BudgetExceeded` is raised instead.
+
+    `model` labels the call's latency, error and token metrics and prices
+    its ledger row.
+
+    With `deadline_s`, a call of a run that has been running that long
+    without answering is abandoned: `DeadlineExceeded` is raised while the
+    call itself finishes in the background and is still charged. It counts
+    as one failure in `health`, whatever the call's eventual outcome.
+    """
+    with _runs_lock:
+        run = _runs.get(survey_id)
+    if run is None:
+        return _instrumented(fn, model, survey_id)()
+    cancelled, tenant, priority, budget = run
+    if cancelled.is_set():
+        raise RunCancelled(survey_id)
+    charge = None
+    if budget is not None:
+        projected = budget.admit(model, cancelled)
+
+        def charge(cost: float | None) -> None:
+            budget.settle(model, projected, cost)
+    timing: dict = {}
+    future = scheduler.submit(survey_id, tenant, priority, _instrumented(fn, model, survey_id, charge, timing))
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_S)
+        except FutureTimeout:
+            if cancelled.is_set():
+                if future.cancel() and charge:
+                    charge(None)  # never started
+                raise RunCancelled(survey_id)
+            if deadline_s is not None and "start" in timing and time.perf_counter() - timing["start"] > deadline_s:
+                if _claim_health(timing):
+                    health.record(model, None)
+                raise DeadlineExceeded(model)
+
+
+def call_routed(
+    survey_id: str,
+    model: str,
+    api_keys: dict[str, str],
+    invoke: Callable[[ChatModel], T],
+    temperature: float | None = None,
+) -> tuple[T, str]:
+    """Make one LLM call on the healthiest model of `model`'s group; returns the result and the model that answered.
+
+    The candidates are the group's models with a key in `api_keys`, best
+    `health` score first (ties keep the requested model ahead). Every
+    candidate but the last gets `ROUTE_FAILOVER_S` from when its call starts
+    to answer; if it raises or runs past that, the call is made again on the
+    next one. Cancellation and budget stops are not failed over.
+    """
+    candidates = [m for m in model_group(model) if _key_for(m, api_keys)] or [model]
+    ranked = sorted(candidates, key=health.score)
+    for i, candidate in enumerate(ranked):
+        llm = get_llm(candidate, _key_for(candidate, api_keys), temperature=temperature)
+        final = i == len(ranked) - 1
+        try:
+            result = call_llm(
+                survey_id, lambda llm=llm: invoke(llm), candidate,
+                deadline_s=None if final else settings.route_failover_s,
+            )
+            return result, candidate
+        except (RunCancelled, BudgetExceeded):
+            raise
+        except DeadlineExceeded:
+            reason, detail = "deadline", f"no answer in {settings.route_failover_s:g}s"
+        except Exception as exc:
+            if final:
+                raise
+            reason, detail = "error", f"{type(exc).__name__}: {exc}"
+        metrics.LLM_ROUTE_FAILOVERS.inc(candidate, reason)
+        logger.info("Survey %s: failing over from %s to %s (%s)", survey_id, candidate, ranked[i + 1], detail)
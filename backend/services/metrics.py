@@ -0,0 +1,235 @@
+"""Counters, gauges and histograms served at `/metrics` in the Prometheus text format.
+
+Recording is a dict lookup and a few additions under a per-metric lock, so
+instrumentation stays on in production. Label values are passed
+positionally, in the order of the metric's `labels`.
+
+Every metric is additive, which lets job worker processes (see
+`services.jobs`) send what they recorded since their last report with
+`take_deltas()` and the API process fold it into its own registry with
+`merge()`; `/metrics` then covers the whole server.
+"""
+import asyncio
+import os
+import resource
+import threading
+from bisect import bisect_left
+
+# Seconds, from a cached DuckDB lookup to a slow reasoning-model call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 100, 150, 200, 400)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def take(self) -> dict[tuple, object]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def merge(self, values: dict[tuple, float]) -> None:
+        for key, amount in values.items():
+            self.inc(*key, amount=amount)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(key)} {_number(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    """A counter that can also go down (in-flight calls, open connections)."""
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                state = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def merge(self, values: dict[tuple, list]) -> None:
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0, 0])
+                for i, v in enumerate(other):
+                    state[i] += v
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), state):
+                cumulative += n
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, f'le="{le}"')} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_number(state[-2])}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def take_deltas(self) -> dict[str, dict]:
+        """Everything recorded since the last call, resetting it (worker processes only)."""
+        return {name: values for name, metric in self._metrics.items() if (values := metric.take())}
+
+    def merge(self, deltas: dict[str, dict]) -> None:
+        for name, values in deltas.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = Registry()
+
+LLM_CALL_SECONDS = registry.register(Histogram(
+    "panelchat_llm_call_seconds", "Duration of provider calls, excluding time queued in the scheduler.",
+    ("provider", "model"),
+))
+LLM_CALL_ERRORS = registry.register(Counter(
+    "panelchat_llm_call_errors_total", "Provider calls that raised, by exception class.",
+    ("provider", "model", "error"),
+))
+LLM_ROUTE_FAILOVERS = registry.register(Counter(
+    "panelchat_llm_route_failovers_total",
+    "Routed calls handed to the next model of their group, by the model left and why (deadline or error).",
+    ("model", "reason"),
+))
+LLM_CALLS_IN_FLIGHT = registry.register(Gauge(
+    "panelchat_llm_calls_in_flight", "Provider calls currently waiting on a response.", ("provider",),
+))
+LLM_INPUT_TOKENS = registry.register(Counter(
+    "panelchat_llm_input_tokens_total", "Prompt tokens reported by providers.", ("provider", "model"),
+))
+LLM_OUTPUT_TOKENS = registry.register(Counter(
+    "panelchat_llm_output_tokens_total", "Completion tokens reported by providers.", ("provider", "model"),
+))
+LLM_OUTPUT_TOKENS_PER_SECOND = registry.register(Histogram(
+    "panelchat_llm_output_tokens_per_second", "Completion tokens per second of call duration, per call.",
+    ("provider", "model"), buckets=RATE_BUCKETS,
+))
+PROMPT_SECTION_TOKENS = registry.register(Counter(
+    "panelchat_llm_prompt_section_tokens_total",
+    "Persona-call input tokens by prompt section (local estimate calibrated to reported usage).",
+    ("model", "section"),
+))
+FANOUT_SIZE = registry.register(Histogram(
+    "panelchat_fanout_sends", "Send fan-out size per superstep.", ("graph",), buckets=SIZE_BUCKETS,
+))
+DEBATE_BARRIER_WAIT = registry.register(Histogram(
+    "panelchat_debate_barrier_wait_seconds",
+    "Time between the first and the last answer a debate round waited for.", ("policy",),
+))
+ANSWER_FALLBACKS = registry.register(Counter(
+    "panelchat_answer_fallbacks_total",
+    "Answer parsing fallbacks: embedded_json, no_json, invalid_json, or per sub-question missing/invalid_option.",
+    ("reason",),
+))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "panelchat_db_query_seconds", "DuckDB statement duration (round trip when forwarded to the writer).",
+    ("statement", "mode"),
+))
+DB_LOCK_WAIT_SECONDS = registry.register(Histogram(
+    "panelchat_db_lock_wait_seconds", "Time spent waiting for the DuckDB connection lock.",
+))
+WS_QUEUE_DEPTH = registry.register(Histogram(
+    "panelchat_ws_queue_depth", "Events waiting in a WebSocket subscriber's queue when it is drained.",
+    buckets=SIZE_BUCKETS,
+))
+WS_CONNECTIONS = registry.register(Gauge(
+    "panelchat_ws_connections", "Open survey WebSockets.",
+))
+EVENT_LOOP_LAG_SECONDS = registry.register(Histogram(
+    "panelchat_event_loop_lag_seconds", "How much later than scheduled the API event loop woke a periodic timer.",
+))
+PROCESS_RESIDENT_BYTES = registry.register(Gauge(
+    "panelchat_process_resident_bytes", "Resident memory of the API process (not job worker processes) at scrape time.",
+))
+
+LOOP_LAG_INTERVAL_S = 0.25
+
+
+async def watch_event_loop(interval: float = LOOP_LAG_INTERVAL_S) -> None:
+    """Record event loop lag until cancelled: a blocked loop wakes this timer late."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - start - interval))
+
+
+def resident_bytes() -> int:
+    """Current RSS from /proc where there is one, else the peak RSS getrusage reports."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak, not current; KiB on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
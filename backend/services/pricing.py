@@ -0,0 +1,98 @@
+"""Per-million-token model pricing (USD), mirrored from frontend/src/lib/pricing.ts.
+
+`PRICING_PATH` can point at a JSON file of overrides and additions,
+`{"model": {"input": 3.0, "output": 15.0, "cached_input": 0.3}}`; it is read
+once, on first use. Without a `cached_input` price, cache reads cost the
+input price times the provider's usual discount.
+"""
+import json
+import logging
+import threading
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODEL_PRICING: dict[str, tuple[float, float]] = {
+    # Anthropic
+    "claude-opus-4-6": (5.00, 25.00),
+    "claude-sonnet-4-5-20250929": (3.00, 15.00),
+    "claude-haiku-4-5-20251001": (1.00, 5.00),
+    # OpenAI
+    "gpt-5.2": (1.75, 14.00),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "o3": (10.00, 40.00),
+    "o3-mini": (1.10, 4.40),
+    "o4-mini": (1.10, 4.40),
+    # Google
+    "gemini-3-pro-preview": (2.00, 12.00),
+    "gemini-3-flash-preview": (0.50, 3.00),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+
+# Share of the input price charged for prompt tokens read from the provider's cache
+CACHED_INPUT_DISCOUNT = {"claude": 0.1, "gpt": 0.25, "o": 0.25, "gemini": 0.25}
+
+_overrides: dict[str, dict[str, float]] | None = None
+_overrides_lock = threading.Lock()
+
+
+def _load_overrides() -> dict[str, dict[str, float]]:
+    global _overrides
+    with _overrides_lock:
+        if _overrides is None:
+            _overrides = {}
+            if settings.pricing_path:
+                try:
+                    with open(settings.pricing_path) as f:
+                        _overrides = json.load(f)
+                except (OSError, ValueError):
+                    logger.exception("Could not read price table %s", settings.pricing_path)
+        return _overrides
+
+
+def get_model_pricing(model: str) -> tuple[float, float]:
+    """Return (input, output) USD per million tokens, or zeros for unknown models."""
+    override = _load_overrides().get(model)
+    if override:
+        return override.get("input", 0.0), override.get("output", 0.0)
+    return MODEL_PRICING.get(model, (0.0, 0.0))
+
+
+def get_cached_input_price(model: str) -> float:
+    """USD per million input tokens served from the provider's prompt cache."""
+    override = _load_overrides().get(model) or {}
+    if "cached_input" in override:
+        return override["cached_input"]
+    input_price = get_model_pricing(model)[0]
+    for prefix in ("claude", "gpt", "gemini", "o"):
+        if model.startswith(prefix):
+            return input_price * CACHED_INPUT_DISCOUNT[prefix]
+    return input_price
+
+
+def estimate_cost(model: str, token_usage: dict | None) -> float:
+    """Compute the USD cost of one call from its token usage.
+
+    `cached_input_tokens`, when present, are part of `input_tokens` and are
+    charged at the cached rate.
+    """
+    if not token_usage:
+        return 0.0
+    input_price, output_price = get_model_pricing(model)
+    cached = token_usage.get("cached_input_tokens", 0)
+    return (
+        (token_usage.get("input_tokens", 0) - cached) * input_price
+        + cached * get_cached_input_price(model)
+        + token_usage.get("output_tokens", 0) * output_price
+    ) / 1_000_000
+
+
+def rank_by_price(models: list[str]) -> list[str]:
+    """Sort models from cheapest to most expensive (blended input + output price)."""
+    return sorted(models, key=lambda m: sum(get_model_pricing(m)))
@@ -0,0 +1,240 @@
+"""Per-run span timelines and an opt-in sampling CPU profiler.
+
+Every job records where its time went as a flat list of spans — the run and
+its time queued, debate rounds, graph nodes, prompt building, each LLM call
+(time waiting for the scheduler and the provider call itself, with token
+counts), answer parsing and DuckDB reads and writes. Nesting is implied by
+time and thread, as in Chrome's trace format. Recording is a no-op for
+surveys without a running timeline.
+
+When the run ends the timeline is saved as one zlib-compressed row of
+`run_profiles`, names interned; `GET /api/surveys/{id}/profile` serves it as
+a per-span summary, the raw spans or a Chrome trace (chrome://tracing,
+Perfetto).
+
+With `RunOptions.profile` a sampler thread also records the Python stack of
+every thread in the process each `PROFILE_SAMPLE_INTERVAL_MS`, saved as
+folded stacks for flame graph tools. Other runs in the same process show up
+in those samples too.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from backend.config import settings
+from backend.db import execute_query
+
+_timelines: dict[str, "Timeline"] = {}
+_timelines_lock = threading.Lock()
+
+
+class Timeline:
+    """The spans of one run, as (name, category, start_us, duration_us, thread, args)."""
+
+    def __init__(self, survey_id: str, since: float):
+        self.survey_id = survey_id
+        self.started_at = since  # wall clock; span times are relative to it
+        self.origin = time.perf_counter() - (time.time() - since)
+        self.spans: list[tuple] = []
+        self.threads: dict[int, str] = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, category: str, start: float, end: float, args: dict | None = None) -> None:
+        """Record a span between two `time.perf_counter()` readings."""
+        thread = threading.get_ident()
+        with self._lock:
+            if len(self.spans) >= settings.profile_max_spans:
+                self.dropped += 1
+                return
+            if thread not in self.threads:
+                self.threads[thread] = threading.current_thread().name
+            self.spans.append((
+                name, category,
+                int((start - self.origin) * 1e6), int((end - start) * 1e6),
+                thread, args or None,
+            ))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.origin
+
+
+def start_run(survey_id: str, since: float | None = None) -> Timeline:
+    """Begin a survey's timeline; `since` (wall clock) backdates it, e.g. to when the job was queued."""
+    timeline = Timeline(survey_id, since or time.time())
+    with _timelines_lock:
+        _timelines[survey_id] = timeline
+    return timeline
+
+
+def finish_run(survey_id: str) -> Timeline | None:
+    with _timelines_lock:
+        return _timelines.pop(survey_id, None)
+
+
+def record(survey_id: str, name: str, category: str, start: float, end: float, **args) -> None:
+    timeline = _timelines.get(survey_id)
+    if timeline is not None:
+        timeline.add(name, category, start, end, args)
+
+
+@contextmanager
+def span(survey_id: str, name: str, category: str, **args):
+    """Time the block as a span of the survey's run; the yielded dict collects extra args."""
+    timeline = _timelines.get(survey_id)
+    if timeline is None:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        timeline.add(name, category, start, time.perf_counter(), args)
+
+
+def traced(name: str, node):
+    """Wrap a graph node so each of its runs is a "node" span.
+
+    Keeps the node's annotations: LangGraph reads its input schema from them.
+    """
+    @wraps(node)
+    def run(state):
+        with span(state["survey_id"], name, "node"):
+            return node(state)
+    return run
+
+
+class Sampler:
+    """Samples every thread's Python stack on a background thread, counting folded stacks."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="profile-sampler", daemon=True)
+
+    def start(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        """Stop sampling; returns the folded stacks ("outer;inner;leaf count" lines)."""
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+    def _loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < 64:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+
+def save_profile(timeline: Timeline, status: str, duration_s: float, cpu_profile: str | None = None) -> None:
+    strings: dict[str, int] = {}
+    threads = {ident: i for i, ident in enumerate(timeline.threads)}
+
+    def intern(s: str) -> int:
+        return strings.setdefault(s, len(strings))
+
+    spans = [
+        [intern(name), intern(category), start, duration, threads[thread], args or 0]
+        for name, category, start, duration, thread, args in timeline.spans
+    ]
+    payload = {
+        "strings": list(strings),
+        "threads": list(timeline.threads.values()),
+        "dropped": timeline.dropped,
+        "spans": spans,
+    }
+    execute_query(
+        """INSERT OR REPLACE INTO run_profiles
+           (survey_id, started_at, status, duration_s, span_count, spans, cpu_profile)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [
+            timeline.survey_id, datetime.fromtimestamp(timeline.started_at), status, duration_s, len(spans),
+            zlib.compress(json.dumps(payload, separators=(",", ":")).encode()),
+            zlib.compress(cpu_profile.encode()) if cpu_profile else None,
+        ],
+    )
+
+
+def load_profile(survey_id: str) -> dict | None:
+    """The survey's latest saved run profile with its spans decoded, or None."""
+    row = execute_query(
+        """SELECT started_at, status, duration_s, spans, cpu_profile FROM run_profiles
+           WHERE survey_id = ? ORDER BY started_at DESC LIMIT 1""",
+        [survey_id],
+    ).fetchone()
+    if not row:
+        return None
+    payload = json.loads(zlib.decompress(row[3]))
+    strings, threads = payload["strings"], payload["threads"]
+    return {
+        "survey_id": survey_id,
+        "started_at": str(row[0]),
+        "status": row[1],
+        "duration_s": row[2],
+        "dropped": payload["dropped"],
+        "threads": threads,
+        "spans": [
+            {
+                "name": strings[name], "category": strings[category],
+                "start_us": start, "duration_us": duration, "thread": thread, "args": args or {},
+            }
+            for name, category, start, duration, thread, args in payload["spans"]
+        ],
+        "cpu_profile": zlib.decompress(row[4]).decode() if row[4] else None,
+    }
+
+
+def summarize(spans: list[dict]) -> list[dict]:
+    """Count, total and max duration per (category, name), longest total first."""
+    stats: dict[tuple[str, str], dict] = {}
+    for s in spans:
+        entry = stats.setdefault((s["category"], s["name"]), {
+            "category": s["category"], "name": s["name"], "count": 0, "total_s": 0.0, "max_s": 0.0,
+        })
+        seconds = s["duration_us"] / 1e6
+        entry["count"] += 1
+        entry["total_s"] += seconds
+        entry["max_s"] = max(entry["max_s"], seconds)
+    for entry in stats.values():
+        entry["total_s"] = round(entry["total_s"], 6)
+    return sorted(stats.values(), key=lambda e: e["total_s"], reverse=True)
+
+
+def chrome_trace(profile: dict) -> dict:
+    """The profile in Chrome's trace event format (complete "X" events plus thread names)."""
+    events = [
+        {"name": "thread_name", "ph": "M", "pid": 1, "tid": i, "args": {"name": name}}
+        for i, name in enumerate(profile["threads"])
+    ]
+    events.extend(
+        {
+            "name": s["name"], "cat": s["category"], "ph": "X", "pid": 1, "tid": s["thread"],
+            "ts": s["start_us"], "dur": s["duration_us"], "args": s["args"],
+        }
+        for s in profile["spans"]
+    )
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"survey_id": profile["survey_id"], "started_at": profile["started_at"]},
+    }
@@ -0,0 +1,130 @@
+"""Fair scheduler for the LLM calls of every running survey.
+
+All calls made by running jobs share one set of `settings.llm_max_workers`
+threads. Waiting calls are queued per survey, surveys are grouped by tenant
+(the API keys they run with) and tenants by priority class. Each level is
+served by deficit round-robin: with every call costing one unit, a child
+gets `weight` calls per turn, so one tenant's 500-persona survey cannot
+starve another tenant's 5-persona one, and `interactive` runs get
+`PRIORITY_WEIGHTS["interactive"]` turns for each `batch` turn while both
+have work waiting.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from backend.config import settings
+
+PRIORITY_WEIGHTS = {"interactive": 4, "batch": 1}
+
+
+def tenant_for(api_keys: dict[str, str]) -> str:
+    """Stable, non-reversible id for the set of API keys a run uses."""
+    joined = "|".join(f"{provider}={key}" for provider, key in sorted(api_keys.items()) if key)
+    return hashlib.sha256(joined.encode()).hexdigest()[:12]
+
+
+class _Node:
+    """A queue (leaf) or a deficit round-robin over child queues."""
+
+    def __init__(self, weight: int = 1):
+        self.weight = weight
+        self.deficit = 0
+        self.size = 0
+        self.items: deque = deque()
+        self.children: OrderedDict[str, "_Node"] = OrderedDict()  # only non-empty ones
+
+    def push(self, path: list[tuple[str, int]], item) -> None:
+        self.size += 1
+        if not path:
+            self.items.append(item)
+            return
+        (name, weight), rest = path[0], path[1:]
+        child = self.children.get(name)
+        if child is None:
+            child = self.children[name] = _Node(weight)
+        child.push(rest, item)
+
+    def pop(self):
+        self.size -= 1
+        if not self.children:
+            return self.items.popleft()
+        name, child = next(iter(self.children.items()))
+        if child.deficit <= 0:
+            # Its turn starts
+            child.deficit += child.weight
+        item = child.pop()
+        child.deficit -= 1
+        if not child.size:
+            # Idle queues do not bank credit
+            del self.children[name]
+        elif child.deficit <= 0:
+            self.children.move_to_end(name)
+        return item
+
+
+class Scheduler:
+    def __init__(self, workers: int):
+        self._workers = workers
+        self._threads: list[threading.Thread] = []
+        self._root = _Node()
+        self._cond = threading.Condition()
+        self._stats: dict[str, dict] = {}  # survey_id -> queue counters
+
+    def submit(self, survey_id: str, tenant: str, priority: str, fn: Callable) -> Future:
+        """Queue `fn` for the survey; the future can be cancelled until a worker picks it up."""
+        future: Future = Future()
+        path = [(priority, PRIORITY_WEIGHTS.get(priority, 1)), (tenant, 1), (survey_id, 1)]
+        with self._cond:
+            while len(self._threads) < self._workers:
+                thread = threading.Thread(target=self._work, name=f"llm-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._root.push(path, (survey_id, fn, future, time.monotonic()))
+            stats = self._stats.setdefault(survey_id, _new_stats())
+            stats["queued"] += 1
+            self._cond.notify()
+        return future
+
+    def stats(self, survey_id: str) -> dict:
+        """Calls started, calls waiting, and total / max queue wait (seconds) for a survey."""
+        with self._cond:
+            return dict(self._stats.get(survey_id) or _new_stats())
+
+    def release(self, survey_id: str) -> dict:
+        """Forget a finished survey's counters, returning their final values."""
+        with self._cond:
+            return self._stats.pop(survey_id, None) or _new_stats()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._root.size:
+                    self._cond.wait()
+                survey_id, fn, future, queued_at = self._root.pop()
+                waited = time.monotonic() - queued_at
+                # None once the survey's run was released
+                stats = self._stats.get(survey_id)
+                if stats:
+                    stats["queued"] -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            if stats:
+                with self._cond:
+                    stats["calls"] += 1
+                    stats["wait_total_s"] += waited
+                    stats["wait_max_s"] = max(stats["wait_max_s"], waited)
+            try:
+                future.set_result(fn())
+            except BaseException as exc:
+                future.set_exception(exc)
+
+
+def _new_stats() -> dict:
+    return {"calls": 0, "queued": 0, "wait_total_s": 0.0, "wait_max_s": 0.0}
+
+
+scheduler = Scheduler(settings.llm_max_workers)
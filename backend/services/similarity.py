@@ -0,0 +1,68 @@
+"""Local TF-IDF index over short texts (debate messages, questions).
+
+Sparse vectors are plain ``{term: weight}`` dicts, L2-normalized, so cosine
+similarity is a dot product. No external service or model is involved.
+"""
+import math
+import re
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most my
+myself no nor not now of off on once only or other our ours ourselves out over own same she should so
+some such than that the their theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves i'm it's don't we're they're that's
+""".split())
+
+SparseVector = dict[str, float]
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def normalize(vec: dict[str, float]) -> SparseVector:
+    norm = math.sqrt(sum(w * w for w in vec.values()))
+    if norm == 0:
+        return {}
+    return {t: w / norm for t, w in vec.items()}
+
+
+def cosine(a: SparseVector, b: SparseVector) -> float:
+    """Cosine similarity of two normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(t, 0.0) for t, w in a.items())
+
+
+def tfidf_vectors(texts: list[str]) -> list[SparseVector]:
+    """Sublinear-tf, smoothed-idf TF-IDF vectors, L2-normalized."""
+    token_lists = [tokenize(t) for t in texts]
+    doc_freq: Counter[str] = Counter()
+    for tokens in token_lists:
+        doc_freq.update(set(tokens))
+    n_docs = len(texts)
+    idf = {t: math.log((1 + n_docs) / (1 + df)) + 1 for t, df in doc_freq.items()}
+
+    vectors = []
+    for tokens in token_lists:
+        counts = Counter(tokens)
+        vectors.append(normalize({t: (1 + math.log(c)) * idf[t] for t, c in counts.items()}))
+    return vectors
+
+
+def similarity_matrix(vectors: list[SparseVector]) -> list[list[float]]:
+    """Pairwise cosine similarities (symmetric, 1.0 on the diagonal for non-empty vectors)."""
+    n = len(vectors)
+    sims = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        sims[i][i] = 1.0 if vectors[i] else 0.0
+        for j in range(i + 1, n):
+            sims[i][j] = sims[j][i] = cosine(vectors[i], vectors[j])
+    return sims
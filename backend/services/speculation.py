@@ -0,0 +1,47 @@
+"""Work started speculatively when a survey is created, so the run that follows starts warm.
+
+Between creating a survey and clicking Run the client analyzes the question
+and the user reviews the breakdown; this uses that time. The question is
+analyzed in the background when the create request carries the analyzer's
+API key, so the client's `/analyze` joins that call (or finds its result in
+the breakdown cache). The panel's persona prompts are rendered and the run
+graphs compiled on a worker thread, and the run reuses both.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.models.survey import SurveySession
+from backend.services import jobs
+from backend.services.analyzer import analyze_question
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+_tasks: set[asyncio.Task] = set()  # keeps running analyses referenced until they finish
+
+
+def speculate(session: SurveySession, analyzer_model: str, analyzer_api_key: str | None = None) -> None:
+    """Start the survey's speculative work and return at once. Call from the event loop."""
+    if analyzer_api_key:
+        task = asyncio.get_running_loop().create_task(
+            analyze_question(session.question, analyzer_model, analyzer_api_key),
+        )
+        _tasks.add(task)
+        task.add_done_callback(_analysis_done)
+    _executor.submit(_prepare_run, session)
+
+
+def _analysis_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # The client's own /analyze reports the error
+        logger.warning("Speculative analysis failed: %s", task.exception())
+
+
+def _prepare_run(session: SurveySession) -> None:
+    try:
+        jobs.warm_graphs()
+        jobs.prefetch_prompts(session)
+    except Exception:
+        logger.exception("Could not prepare the run of survey %s", session.id)
@@ -0,0 +1,55 @@
+"""Framing of job events for WebSocket clients.
+
+A client opts in through its init message: `flush_ms` > 0 coalesces the
+events published within that interval into one `batch` frame (`data` is
+the list of events, each unchanged), and `encoding: "msgpack"` sends
+frames as binary MessagePack instead of JSON text. Clients that send
+neither get one JSON frame per event, as before.
+
+orjson and ormsgpack are used when installed (the `msgpack` extra pins
+ormsgpack); without it a msgpack request falls back to JSON, and the
+`stream_ready` acknowledgement tells the client which encoding it got.
+"""
+import json
+
+from fastapi import WebSocket
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+
+def negotiate(encoding: str) -> str:
+    """The encoding this server can actually use for a client that asked for `encoding`."""
+    if encoding == "msgpack" and ormsgpack is not None:
+        return "msgpack"
+    return "json"
+
+
+def _dumps(frame: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(frame).decode()
+    return json.dumps(frame)
+
+
+async def send_frame(websocket: WebSocket, frame: dict, encoding: str) -> None:
+    if encoding == "msgpack":
+        await websocket.send_bytes(ormsgpack.packb(frame))
+    else:
+        await websocket.send_text(_dumps(frame))
+
+
+async def send_events(websocket: WebSocket, events: list[dict], encoding: str, batched: bool, max_batch: int) -> None:
+    """Send events as `batch` frames of at most `max_batch`, or one frame each."""
+    if not batched:
+        for event in events:
+            await send_frame(websocket, event, encoding)
+        return
+    for i in range(0, len(events), max_batch):
+        await send_frame(websocket, {"type": "batch", "data": events[i:i + max_batch]}, encoding)
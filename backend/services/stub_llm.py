@@ -0,0 +1,106 @@
+"""A stand-in chat model for load tests: no provider, no key, no network.
+
+With `LLM_STUB=true`, `get_llm` returns a `StubChatModel` for every model.
+It sleeps for about `LLM_STUB_LATENCY_S` per request (±20%) on the calling
+thread, as a provider call would, then answers in the shape the graph
+expects: survey prompts get a JSON object picking one listed option per
+sub-question (with a confidence when asked for one), discussion prompts a
+few sentences, and structured-output requests a parsing failure, which the
+analysis steps already fall back from. Answers are chosen by hashing the
+prompt, so a rerun of the same survey answers the same way. Usage metadata
+estimates tokens at four characters each.
+
+Question analysis is not stubbed (it has no fallback): load tests submit
+their breakdown directly.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from backend.config import settings
+
+_SUB_QUESTION = re.compile(r"^- (\S+): .*\n  Options: \[(.*)\]$", re.MULTILINE)
+_OPTION = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def _seed(messages: list, salt: str = "") -> int:
+    text = "\n".join(str(m.content) for m in messages) + salt
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def _reply(model: str, messages: list, salt: str = "") -> AIMessage:
+    prompt = str(messages[-1].content)
+    rng = random.Random(_seed(messages, salt))
+    sub_questions = _SUB_QUESTION.findall(prompt)
+    if sub_questions:
+        answers: dict = {}
+        for sq_id, options in sub_questions:
+            choices = _OPTION.findall(options)
+            if choices:
+                answers[sq_id] = rng.choice(choices)
+        if '"confidence"' in prompt:
+            answers["confidence"] = round(rng.uniform(0.3, 1.0), 2)
+        content = json.dumps(answers)
+    else:
+        content = rng.choice((
+            "From where I sit, it depends on team size and how mature the platform already is.",
+            "I'd push back a little: the tooling matters less than the ownership model around it.",
+            "We tried both approaches; the simpler one won once we counted maintenance time.",
+        )) + " That's been consistent across the teams I've worked with."
+    input_tokens = sum(len(str(m.content)) for m in messages) // 4
+    output_tokens = max(1, len(content) // 4)
+    return AIMessage(
+        content=content,
+        response_metadata={"model_name": model},
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+    )
+
+
+def _wait() -> None:
+    if settings.llm_stub_latency_s > 0:
+        time.sleep(settings.llm_stub_latency_s * random.uniform(0.8, 1.2))
+
+
+class StubChatModel:
+    """Answers `invoke`, `batch`, `generate` and `with_structured_output` like a chat model would."""
+
+    def __init__(self, model: str, n: int | None = None, include_raw: bool | None = None):
+        self.model = model
+        self._n = n or 1
+        self._include_raw = include_raw  # None: not a structured-output model
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs) -> "StubChatModel":
+        return StubChatModel(self.model, self._n, include_raw)
+
+    def invoke(self, messages: list, **kwargs):
+        _wait()
+        raw = _reply(self.model, messages)
+        if self._include_raw is None:
+            return raw
+        if not self._include_raw:
+            raise ValueError("Stub model returns no structured output")
+        return {"raw": raw, "parsed": None, "parsing_error": ValueError("Stub model returns no structured output")}
+
+    def batch(self, inputs: list[list], **kwargs) -> list:
+        _wait()
+        return [_reply(self.model, messages, salt=str(i)) for i, messages in enumerate(inputs)]
+
+    def generate(self, batch_messages: list[list], **kwargs) -> LLMResult:
+        _wait()
+        return LLMResult(generations=[
+            [ChatGeneration(message=_reply(self.model, messages, salt=str(i))) for i in range(self._n)]
+            for messages in batch_messages
+        ])
+
+    async def ainvoke(self, messages: list, **kwargs):
+        return await asyncio.to_thread(self.invoke, messages, **kwargs)
@@ -0,0 +1,84 @@
+"""Cheap local token estimates for prompt budgeting and per-section accounting."""
+import threading
+
+# Average characters per token across the supported providers' tokenizers
+CHARS_PER_TOKEN = 4
+
+# Parts of a persona call's prompt that input tokens are attributed to
+PROMPT_SECTIONS = ("persona", "memory", "sub_questions", "transcript", "instructions")
+
+_calibration: dict[str, list[float]] = {}  # model -> [reported input tokens, local estimate]
+_sections: dict[str, dict[tuple[str, str], list[int]]] = {}  # survey_id -> (model, section) -> [calls, tokens]
+_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for a piece of prompt text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Keep the tail of `text` so that it fits in roughly `max_tokens` tokens."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[-max_chars:]
+    # Start on a line boundary so no speaker turn is cut mid-name
+    newline = cut.find("\n")
+    if 0 <= newline < len(cut) // 2:
+        cut = cut[newline + 1:]
+    return "…\n" + cut
+
+
+def calibrated_tokens(model: str, chars: float) -> float:
+    """Expected input tokens for `chars` characters of prompt, by the model's reported/estimated ratio so far."""
+    tokens = chars / CHARS_PER_TOKEN
+    with _lock:
+        calibration = _calibration.get(model)
+    return tokens * calibration[0] / calibration[1] if calibration and calibration[1] else tokens
+
+
+def split_input_tokens(model: str, section_chars: dict[str, int], reported: int | None, requests: int = 1) -> dict[str, int]:
+    """Attribute a call's input tokens to its prompt sections.
+
+    Each section is estimated from its length, then all are scaled so they
+    add up to the input tokens the provider reported. Calls without reported
+    usage are scaled by the model's reported/estimated ratio so far.
+    `requests` is how many times the prompt was sent (fanned-out samples).
+    """
+    estimates = {name: chars * requests / CHARS_PER_TOKEN for name, chars in section_chars.items()}
+    total = sum(estimates.values())
+    if not total:
+        return {name: 0 for name in section_chars}
+    with _lock:
+        if reported:
+            calibration = _calibration.setdefault(model, [0.0, 0.0])
+            calibration[0] += reported
+            calibration[1] += total
+            target = reported
+        else:
+            calibration = _calibration.get(model)
+            target = total * calibration[0] / calibration[1] if calibration else total
+    # Largest remainder, so the parts add up exactly
+    scaled = {name: estimate * target / total for name, estimate in estimates.items()}
+    parts = {name: int(v) for name, v in scaled.items()}
+    shortfall = round(target) - sum(parts.values())
+    for name in sorted(scaled, key=lambda n: scaled[n] - parts[n], reverse=True)[:max(0, shortfall)]:
+        parts[name] += 1
+    return parts
+
+
+def record_sections(survey_id: str, model: str, sections: dict[str, int]) -> None:
+    """Add one call's section tokens to the survey's running totals."""
+    with _lock:
+        totals = _sections.setdefault(survey_id, {})
+        for section, tokens in sections.items():
+            entry = totals.setdefault((model, section), [0, 0])
+            entry[0] += 1
+            entry[1] += tokens
+
+
+def take_sections(survey_id: str) -> dict[tuple[str, str], list[int]]:
+    """The survey's totals since the last call, as (model, section) -> [calls, tokens]."""
+    with _lock:
+        return _sections.pop(survey_id, {})
@@ -1,4 +1,4 @@
-import type { QuestionBreakdown, SurveySession, SurveySummary } from "@/types"
+import type { JobStatus, QuestionBreakdown, SurveySession, SurveySummary } from "@/types"
 
 const BASE_URL = import.meta.env.VITE_API_URL ?? ""
 
@@ -43,6 +43,7 @@ export async function createSurvey(body: {
   filters: Record<string, string[]> | null
   models: string[]
   analyzer_model: string
+  analyzer_api_key?: string
 }): Promise<SurveySession> {
   return fetchJSON<SurveySession>("/api/surveys", {
     method: "POST",
@@ -54,10 +55,11 @@ export async function analyzeSurvey(
   surveyId: string,
   model: string,
   apiKey: string,
+  fresh = false,
 ): Promise<QuestionBreakdown> {
   return fetchJSON<QuestionBreakdown>(`/api/surveys/${surveyId}/analyze`, {
     method: "POST",
-    body: JSON.stringify({ model, api_key: apiKey }),
+    body: JSON.stringify({ model, api_key: apiKey, fresh }),
   })
 }
 
@@ -78,3 +80,7 @@ export async function listSurveys(): Promise<SurveySummary[]> {
 export async function getSurvey(id: string): Promise<SurveySession> {
   return fetchJSON<SurveySession>(`/api/surveys/${id}`)
 }
+
+export async function cancelJob(surveyId: string): Promise<JobStatus> {
+  return fetchJSON<JobStatus>(`/api/jobs/${surveyId}/cancel`, { method: "POST" })
+}
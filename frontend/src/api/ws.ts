@@ -9,6 +9,7 @@ function getWsBase(): string {
 }
 
 const WS_BASE = getWsBase()
+const STREAM_FLUSH_MS = 50
 
 export function connectSurveyWS(
   surveyId: string,
@@ -18,6 +19,7 @@ export function connectSurveyWS(
     personaMemory: boolean
     chatMode: ChatMode
     numRounds: number
+    samplesPerPersona: number
   },
   onMessage: (msg: WSMessage) => void,
   onClose?: () => void,
@@ -37,12 +39,19 @@ export function connectSurveyWS(
       persona_memory: options.personaMemory,
       chat_mode: options.chatMode,
       num_rounds: options.numRounds,
+      samples_per_persona: options.samplesPerPersona,
+      // Coalesce events into one "batch" frame per flush interval
+      flush_ms: STREAM_FLUSH_MS,
     }))
   }
 
   ws.onmessage = (event) => {
     const msg: WSMessage = JSON.parse(event.data)
-    onMessage(msg)
+    if (msg.type === "batch") {
+      for (const inner of msg.data as unknown as WSMessage[]) onMessage(inner)
+    } else {
+      onMessage(msg)
+    }
   }
 
   ws.onclose = () => {
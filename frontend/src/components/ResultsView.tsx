@@ -17,6 +17,7 @@ import {
   storeChartThemeId,
 } from "@/lib/chartThemes"
 import { computeActualCost, formatCost } from "@/lib/pricing"
+import { hasAnswer } from "@/lib/answers"
 import { X, EyeOff, Palette, DollarSign, MessageSquareText, Swords, BarChart3 } from "lucide-react"
 import type { CompletedSurvey, Respondent } from "@/types"
 
@@ -284,7 +285,7 @@ function SurveyResultGroup({
   const filteredResponses = useMemo(() => {
     if (!drillDown) return []
     return survey.responses.filter(
-      (r) => r.answers[drillDown.sqId] === drillDown.option
+      (r) => hasAnswer(r, drillDown.sqId, drillDown.option)
     )
   }, [drillDown, survey.responses])
 
@@ -38,6 +38,8 @@ export function SettingsModal() {
     setModelTemperature,
     personaMemory,
     setPersonaMemory,
+    samplesPerPersona,
+    setSamplesPerPersona,
   } = useSurveyStore()
 
   const toggleModel = (modelValue: string) => {
@@ -191,6 +193,24 @@ export function SettingsModal() {
             />
           </div>
 
+          {/* Samples per Persona */}
+          <div className="space-y-2">
+            <div className="flex items-center justify-between">
+              <Label className="text-sm">Samples per Persona</Label>
+              <span className="text-xs font-semibold tabular-nums">{samplesPerPersona}</span>
+            </div>
+            <p className="text-xs text-muted-foreground">
+              Draw several answers per persona (temperature &gt; 0) and chart the answer distribution.
+            </p>
+            <Slider
+              value={[samplesPerPersona]}
+              onValueChange={([v]) => setSamplesPerPersona(v)}
+              min={1}
+              max={10}
+              step={1}
+            />
+          </div>
+
         </div>
 
         <Button onClick={() => setSettingsOpen(false)} className="w-full">
@@ -13,6 +13,12 @@ import {
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { BarChart3, PieChart as PieChartIcon } from "lucide-react"
 import type { SubQuestion, SurveyResponse } from "@/types"
+import { answerWeights } from "@/lib/answers"
+
+/** Fractional multi-sample weights are shown to two decimals. */
+function roundWeight(value: number): number {
+  return Math.round(value * 100) / 100
+}
 
 interface SubQuestionChartProps {
   subQuestion: SubQuestion
@@ -37,14 +43,15 @@ export function SubQuestionChart({
       counts[opt] = 0
     }
     for (const resp of responses) {
-      const chosen = resp.answers[subQuestion.id]
-      if (chosen && counts[chosen] !== undefined) {
-        counts[chosen]++
+      for (const [opt, weight] of Object.entries(answerWeights(resp, subQuestion.id))) {
+        if (counts[opt] !== undefined) {
+          counts[opt] += weight
+        }
       }
     }
     return subQuestion.answer_options.map((opt, i) => ({
       name: opt,
-      count: counts[opt],
+      count: roundWeight(counts[opt]),
       fill: colors[i % colors.length],
     }))
   }, [subQuestion, responses, colors])
@@ -64,9 +71,11 @@ export function SubQuestionChart({
     return subQuestion.answer_options.map((opt) => {
       const row: Record<string, string | number> = { name: opt }
       for (const model of uniqueModels) {
-        row[model] = responses.filter(
-          (r) => r.model === model && r.answers[subQuestion.id] === opt
-        ).length
+        row[model] = roundWeight(
+          responses
+            .filter((r) => r.model === model)
+            .reduce((sum, r) => sum + (answerWeights(r, subQuestion.id)[opt] ?? 0), 0)
+        )
       }
       return row
     })
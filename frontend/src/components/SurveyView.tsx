@@ -7,10 +7,12 @@ import { PersonaDetail } from "./PersonaDetail"
 import { DebateTranscript } from "./DebateTranscript"
 import { CostBadge } from "./CostBadge"
 import { Progress } from "@/components/ui/progress"
+import { Button } from "@/components/ui/button"
 import { Badge } from "@/components/ui/badge"
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs"
 import { getAvatar } from "@/lib/avatar"
-import { ClipboardList, Loader2, Users, BarChart3, MessageSquareText } from "lucide-react"
+import { ClipboardList, Loader2, Users, BarChart3, MessageSquareText, Square } from "lucide-react"
+import { cancelJob } from "@/api/client"
 import type { CompletedSurvey, DebateMessage, Respondent, SurveyResponse } from "@/types"
 
 interface MergedPanelist {
@@ -41,6 +43,7 @@ export function SurveyView() {
     visibleSurveyIds,
     removeSurveyFromResults,
     reset,
+    setError,
     chatMode,
     currentRound,
     totalRounds,
@@ -405,7 +408,22 @@ export function SurveyView() {
                       ? `Round ${currentRound}: ${currentRoundItems} of ${currentRoundTotal} responses`
                       : `${responses.length} of ${totalExpected} responses collected`}
                   </span>
-                  <span className="font-medium tabular-nums">{progressPercent}%</span>
+                  <div className="flex items-center gap-2">
+                    <span className="font-medium tabular-nums">{progressPercent}%</span>
+                    <Button
+                      variant="outline"
+                      size="xs"
+                      onClick={() => {
+                        if (!surveyId) return
+                        // The run's WebSocket reports "cancelled" once the job stops
+                        cancelJob(surveyId).catch((err) =>
+                          setError(err instanceof Error ? err.message : "Cancel failed"),
+                        )
+                      }}
+                    >
+                      <Square /> Cancel
+                    </Button>
+                  </div>
                 </div>
                 <Progress value={progressPercent} className="h-2" />
               </div>
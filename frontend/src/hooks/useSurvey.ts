@@ -40,6 +40,7 @@ export function useSurvey() {
           personaMemory: store.personaMemory,
           chatMode,
           numRounds,
+          samplesPerPersona: store.samplesPerPersona,
         },
         (msg: WSMessage) => {
           switch (msg.type) {
@@ -59,6 +60,7 @@ export function useSurvey() {
               store.setRound(round + 1, totalRounds)
               break
             }
+            case "debate_preview":
             case "debate_analysis": {
               const analysis = msg.data as unknown as DebateAnalysis
               store.setDebateAnalysis(analysis)
@@ -69,6 +71,10 @@ export function useSurvey() {
               refreshHistory()
               break
             }
+            case "cancelled": {
+              store.setError("Run cancelled")
+              break
+            }
             case "error": {
               store.setError(msg.data.message as string)
               break
@@ -103,13 +109,17 @@ export function useSurvey() {
         }
       }
 
-      // Create survey
+      const analyzerProvider = getProviderKey(getModelProvider(store.analyzerModel))
+      const analyzerApiKey = store.apiKeys[analyzerProvider]
+
+      // Create survey; in survey mode the backend starts analyzing right away
       const session = await createSurvey({
         question,
         panel_size: store.panelSize,
         filters: Object.keys(activeFilters).length > 0 ? activeFilters : null,
         models: store.selectedModels,
         analyzer_model: store.analyzerModel,
+        analyzer_api_key: store.chatMode === "debate" ? undefined : analyzerApiKey || undefined,
       })
 
       store.startAnalysis(session.id, question, session.panel as never[], session.models)
@@ -122,9 +132,6 @@ export function useSurvey() {
       }
 
       // Survey mode: run analyzer to break down the question
-      const analyzerProvider = getProviderKey(getModelProvider(store.analyzerModel))
-      const analyzerApiKey = store.apiKeys[analyzerProvider]
-
       try {
         const breakdown = await analyzeSurvey(session.id, store.analyzerModel, analyzerApiKey)
         store.setBreakdown(breakdown)
@@ -0,0 +1,27 @@
+import type { SurveyResponse } from "@/types"
+
+/**
+ * Per-option weight of one response for a sub-question.
+ * Multi-sample responses split their single vote across options in proportion
+ * to their sample counts; single-draw responses put all weight on the answer.
+ */
+export function answerWeights(resp: SurveyResponse, subQuestionId: string): Record<string, number> {
+  const votes = resp.answer_distribution?.[subQuestionId]
+  if (votes) {
+    const total = Object.values(votes).reduce((sum, n) => sum + n, 0)
+    if (total > 0) {
+      const weights: Record<string, number> = {}
+      for (const [opt, n] of Object.entries(votes)) {
+        weights[opt] = n / total
+      }
+      return weights
+    }
+  }
+  const chosen = resp.answers[subQuestionId]
+  return chosen ? { [chosen]: 1 } : {}
+}
+
+/** Whether a response gave any weight to the option (used for drill-down). */
+export function hasAnswer(resp: SurveyResponse, subQuestionId: string, option: string): boolean {
+  return (answerWeights(resp, subQuestionId)[option] ?? 0) > 0
+}
@@ -23,6 +23,7 @@ const STORAGE_KEY_TEMPERATURES = "panel-chat-model-temps"
 const STORAGE_KEY_MEMORY = "panel-chat-persona-memory"
 const STORAGE_KEY_MODE = "panel-chat-mode"
 const STORAGE_KEY_DEBATE_ROUNDS = "panel-chat-debate-rounds"
+const STORAGE_KEY_SAMPLES = "panel-chat-samples-per-persona"
 
 function loadApiKeys(): ApiKeys {
   return {
@@ -72,6 +73,7 @@ interface SurveyState {
   personaMemory: boolean
   chatMode: ChatMode
   debateRounds: number
+  samplesPerPersona: number
   setApiKey: (provider: keyof ApiKeys, key: string) => void
   setSelectedModels: (models: string[]) => void
   setAnalyzerModel: (model: string) => void
@@ -82,6 +84,7 @@ interface SurveyState {
   setPersonaMemory: (enabled: boolean) => void
   setChatMode: (mode: ChatMode) => void
   setDebateRounds: (rounds: number) => void
+  setSamplesPerPersona: (samples: number) => void
   hasRequiredSettings: () => boolean
 
   // Filters
@@ -151,6 +154,7 @@ export const useSurveyStore = create<SurveyState>((set, get) => ({
   personaMemory: localStorage.getItem(STORAGE_KEY_MEMORY) !== "false",
   chatMode: (localStorage.getItem(STORAGE_KEY_MODE) as ChatMode) || "survey",
   debateRounds: parseInt(localStorage.getItem(STORAGE_KEY_DEBATE_ROUNDS) ?? "3", 10),
+  samplesPerPersona: parseInt(localStorage.getItem(STORAGE_KEY_SAMPLES) ?? "1", 10),
 
   setApiKey: (provider, key) => {
     const storageMap: Record<keyof ApiKeys, string> = {
@@ -217,6 +221,11 @@ export const useSurveyStore = create<SurveyState>((set, get) => ({
     set({ debateRounds: rounds })
   },
 
+  setSamplesPerPersona: (samples) => {
+    localStorage.setItem(STORAGE_KEY_SAMPLES, String(samples))
+    set({ samplesPerPersona: samples })
+  },
+
   hasRequiredSettings: () => {
     const state = get()
     const hasKey = Object.values(state.apiKeys).some((k) => k.length > 0)
@@ -54,6 +54,8 @@ export interface QuestionBreakdown {
 export interface TokenUsage {
   input_tokens: number
   output_tokens: number
+  cached_input_tokens?: number // part of input_tokens, read from the provider's prompt cache
+  input_sections?: Record<string, number> // prompt section -> input tokens (persona calls only)
 }
 
 export interface SurveyResponse {
@@ -63,6 +65,8 @@ export interface SurveyResponse {
   agent_name: string
   model: string
   answers: Record<string, string> // sub_question_id -> chosen option
+  answer_distribution?: Record<string, Record<string, number>> | null // sub_question_id -> option -> votes
+  served_model?: string | null // the model that answered, when routing failed over from `model`
   round?: number | null
   token_usage?: TokenUsage | null
 }
@@ -75,11 +79,19 @@ export interface DebateTheme {
   sentiment: "positive" | "negative" | "mixed" | "neutral"
 }
 
+export interface PositionDrift {
+  respondent_id: number
+  drift: number // 0 = unchanged, 1 = entirely different, first vs latest round
+  round_drift: number[]
+}
+
 export interface DebateAnalysis {
   themes: DebateTheme[]
   consensus_points: string[]
   key_tensions: string[]
   synthesis: string
+  position_drift?: PositionDrift[]
+  preview?: boolean // local clustering only, final labels still pending
   token_usage?: TokenUsage | null
 }
 
@@ -87,6 +99,7 @@ export interface DebateMessage {
   respondent_id: number
   agent_name: string
   model: string
+  served_model?: string // the model that answered, when routing failed over from `model`
   round: number
   text: string
   token_usage?: TokenUsage | null
@@ -133,12 +146,26 @@ export interface CompletedSurvey {
 }
 
 export interface WSMessage {
-  type: "survey_response" | "survey_done" | "round_complete" | "debate_message" | "debate_analysis" | "error"
+  type: "survey_response" | "survey_done" | "round_complete" | "debate_message" | "debate_preview" | "debate_analysis" | "run_resumed" | "cancelled" | "stream_ready" | "batch" | "budget_exceeded" | "error"
   data: Record<string, unknown>
 }
 
 export type ChatMode = "survey" | "debate"
 
+export interface JobStatus {
+  survey_id: string
+  status: "queued" | "running" | "completed" | "failed" | "cancelled"
+  chat_mode: ChatMode
+  priority: "interactive" | "batch"
+  events: number
+  subscribers: number
+  error: string | null
+  created_at: number
+  started_at: number | null
+  finished_at: number | null
+  queue: { calls: number; queued: number; wait_avg_s: number; wait_max_s: number }
+}
+
 export interface ApiKeys {
   anthropic: string
   openai: string
@@ -0,0 +1,74 @@
+"""Fixtures for tests that run the app in-process against the stub LLM.
+
+The environment is set before `backend` is imported, since settings are
+read at import: every LLM call goes to `StubChatModel` (no keys, no
+network) and the database is a fresh file per test session.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+os.environ["DUCKDB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="panel-chat-tests-"), "test.duckdb")
+os.environ["CSV_PATH"] = str(ROOT / "survey_2026_data_engineering.csv")
+os.environ["LLM_STUB"] = "true"
+os.environ["LLM_STUB_LATENCY_S"] = "0"
+os.environ.setdefault("JOB_PROCESSES", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+
+API_KEYS = {"openai": "test", "anthropic": "test", "google": "test"}
+OPTIONS = ["Airflow", "Dagster", "Prefect", "Cron"]
+FINAL_EVENTS = ("survey_done", "cancelled")
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_survey(client):
+    """Create a survey and, for survey mode, submit a one-question breakdown; returns its id."""
+
+    def make(models: tuple[str, ...] = ("gpt-4.1-mini",), panel_size: int = 4, breakdown: bool = True) -> str:
+        question = "Which orchestrator does your team run in production?"
+        response = client.post("/api/surveys", json={
+            "question": question, "panel_size": panel_size, "filters": None,
+            "models": list(models), "analyzer_model": models[0],
+        })
+        response.raise_for_status()
+        survey_id = response.json()["id"]
+        if breakdown:
+            client.post(f"/api/surveys/{survey_id}/breakdown", json={"breakdown": {
+                "original_question": question,
+                "sub_questions": [{"id": "sq_1", "text": question, "answer_options": OPTIONS, "chart_type": "pie"}],
+            }}).raise_for_status()
+        return survey_id
+
+    return make
+
+
+@pytest.fixture
+def run(client):
+    """Run a survey over its WebSocket with these options; returns every event up to the final one."""
+
+    def run_survey(survey_id: str, on_event=None, **options) -> list[dict]:
+        events = []
+        with client.websocket_connect(f"/ws/surveys/{survey_id}") as ws:
+            ws.send_text(json.dumps({"api_keys": API_KEYS, **options}))
+            while True:
+                event = ws.receive_json()
+                events.append(event)
+                if on_event:
+                    on_event(event)
+                if event["type"] in FINAL_EVENTS:
+                    return events
+
+    return run_survey
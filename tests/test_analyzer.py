@@ -0,0 +1,44 @@
+"""Question analysis: concurrent requests for one question share a call."""
+import asyncio
+
+from backend.models.survey import QuestionBreakdown, SubQuestion
+from backend.services import analyzer
+
+from tests.conftest import OPTIONS
+
+QUESTION = "Which orchestrator does your team run in production?"
+
+
+def test_waiter_takes_over_when_the_leading_request_is_cancelled(monkeypatch):
+    monkeypatch.setattr(analyzer.breakdowns, "lookup", lambda question, model: None)
+    monkeypatch.setattr(analyzer.breakdowns, "store", lambda question, model, breakdown: None)
+    calls = []
+
+    async def generate(question, model, api_key):
+        calls.append(question)
+        if len(calls) == 1:
+            await asyncio.sleep(10)  # the leader never gets an answer
+        return QuestionBreakdown(
+            original_question=question,
+            sub_questions=[SubQuestion(id="sq_1", text=question, answer_options=OPTIONS)],
+        )
+
+    monkeypatch.setattr(analyzer, "_generate", generate)
+
+    async def scenario():
+        leader = asyncio.create_task(analyzer.analyze_question(QUESTION, "gpt-4.1-mini", "test"))
+        while not calls:
+            await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(analyzer.analyze_question(QUESTION, "gpt-4.1-mini", "test"))
+        await asyncio.sleep(0.1)  # the waiter joins the leader's call
+        assert len(calls) == 1
+        leader.cancel()
+        return await asyncio.wait_for(waiter, timeout=2), leader
+
+    (breakdown, cache, _), leader = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    assert cache == "miss"
+    assert breakdown.original_question == QUESTION
+    assert len(calls) == 2
+    assert not analyzer._inflight
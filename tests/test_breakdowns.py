@@ -0,0 +1,41 @@
+"""Breakdown cache: near-duplicates are only served when they ask the same thing."""
+import pytest
+
+from backend.models.survey import QuestionBreakdown, SubQuestion
+from backend.services import breakdowns
+
+from tests.conftest import OPTIONS
+
+MODEL = "test-analyzer"
+QUESTION = "Should our team migrate the nightly pipelines from Airflow to Dagster this year?"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def cached_breakdown(client):
+    breakdowns.store(QUESTION, MODEL, QuestionBreakdown(
+        original_question=QUESTION,
+        sub_questions=[SubQuestion(id="sq_1", text=QUESTION, answer_options=OPTIONS)],
+    ))
+
+
+def test_exact_hit_after_normalization():
+    breakdown, similarity = breakdowns.lookup(QUESTION.upper().rstrip("?"), MODEL)
+    assert similarity == 1.0
+    assert breakdown.original_question == QUESTION.upper().rstrip("?")
+
+
+def test_near_duplicate_differing_in_stopwords_is_served():
+    question = "Should our team migrate nightly pipelines from Airflow to Dagster this year?"
+    breakdown, similarity = breakdowns.lookup(question, MODEL)
+    assert 0.85 <= similarity < 1.0
+    assert breakdown.sub_questions[0].answer_options == OPTIONS
+
+
+@pytest.mark.parametrize("question", [
+    "Should our team not migrate the nightly pipelines from Airflow to Dagster this year?",
+    "Should our team migrate the nightly pipelines from Dagster to Airflow this year?",
+    "Should our team migrate the nightly pipelines from Airflow to Dagster next year?",
+])
+def test_near_duplicate_asking_something_else_is_a_miss(question, monkeypatch):
+    monkeypatch.setattr(breakdowns.settings, "breakdown_similarity", 0.5)
+    assert breakdowns.lookup(question, MODEL) is None
@@ -0,0 +1,36 @@
+"""Run budgets and the call ledger."""
+import pytest
+
+
+def _of_type(events: list[dict], event_type: str) -> list[dict]:
+    return [e["data"] for e in events if e["type"] == event_type]
+
+
+def test_budget_stops_new_calls_and_the_ledger_counts_what_ran(client, make_survey, run):
+    survey_id = make_survey(panel_size=5)
+
+    events = run(survey_id, budget_usd=0.0)
+
+    # The first call prices the model; every later one would pass the cap
+    assert len(_of_type(events, "survey_response")) == 1
+    assert len(_of_type(events, "budget_exceeded")) == 1
+    budget = _of_type(events, "survey_done")[0]["budget"]
+    assert budget["skipped_calls"] == 4
+    ledger = client.get(f"/api/surveys/{survey_id}/ledger").json()
+    assert ledger["calls"] == 1
+    assert ledger["input_tokens"] > 0 and ledger["output_tokens"] > 0
+    assert budget["spent_usd"] > 0
+    assert ledger["cost_usd"] == pytest.approx(budget["spent_usd"], abs=1e-6)
+    assert client.get(f"/api/jobs/{survey_id}").json()["status"] == "completed"
+
+
+def test_unlimited_run_ledgers_every_call(client, make_survey, run):
+    survey_id = make_survey(models=("gpt-4.1-mini", "claude-3-5-haiku-latest"), panel_size=3)
+
+    events = run(survey_id)
+
+    assert not _of_type(events, "budget_exceeded")
+    ledger = client.get(f"/api/surveys/{survey_id}/ledger").json()
+    assert ledger["calls"] == 6
+    assert {row["model"]: row["calls"] for row in ledger["models"]} == {"gpt-4.1-mini": 3, "claude-3-5-haiku-latest": 3}
+    assert ledger["cost_usd"] == pytest.approx(sum(row["cost_usd"] for row in ledger["models"]))
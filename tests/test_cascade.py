@@ -0,0 +1,97 @@
+"""Cascade runs: screening prompts, confidence and the choice of model pair."""
+import json
+
+import pytest
+
+from backend.graph import nodes
+from backend.services.llm import supports_logprobs
+from backend.services.stub_llm import StubChatModel
+
+from tests.conftest import API_KEYS
+
+
+def _of_type(events: list[dict], event_type: str) -> list[dict]:
+    return [e["data"] for e in events if e["type"] == event_type]
+
+
+def test_screen_prompt_asks_for_valid_json_with_confidence(make_survey, run, monkeypatch):
+    prompts = []
+    invoke = StubChatModel.invoke
+
+    def recording_invoke(self, messages, **kwargs):
+        prompts.append(str(messages[-1].content))
+        return invoke(self, messages, **kwargs)
+
+    monkeypatch.setattr(StubChatModel, "invoke", recording_invoke)
+    survey_id = make_survey(models=("gpt-4.1-nano", "gpt-4.1"), panel_size=2)
+
+    events = run(survey_id, run_mode="cascade")
+
+    assert _of_type(events, "cascade_summary")
+    screen_prompts = [p for p in prompts if '"confidence"' in p]
+    assert len(screen_prompts) == 2
+    example = screen_prompts[0].rsplit("Example:\n", 1)[1]
+    assert json.loads(example)["confidence"] == 0.8
+
+
+def test_reasoning_models_are_not_asked_for_logprobs():
+    assert supports_logprobs("gpt-4.1-mini")
+    assert supports_logprobs("gpt-4o")
+    assert not supports_logprobs("gpt-5.2")
+    assert not supports_logprobs("o3-mini")
+    assert not supports_logprobs("claude-haiku-4-5-20251001")
+
+
+class BadRequestError(Exception):
+    """Named like the OpenAI SDK's 400 error."""
+
+
+def test_screen_falls_back_to_self_reported_confidence_when_logprobs_are_rejected(make_survey, run, monkeypatch):
+    requested = []
+    build = nodes.get_llm
+
+    def get_llm(model, api_key, temperature=None, logprobs=False, n=None):
+        llm = build(model, api_key, temperature=temperature, n=n)
+        requested.append(logprobs)
+        if logprobs:
+            def reject(messages, **kwargs):
+                raise BadRequestError("logprobs is not supported with this model")
+            llm.invoke = reject
+        return llm
+
+    monkeypatch.setattr(nodes, "get_llm", get_llm)
+    monkeypatch.setattr(nodes, "_logprobs_rejected", set())
+    survey_id = make_survey(models=("gpt-4.1-nano", "gpt-4.1"), panel_size=3)
+
+    events = run(survey_id, run_mode="cascade")
+
+    assert not _of_type(events, "error")
+    assert len(_of_type(events, "survey_response")) == 3
+    # Only screens started before the first rejection ask for logprobs
+    assert requested.count(True) <= 3
+    assert requested[-1] is False
+
+
+@pytest.mark.parametrize("models, cascade", [
+    (("gpt-4.1-mini",), {}),
+    (("gpt-4.1-nano", "gpt-4.1"), {"expensive_model": "claude-opus-4-5"}),
+    (("gpt-4.1-nano", "gpt-4.1"), {"cheap_model": "gpt-4.1", "expensive_model": "gpt-4.1"}),
+])
+def test_cascade_rejects_pairs_outside_the_survey_or_of_one_model(client, make_survey, models, cascade):
+    survey_id = make_survey(models=models)
+    options = {"api_keys": API_KEYS, "run_mode": "cascade", "cascade": cascade}
+
+    assert client.post(f"/api/surveys/{survey_id}/estimate", json=options).status_code == 400
+    assert client.post(f"/api/jobs/{survey_id}", json=options).status_code == 400
+
+
+def test_keyless_cascade_estimate_ranks_the_survey_models(client, make_survey):
+    survey_id = make_survey(models=("gpt-4.1-nano", "gpt-4.1"))
+    options = {"run_mode": "cascade"}
+
+    response = client.post(f"/api/surveys/{survey_id}/estimate", json=options)
+
+    assert response.status_code == 200
+    assert {m["model"] for m in response.json()["models"]} == {"gpt-4.1-nano", "gpt-4.1"}
+    options["cascade"] = {"cheap_model": "claude-opus-4-5"}
+    assert client.post(f"/api/surveys/{survey_id}/estimate", json=options).status_code == 400
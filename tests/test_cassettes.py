@@ -0,0 +1,62 @@
+"""Recording a run's LLM calls and replaying them without a provider."""
+import pytest
+from langchain_core.messages import HumanMessage
+
+from backend.services import cassettes
+from backend.services.stub_llm import StubChatModel
+
+
+def _answers(events: list[dict]) -> dict:
+    return {
+        (e["data"]["respondent_id"], e["data"]["model"]): e["data"]["answers"]
+        for e in events if e["type"] == "survey_response"
+    }
+
+
+def test_replayed_run_gives_the_recorded_answers_without_calling_the_provider(make_survey, run, monkeypatch, tmp_path):
+    survey_id = make_survey(models=("gpt-4.1-mini", "claude-3-5-haiku-latest"), panel_size=3)
+    monkeypatch.setattr(cassettes.settings, "cassette_dir", str(tmp_path))
+    monkeypatch.setattr(cassettes.settings, "cassette_mode", "record")
+    recorded = _answers(run(survey_id))
+    assert len(recorded) == 6
+    assert (tmp_path / f"{survey_id}.jsonl.gz").exists()
+
+    def provider_down(self, messages, **kwargs):
+        raise AssertionError("replay must not reach the provider")
+
+    monkeypatch.setattr(StubChatModel, "invoke", provider_down)
+    monkeypatch.setattr(cassettes.settings, "cassette_mode", "replay")
+    monkeypatch.setattr(cassettes.settings, "cassette_latency_scale", 0.0)
+    events = run(survey_id, resume=False)
+
+    assert events[-1]["type"] == "survey_done"
+    assert _answers(events) == recorded
+
+
+def test_replayed_error_keeps_the_provider_error_type(monkeypatch, tmp_path):
+    class BadRequestError(Exception):
+        pass
+
+    class Refusing:
+        def invoke(self, messages, **kwargs):
+            raise BadRequestError("logprobs is not supported")
+
+    monkeypatch.setattr(cassettes.settings, "cassette_dir", str(tmp_path))
+    llm = cassettes.CassetteLLM("gpt-4.1-mini", Refusing, {"logprobs": True})
+    token = cassettes.bind("refused")
+    try:
+        monkeypatch.setattr(cassettes.settings, "cassette_mode", "record")
+        with pytest.raises(BadRequestError):
+            llm.invoke([HumanMessage("Screen this")])
+        cassettes.close("refused")
+
+        monkeypatch.setattr(cassettes.settings, "cassette_mode", "replay")
+        monkeypatch.setattr(cassettes.settings, "cassette_latency_scale", 0.0)
+        with pytest.raises(cassettes.RecordedError) as replayed:
+            llm.invoke([HumanMessage("Screen this")])
+        cassettes.close("refused")
+    finally:
+        cassettes.unbind(token)
+
+    assert cassettes.error_type(replayed.value) == "BadRequestError"
+    assert str(replayed.value) == "BadRequestError: logprobs is not supported"
@@ -0,0 +1,38 @@
+"""Local clustering of panelist positions."""
+from backend.services import clustering
+from backend.services.similarity import tfidf_vectors
+
+TEXTS = [
+    "airflow scheduling dags operators",
+    "airflow dags and operators for scheduling",
+    "scheduling airflow operators dags",
+    "dagster assets lineage software defined",
+    "software defined assets with dagster lineage",
+    "dagster lineage of assets",
+]
+
+
+def test_clusters_separate_groups():
+    labels, score = clustering.cluster_texts(tfidf_vectors(TEXTS))
+    assert labels[:3] == [labels[0]] * 3
+    assert labels[3:] == [labels[3]] * 3
+    assert labels[0] != labels[3]
+    assert score > clustering.MIN_SILHOUETTE
+
+
+def test_large_inputs_only_compare_the_sampled_rows(monkeypatch):
+    vectors = tfidf_vectors(TEXTS * 60)
+    monkeypatch.setattr(clustering, "SILHOUETTE_SAMPLE", 20)
+    calls = {"n": 0}
+    cosine = clustering.cosine
+
+    def counting_cosine(a, b):
+        calls["n"] += 1
+        return cosine(a, b)
+
+    monkeypatch.setattr(clustering, "kmeans", lambda vectors, k, seed: [i % 6 // 3 for i in range(len(vectors))])
+    monkeypatch.setattr(clustering, "cosine", counting_cosine)
+    labels, score = clustering.cluster_texts(vectors, max_k=2)
+
+    assert calls["n"] == 20 * len(vectors)
+    assert score > clustering.MIN_SILHOUETTE
@@ -0,0 +1,28 @@
+"""DB writer process: every request gets a reply, bad ones included."""
+from multiprocessing.connection import Client
+
+import pytest
+
+from backend import dbserver
+from backend.db import parse_address
+
+
+@pytest.fixture
+def db_client(client):
+    address, authkey = dbserver.serve_in_background()
+    with Client(parse_address(address), authkey=authkey.encode()) as conn:
+        yield conn
+
+
+def test_bad_requests_get_an_error_reply_and_the_connection_keeps_serving(db_client):
+    db_client.send("garbage")
+    assert db_client.recv()[:2] == ("error", "ValueError")
+
+    db_client.send_bytes(b"not a pickle")
+    assert db_client.recv()[0] == "error"
+
+    db_client.send(("SELECT nope FROM nowhere", []))
+    assert db_client.recv()[:2] == ("error", "CatalogException")
+
+    db_client.send(("SELECT ? + 1 AS n", [41]))
+    assert db_client.recv() == ("ok", [(42,)], [("n", "INTEGER")])
@@ -0,0 +1,38 @@
+"""Streaming response exports."""
+import pytest
+
+from backend.db import RemoteResult, execute_query
+from backend.services import history
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _read_arrow(content: bytes):
+    return pa.ipc.open_stream(content).read_all()
+
+
+def test_arrow_export_of_a_survey_without_responses_is_an_empty_stream(client, make_survey):
+    survey_id = make_survey()
+
+    response = client.get(f"/api/surveys/{survey_id}/responses/export", params={"format": "arrow"})
+
+    assert response.status_code == 200
+    table = _read_arrow(response.content)
+    assert table.num_rows == 0
+    assert "answers" in table.schema.names
+
+
+@pytest.mark.parametrize("remote", [False, True])
+def test_arrow_export_streams_every_response(client, make_survey, run, monkeypatch, remote):
+    survey_id = make_survey(panel_size=3)
+    run(survey_id)
+    if remote:
+        def remote_query(query, params=None):
+            cursor = execute_query(query, params)
+            return RemoteResult(cursor.fetchall(), [(d[0], str(d[1])) for d in cursor.description])
+        monkeypatch.setattr(history, "execute_query", remote_query)
+
+    table = _read_arrow(b"".join(history.export_responses_arrow(survey_id)))
+
+    assert table.num_rows == 3
+    assert set(table.column("survey_id").to_pylist()) == {survey_id}
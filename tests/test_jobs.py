@@ -0,0 +1,94 @@
+"""Survey runs as background jobs: reruns, resumes and what is saved by the time they finish."""
+import time
+
+from backend.services.stub_llm import StubChatModel
+
+
+def _of_type(events: list[dict], event_type: str) -> list[dict]:
+    return [e["data"] for e in events if e["type"] == event_type]
+
+
+def test_run_streams_and_saves_every_response(client, make_survey, run):
+    survey_id = make_survey(models=("gpt-4.1-mini", "claude-3-5-haiku-latest"), panel_size=3)
+
+    events = run(survey_id)
+
+    responses = _of_type(events, "survey_response")
+    assert len(responses) == 6
+    assert len({(r["respondent_id"], r["model"]) for r in responses}) == 6
+    saved = client.get(f"/api/surveys/{survey_id}").json()["responses"]
+    assert sorted(r["id"] for r in saved) == sorted(r["id"] for r in responses)
+    assert client.get(f"/api/jobs/{survey_id}").json()["status"] == "completed"
+
+
+def test_rerun_without_resume_saves_and_streams_new_responses(client, make_survey, run):
+    survey_id = make_survey(panel_size=3)
+    first = _of_type(run(survey_id), "survey_response")
+
+    events = run(survey_id, resume=False)
+
+    responses = _of_type(events, "survey_response")
+    assert len(responses) == 3
+    assert not any(r.get("replayed") for r in responses)
+    assert not {r["id"] for r in responses} & {r["id"] for r in first}
+    saved = client.get(f"/api/surveys/{survey_id}").json()["responses"]
+    assert sorted(r["id"] for r in saved) == sorted(r["id"] for r in responses)
+    aggregates = client.get(f"/api/surveys/{survey_id}/aggregates").json()
+    assert aggregates["responses"] == {"gpt-4.1-mini": 3}
+    assert sum(row["weight"] for row in aggregates["rows"]) == 3
+
+
+def test_survey_done_comes_last_after_the_run_is_saved(client, make_survey, run):
+    survey_id = make_survey(panel_size=3)
+    seen_on_done = {}
+
+    def on_event(event):
+        if event["type"] == "survey_done":
+            seen_on_done["job"] = client.get(f"/api/jobs/{survey_id}").json()
+            seen_on_done["ledger"] = client.get(f"/api/surveys/{survey_id}/ledger").json()
+            seen_on_done["profile"] = client.get(f"/api/surveys/{survey_id}/profile", params={"spans": False})
+            seen_on_done["sections"] = client.get(f"/api/surveys/{survey_id}/prompt-tokens").json()
+
+    events = run(survey_id, on_event=on_event)
+
+    assert events[-1]["type"] == "survey_done"
+    assert seen_on_done["job"]["status"] == "completed"
+    assert seen_on_done["ledger"]["calls"] == 3
+    assert seen_on_done["profile"].status_code == 200
+    assert seen_on_done["profile"].json()["status"] == "completed"
+    assert {row["section"] for row in seen_on_done["sections"]} >= {"persona", "sub_questions", "instructions"}
+
+
+def test_resume_after_cancel_runs_only_what_is_left(client, make_survey, run, monkeypatch):
+    survey_id = make_survey(panel_size=6)
+    invoke = StubChatModel.invoke
+    calls = []
+
+    def first_call_fast(self, messages, **kwargs):
+        calls.append(self.model)
+        if len(calls) > 1:
+            time.sleep(0.5)
+        return invoke(self, messages, **kwargs)
+
+    monkeypatch.setattr(StubChatModel, "invoke", first_call_fast)
+
+    def cancel_on_first_response(event):
+        if event["type"] == "survey_response":
+            client.post(f"/api/jobs/{survey_id}/cancel").raise_for_status()
+
+    cancelled = run(survey_id, on_event=cancel_on_first_response)
+    assert cancelled[-1]["type"] == "cancelled"
+    before = _of_type(cancelled, "survey_response")
+    assert 1 <= len(before) < 6
+
+    monkeypatch.setattr(StubChatModel, "invoke", invoke)
+    events = run(survey_id)
+
+    replayed = [r for r in _of_type(events, "survey_response") if r.get("replayed")]
+    new = [r for r in _of_type(events, "survey_response") if not r.get("replayed")]
+    assert _of_type(events, "run_resumed")[0]["replayed_responses"] == len(before)
+    assert {r["id"] for r in replayed} == {r["id"] for r in before}
+    keys = [(r["respondent_id"], r["model"]) for r in replayed + new]
+    assert len(keys) == len(set(keys)) == 6
+    saved = client.get(f"/api/surveys/{survey_id}").json()["responses"]
+    assert sorted((r["respondent_id"], r["model"]) for r in saved) == sorted(keys)
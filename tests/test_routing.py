@@ -0,0 +1,28 @@
+"""Routed calls: failover and the health samples it leaves behind."""
+import time
+
+from backend.services import llm
+
+
+def test_deadline_failover_records_one_outcome_per_attempt(make_survey, monkeypatch):
+    survey_id = make_survey()
+    monkeypatch.setattr(llm.settings, "model_groups", {"4o": ["gpt-4o", "gpt-4o-mini"]})
+    monkeypatch.setattr(llm.settings, "route_failover_s", 0.05)
+    monkeypatch.setattr(llm, "health", llm.ModelHealth())
+
+    def invoke(chat_model):
+        if llm.model_name(chat_model) == "gpt-4o":
+            time.sleep(0.5)
+        return llm.model_name(chat_model)
+
+    llm.register_run(survey_id)
+    try:
+        result, served = llm.call_routed(survey_id, "gpt-4o", {"openai": "test"}, invoke)
+        time.sleep(0.6)  # the abandoned call finishes in the background
+    finally:
+        llm.release_run(survey_id)
+
+    assert (result, served) == ("gpt-4o-mini", "gpt-4o-mini")
+    outcomes = {model: [latency for _, latency in recent] for model, recent in llm.health._outcomes.items()}
+    assert outcomes["gpt-4o"] == [None]
+    assert len(outcomes["gpt-4o-mini"]) == 1 and outcomes["gpt-4o-mini"][0] is not None
@@ -0,0 +1,41 @@
+"""Run options are validated before a run starts."""
+import pytest
+
+from tests.conftest import API_KEYS
+
+
+@pytest.mark.parametrize("options", [
+    {"chat_mode": "debat"},
+    {"run_mode": "cascades"},
+    {"debate_context": "summary"},
+    {"debate_topology": "ring"},
+    {"round_policy": "quorm"},
+    {"priority": "urgent"},
+    {"num_rounds": 0},
+    {"peer_k": 0},
+    {"context_token_budget": 0},
+    {"round_deadline_s": 0},
+    {"budget_usd": -1},
+    {"quorum_fraction": 0},
+    {"quorum_fraction": 1.5},
+    {"routing": True, "samples_per_persona": 3},
+])
+def test_invalid_options_are_rejected(client, make_survey, options):
+    survey_id = make_survey()
+
+    response = client.post(f"/api/jobs/{survey_id}", json={"api_keys": API_KEYS, **options})
+
+    assert response.status_code == 422
+    assert client.get(f"/api/jobs/{survey_id}").status_code == 404
+
+
+def test_invalid_init_message_gets_an_error_and_no_run(client, make_survey):
+    survey_id = make_survey()
+
+    events = []
+    with client.websocket_connect(f"/ws/surveys/{survey_id}") as ws:
+        ws.send_json({"api_keys": API_KEYS, "chat_mode": "debate", "round_policy": "quorm"})
+        events.append(ws.receive_json())
+
+    assert events[0]["type"] == "error"
+    assert client.get(f"/api/jobs/{survey_id}").status_code == 404
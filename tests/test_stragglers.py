@@ -0,0 +1,35 @@
+"""Quorum-round stragglers: late messages are collected, not dropped."""
+import threading
+
+from backend.graph import stragglers
+
+
+def test_harvest_waits_for_calls_still_in_flight():
+    survey_id = "stragglers-wait"
+    release = threading.Event()
+
+    def slow_call():
+        release.wait(5)
+        return {"debate_messages": [{"content": "late"}]}
+
+    stragglers.submit(survey_id, "1:gpt-4.1-mini", slow_call)
+    try:
+        assert stragglers.harvest(survey_id) == []
+        threading.Timer(0.1, release.set).start()
+        assert stragglers.harvest(survey_id, timeout=5) == [{"content": "late"}]
+        assert stragglers.busy(survey_id) == set()
+    finally:
+        release.set()
+        stragglers.release(survey_id)
+
+
+def test_harvest_gives_up_after_the_timeout():
+    survey_id = "stragglers-timeout"
+    release = threading.Event()
+    stragglers.submit(survey_id, "1:gpt-4.1-mini", lambda: release.wait(5) and {"debate_messages": []})
+    try:
+        assert stragglers.harvest(survey_id, timeout=0.05) == []
+        assert stragglers.busy(survey_id) == {"1:gpt-4.1-mini"}
+    finally:
+        release.set()
+        stragglers.release(survey_id)
@@ -0,0 +1,23 @@
+"""Jobs in worker processes, writing through the API process's DuckDB server."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests.conftest import ROOT
+
+
+def test_runs_complete_in_worker_processes():
+    if os.environ["JOB_PROCESSES"] != "0":
+        pytest.skip("this session already runs jobs in worker processes")
+    # Tests that patch the stub model in this process cannot reach a worker process
+    result = subprocess.run(
+        [
+            sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+            "tests/test_jobs.py", "tests/test_budget.py", "-k", "not cancel",
+        ],
+        cwd=ROOT, env={**os.environ, "JOB_PROCESSES": "1"},
+        capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout[-4000:]